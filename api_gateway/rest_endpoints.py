@@ -11,33 +11,29 @@ Uses Flask for API server.
 """
 
 from flask import Flask, request, jsonify
-from data_ingestion.entry_validator import EntryValidator
-from consensus_engine.dag_structure import DAG
+from consensus_engine.ledger_service import get_ledger_service
 from vm_state.state_trie import StateTrie
+from lib import database_access
+import consensus_engine.token_rewards
 import logging
 
 app = Flask(__name__)
 logger = logging.getLogger('rest_endpoints')
 
-db = None  # Placeholder for database connection
-entry_validator = EntryValidator(db)
-from consensus_engine.dag_structure import DAG
-dag = DAG(db)
+db = database_access.db_instance
+# Shared with the WebSocket server, P2P network and miner when they run in the same process
+ledger = get_ledger_service(db)
 state_trie = StateTrie(db)
 
 @app.route('/entries', methods=['POST'])
 def submit_entry():
     entry = request.json
     entry_hash = entry.get('hash')
-    valid, msg = entry_validator.validate_entry(entry, entry_hash)
-    if not valid:
+    accepted, msg = ledger.submit_entry(entry)
+    if not accepted:
+        logger.error(f"Failed to add entry: {msg}")
         return jsonify({'error': msg}), 400
-    try:
-        dag.add_entry(entry)
-    except Exception as e:
-        logger.error(f"Failed to add entry: {str(e)}")
-        return jsonify({'error': str(e)}), 400
-    return jsonify({'message': 'Entry accepted', 'hash': entry_hash}), 200
+    return jsonify({'message': msg, 'hash': entry_hash}), 200
 
 @app.route('/state/<address>', methods=['GET'])
 def get_state(address):
@@ -48,15 +44,84 @@ def get_state(address):
 
 @app.route('/entries/<entry_hash>', methods=['GET'])
 def get_entry(entry_hash):
-    entry = dag.entries.get(entry_hash)
+    entry = ledger.get_entry(entry_hash)
     if not entry:
         return jsonify({'error': 'Entry not found'}), 404
     return jsonify(entry), 200
 
 @app.route('/dag/tips', methods=['GET'])
 def get_dag_tips():
-    tips = dag.get_tips()
-    return jsonify({'tips': tips}), 200
+    count = request.args.get('count', type=int)
+    strategy = request.args.get('strategy', 'all')
+    if count is None:
+        if strategy != 'all':
+            return jsonify({'error': 'count is required for this strategy'}), 400
+        return jsonify({'tips': ledger.get_tips()}), 200
+    if count <= 0 or strategy not in ('all', 'walk'):
+        return jsonify({'error': 'Invalid tip selection parameters'}), 400
+    return jsonify({'tips': ledger.select_tips(count, strategy)}), 200
+
+@app.route('/dag/range', methods=['GET'])
+def get_dag_range():
+    by = request.args.get('by', 'height')
+    if by not in ('height', 'timestamp'):
+        return jsonify({'error': 'by must be height or timestamp'}), 400
+    key_type = int if by == 'height' else float
+    start = request.args.get('start', type=key_type)
+    end = request.args.get('end', type=key_type)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    after = None
+    cursor = request.args.get('after')
+    if cursor:
+        # Cursors are '<key>:<hash>' as returned in 'next' by the previous page
+        key, _, entry_hash = cursor.partition(':')
+        try:
+            after = (key_type(key), entry_hash)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    fetch = ledger.dag.range_by_height if by == 'height' else ledger.dag.range_by_time
+    page = fetch(start, end, after, limit)
+    entries = []
+    for key, entry_hash in page:
+        entry = ledger.get_entry(entry_hash)
+        if entry is not None:
+            entries.append(dict(entry, **{by: key}))
+    next_cursor = f"{page[-1][0]}:{page[-1][1]}" if len(page) == limit else None
+    return jsonify({'entries': entries, 'next': next_cursor}), 200
+
+@app.route('/dag/orphans', methods=['GET'])
+def get_orphan_stats():
+    return jsonify(ledger.orphan_stats()), 200
+
+@app.route('/levels', methods=['GET'])
+def get_level_stats():
+    return jsonify({
+        'counts': database_access.get_level_counts(db),
+        'latency': database_access.get_level_latency(db),
+    }), 200
+
+@app.route('/levels/<int:level>/entries', methods=['GET'])
+def get_level_entries(level):
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    try:
+        # The cursor is opaque: pass back the 'next' value of the previous page
+        hashes, next_cursor = database_access.get_entries_at_level(db, level, request.args.get('after'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    return jsonify({'level': level, 'entries': hashes, 'next': next_cursor}), 200
+
+@app.route('/finality', methods=['GET'])
+def get_finality():
+    after = request.args.get('after', 0, type=int)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    records = ledger.finality.since(after, limit)
+    return jsonify({'records': records, 'last_seq': ledger.finality.last_seq()}), 200
 
 @app.route('/state/root', methods=['GET'])
 def get_state_root():
@@ -80,14 +145,15 @@ def transfer_lrw():
     if not from_user or not to_user or not isinstance(amount, int) or amount <= 0:
         return jsonify({'error': 'Invalid transfer parameters'}), 400
 
-    from_balance = database_access.get_lrw_balance(db, from_user)
-    if from_balance < amount:
-        return jsonify({'error': 'Insufficient LRW balance'}), 400
+    with database_access.transaction(db, [('lrw_balances', from_user), ('lrw_balances', to_user)]):
+        from_balance = database_access.get_lrw_balance(db, from_user)
+        if from_balance < amount:
+            return jsonify({'error': 'Insufficient LRW balance'}), 400
 
-    to_balance = database_access.get_lrw_balance(db, to_user)
+        to_balance = database_access.get_lrw_balance(db, to_user)
 
-    database_access.store_lrw_balance(db, from_user, from_balance - amount)
-    database_access.store_lrw_balance(db, to_user, to_balance + amount)
+        database_access.store_lrw_balance(db, from_user, from_balance - amount)
+        database_access.store_lrw_balance(db, to_user, to_balance + amount)
 
     return jsonify({'message': f'Transferred {amount} LRW from {from_user} to {to_user}'}), 200
 
@@ -144,19 +210,17 @@ def claim_staking_rewards():
     if not user_id:
         return jsonify({'error': 'Invalid user ID'}), 400
 
-    rewards = database_access.get_staking_rewards(db, user_id)
-    if rewards <= 0:
-        return jsonify({'message': 'No staking rewards to claim'}), 200
+    with database_access.transaction(db, [('staking_rewards', user_id), ('token_balances', user_id)]):
+        rewards = database_access.get_staking_rewards(db, user_id)
+        if rewards <= 0:
+            return jsonify({'message': 'No staking rewards to claim'}), 200
 
-    current_balance = database_access.get_token_balance(db, user_id)
-    new_balance = current_balance + rewards
-    database_access.store_token_balance(db, user_id, new_balance)
-    database_access.store_staking_rewards(db, user_id, 0)
+        current_balance = database_access.get_token_balance(db, user_id)
+        new_balance = current_balance + rewards
+        database_access.store_token_balance(db, user_id, new_balance)
+        database_access.store_staking_rewards(db, user_id, 0)
 
     return jsonify({'message': f'User {user_id} claimed {rewards:.6f} WŁC staking rewards.'}), 200
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=9000)
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9000)
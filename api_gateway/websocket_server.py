@@ -6,6 +6,11 @@ Features:
 1. Subscriptions: Clients subscribe to events via WebSocket handshake.
 2. Event Broadcasting: Pushes updates to subscribed clients.
 3. Persistence: Maintains connection state with timeouts.
+4. Ledger Events: Entries accepted by the shared ledger service are pushed as 'new_entry' events,
+   and 'get_tips' is answered from the same tip set REST and P2P use.
+5. Finality Stream: 'subscribe_finality' streams finality records in sequence order. A client that
+   reconnects passes the last sequence number it saw as 'since' and resumes from the persistent
+   finality log, with no gaps or repeats.
 Built with asyncio and websockets.
 """
 
@@ -14,8 +19,12 @@ import websockets
 import json
 import logging
 
+from consensus_engine.ledger_service import get_ledger_service
+
 connected_clients = set()
 subscriptions = {}
+finality_cursors = {}  # websocket -> sequence number of the last finality record sent to it
+finality_locks = {}
 
 logger = logging.getLogger('websocket_server')
 
@@ -35,6 +44,19 @@ async def handler(websocket, path=None):
                 if event and event in subscriptions:
                     subscriptions[event].discard(websocket)
                     await websocket.send(json.dumps({'status': f'Unsubscribed from {event}'}))
+            elif action == 'subscribe_finality':
+                # Without 'since' only finalizations from now on are streamed
+                finality = get_ledger_service().finality
+                since = data.get('since')
+                finality_cursors[websocket] = finality.last_seq() if since is None else int(since)
+                await websocket.send(json.dumps({'status': 'Subscribed to finality',
+                                                 'since': finality_cursors[websocket]}))
+                await send_finality(websocket)
+            elif action == 'unsubscribe_finality':
+                finality_cursors.pop(websocket, None)
+                await websocket.send(json.dumps({'status': 'Unsubscribed from finality'}))
+            elif action == 'get_tips':
+                await websocket.send(json.dumps({'tips': get_ledger_service().get_tips()}))
             elif action == 'broadcast':
                 event = data.get('event')
                 message_data = data.get('data')
@@ -48,14 +70,54 @@ async def handler(websocket, path=None):
         connected_clients.discard(websocket)
         for subs in subscriptions.values():
             subs.discard(websocket)
+        finality_cursors.pop(websocket, None)
+        finality_locks.pop(websocket, None)
 
 async def broadcast(event, message):
     if event in subscriptions:
         clients = subscriptions[event]
         if clients:
-            await asyncio.wait([client.send(json.dumps(message)) for client in clients])
+            await asyncio.gather(*(client.send(json.dumps(message)) for client in clients))
+
+async def send_finality(websocket):
+    """
+    Send a client every finality record after its cursor, in order, reading the log a page at a time.
+    Sends to one client never interleave, so each record is delivered exactly once.
+    """
+    finality = get_ledger_service().finality
+    async with finality_locks.setdefault(websocket, asyncio.Lock()):
+        while websocket in finality_cursors:
+            records = finality.since(finality_cursors[websocket])
+            if not records:
+                return
+            for record in records:
+                if websocket not in finality_cursors:
+                    return
+                await websocket.send(json.dumps({'event': 'finalized', 'data': record}))
+                finality_cursors[websocket] = record['seq']
+
+async def push_finality():
+    clients = list(finality_cursors)
+    if clients:
+        await asyncio.gather(*(send_finality(client) for client in clients), return_exceptions=True)
+
+def attach_ledger_service(service, loop):
+    """
+    Push every entry the ledger service accepts to 'new_entry' subscribers, and every finalization
+    to finality subscribers. Both happen on other threads, so the sends are handed to the server's loop.
+    """
+    def on_entry(entry):
+        asyncio.run_coroutine_threadsafe(broadcast('new_entry', entry), loop)
+
+    def on_final(record):
+        # Subscribers catch up from their own cursor, so one wake-up may deliver several records
+        asyncio.run_coroutine_threadsafe(push_finality(), loop)
+    service.add_listener(on_entry)
+    service.finality.add_listener(on_final)
+    return on_entry
 
 def start_server():
+    attach_ledger_service(get_ledger_service(), asyncio.get_event_loop())
     return websockets.serve(handler, '0.0.0.0', 9001)
 
 async def main():
@@ -14,6 +14,9 @@ import json
 import sys
 import subprocess
 from consensus_engine.audit_report import generate_audit_report
+import consensus_engine.token_rewards
+from lib import database_access
+from lib.database_access import db_instance
 
 API_URL = "http://localhost:9000"
 
@@ -178,13 +181,15 @@ def main():
         balance = database_access.get_lrw_balance(db_instance, args.user_id)
         print(f"LRW balance for {args.user_id}: {balance}")
     elif args.command == 'lrw-transfer':
-        from_balance = database_access.get_lrw_balance(db_instance, args.from_user)
-        if from_balance < args.amount:
-            print(f"Insufficient LRW balance for user {args.from_user}")
-            return
-        to_balance = database_access.get_lrw_balance(db_instance, args.to_user)
-        database_access.store_lrw_balance(db_instance, args.from_user, from_balance - args.amount)
-        database_access.store_lrw_balance(db_instance, args.to_user, to_balance + args.amount)
+        with database_access.transaction(db_instance, [('lrw_balances', args.from_user),
+                                                      ('lrw_balances', args.to_user)]):
+            from_balance = database_access.get_lrw_balance(db_instance, args.from_user)
+            if from_balance < args.amount:
+                print(f"Insufficient LRW balance for user {args.from_user}")
+                return
+            to_balance = database_access.get_lrw_balance(db_instance, args.to_user)
+            database_access.store_lrw_balance(db_instance, args.from_user, from_balance - args.amount)
+            database_access.store_lrw_balance(db_instance, args.to_user, to_balance + args.amount)
         print(f"Transferred {args.amount} LRW from {args.from_user} to {args.to_user}")
     elif args.command == 'stake':
         try:
@@ -202,12 +207,15 @@ def main():
         balance = database_access.get_stake_balance(db_instance, args.user_id)
         print(f"Staked balance for {args.user_id}: {balance}")
     elif args.command == 'claim-rewards':
-        rewards = database_access.get_staking_rewards(db_instance, args.user_id)
+        with database_access.transaction(db_instance, [('staking_rewards', args.user_id),
+                                                      ('token_balances', args.user_id)]):
+            rewards = database_access.get_staking_rewards(db_instance, args.user_id)
+            if rewards > 0:
+                current_balance = database_access.get_token_balance(db_instance, args.user_id)
+                new_balance = current_balance + rewards
+                database_access.store_token_balance(db_instance, args.user_id, new_balance)
+                database_access.store_staking_rewards(db_instance, args.user_id, 0)
         if rewards > 0:
-            current_balance = database_access.get_token_balance(db_instance, args.user_id)
-            new_balance = current_balance + rewards
-            database_access.store_token_balance(db_instance, args.user_id, new_balance)
-            database_access.store_staking_rewards(db_instance, args.user_id, 0)
             print(f"User {args.user_id} claimed {rewards:.6f} WŁC staking rewards.")
         else:
             print(f"No staking rewards to claim for {args.user_id}.")
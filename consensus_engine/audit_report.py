@@ -1,30 +1,222 @@
 """
 Audit report generation module for consensus engine.
 Collects audit logs and generates summary reports.
+
+Audit events are recorded off the consensus hot path, through the standard logging queue handlers:
+1. Non-Blocking: event() only samples the event and hands it to a logging.handlers.QueueHandler; a
+   QueueListener thread does all file I/O.
+2. Structured Records: Each event is written as one JSON line with its time, level, event name and fields.
+3. Sampling: High-volume events can be sampled per event name; sampled records carry their rate,
+   so reports can scale counts back up.
+4. Batched Flushes: The listener buffers records in a MemoryHandler and writes them once batch_size are
+   buffered, flush_interval has passed, or an ERROR arrives.
+5. Lossless Shutdown: close() (registered with atexit) drains every queued record before returning.
+Configured under "audit" in config/pof_parameters.json.
 """
 
+import atexit
+import json
 import logging
 import os
+import queue
+import random
+import threading
+import time
 from datetime import datetime
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
 
 AUDIT_LOGGER_NAME = 'audit_logger'
 AUDIT_LOG_FILE = 'audit.log'
 
-def setup_audit_logger(log_file=AUDIT_LOG_FILE):
-    logger = logging.getLogger(AUDIT_LOGGER_NAME)
-    logger.setLevel(logging.INFO)
-    if not logger.hasHandlers():
-        handler = logging.FileHandler(log_file)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    return logger
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'pof_parameters.json')
+with open(config_path, 'r') as f:
+    audit_config = json.load(f).get('audit', {})
+
+logger = logging.getLogger('audit_report')
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        event = {'time': datetime.fromtimestamp(record.created).isoformat(), 'level': record.levelname,
+                 'event': record.msg}
+        event.update(getattr(record, 'fields', {}))
+        return json.dumps(event, default=str)
+
+class _BatchHandler(MemoryHandler):
+    """
+    MemoryHandler that counts the records it writes out to its target.
+    """
+    def __init__(self, capacity, target, counters, counters_lock):
+        super().__init__(capacity, target=target)
+        self.counters = counters
+        self.counters_lock = counters_lock
+
+    def flush(self):
+        with self.lock:
+            written = len(self.buffer) if self.target is not None else 0
+            super().flush()
+        with self.counters_lock:
+            self.counters['written'] += written
+
+class _AuditListener(QueueListener):
+    """
+    QueueListener that also flushes its handlers every flush_interval and on request.
+    """
+    def __init__(self, records, handler, flush_interval):
+        super().__init__(records, handler)
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def dequeue(self, block):
+        while True:
+            timeout = max(0.0, self.last_flush + self.flush_interval - time.monotonic())
+            try:
+                # May be the listener's stop sentinel, which is None
+                record = self.queue.get(block, timeout)
+                received = True
+            except queue.Empty:
+                if not block:
+                    raise
+                received = False
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+            if received:
+                return record
+
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+        self.last_flush = time.monotonic()
+
+    def handle(self, record):
+        # A record carrying an event is a flush request queued by AuditLogger.flush
+        done = getattr(record, 'flushed', None)
+        if done is None:
+            super().handle(record)
+            return
+        self.flush()
+        done.set()
+
+class AuditLogger:
+    def __init__(self, log_file=AUDIT_LOG_FILE, batch_size=None, flush_interval=None, sample_rates=None,
+                 default_sample_rate=None, rng=None):
+        self.log_file = log_file
+        self.batch_size = audit_config.get('batch_size', 256) if batch_size is None else batch_size
+        self.flush_interval = audit_config.get('flush_interval', 1.0) if flush_interval is None else flush_interval
+        self.sample_rates = dict(audit_config.get('sample_rates', {}) if sample_rates is None else sample_rates)
+        self.default_sample_rate = (audit_config.get('default_sample_rate', 1.0)
+                                    if default_sample_rate is None else default_sample_rate)
+        self.rng = rng or random.Random()
+        self.counters = {'recorded': 0, 'sampled_out': 0, 'written': 0}
+        self.lock = threading.Lock()
+        self.closed = False
+        self.records = queue.Queue()
+        self.file_handler = logging.FileHandler(log_file, delay=True)
+        self.file_handler.setFormatter(_JsonFormatter())
+        self.batch_handler = _BatchHandler(self.batch_size, self.file_handler, self.counters, self.lock)
+        self.listener = None
+        self.queue_handler = QueueHandler(self.records)
+        # One child of the audit logger per file, so several audit logs never share handlers
+        self.logger = logging.getLogger(AUDIT_LOGGER_NAME).getChild(os.path.abspath(log_file))
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        self.logger.addHandler(self.queue_handler)
+
+    def event(self, name, level='INFO', **fields):
+        """
+        Record an audit event. Never blocks on I/O; the event may be dropped by sampling.
+        """
+        rate = self.sample_rates.get(name, self.default_sample_rate)
+        with self.lock:
+            if rate < 1 and self.rng.random() >= rate:
+                self.counters['sampled_out'] += 1
+                return
+            self.counters['recorded'] += 1
+            if self.listener is None and not self.closed:
+                self.listener = _AuditListener(self.records, self.batch_handler, self.flush_interval)
+                self.listener.start()
+        if rate < 1:
+            fields['sample_rate'] = rate
+        # After close() the file handler is attached directly, so the event is written synchronously
+        self.logger.log(logging.getLevelName(level), name, extra={'fields': fields})
+
+    def info(self, message, event='message', **fields):
+        self.event(event, 'INFO', message=message, **fields)
+
+    def warning(self, message, event='message', **fields):
+        self.event(event, 'WARNING', message=message, **fields)
+
+    def error(self, message, event='message', **fields):
+        self.event(event, 'ERROR', message=message, **fields)
+
+    def flush(self, timeout=None):
+        """
+        Block until every event recorded before this call has been written.
+        """
+        with self.lock:
+            if self.listener is None or self.closed:
+                return
+        done = threading.Event()
+        self.records.put(logging.makeLogRecord({'flushed': done}))
+        done.wait(timeout)
+
+    def close(self):
+        """
+        Write every queued event, then stop the listener. Later events are written synchronously.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            listener = self.listener
+        if listener is not None:
+            # stop() lets the listener drain the queue first
+            listener.stop()
+        self.batch_handler.flush()
+        self.logger.removeHandler(self.queue_handler)
+        self.logger.addHandler(self.file_handler)
+        self.file_handler.close()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, queued=self.records.qsize())
+
+_audit_loggers = {}
+_audit_loggers_lock = threading.Lock()
+
+def setup_audit_logger(log_file=None):
+    """
+    Return the shared AuditLogger writing to log_file, creating it on first use.
+    """
+    log_file = audit_config.get('log_file', AUDIT_LOG_FILE) if log_file is None else log_file
+    with _audit_loggers_lock:
+        audit_logger = _audit_loggers.get(log_file)
+        if audit_logger is None:
+            audit_logger = _audit_loggers[log_file] = AuditLogger(log_file)
+            atexit.register(audit_logger.close)
+        return audit_logger
+
+def _parse_line(line):
+    """
+    Return (level, event, sample rate) for a JSON audit record, or for a plain-text line from older logs.
+    """
+    try:
+        record = json.loads(line)
+        return record.get('level', 'INFO'), record.get('event', 'message'), record.get('sample_rate', 1)
+    except ValueError:
+        for level in ('INFO', 'WARNING', 'ERROR'):
+            if level in line:
+                return level, 'message', 1
+        return None, 'message', 1
 
 def generate_audit_report(log_file=AUDIT_LOG_FILE):
     """
     Reads the audit log file and generates a summary report.
     Returns the report as a string.
     """
+    audit_logger = _audit_loggers.get(log_file)
+    if audit_logger is not None:
+        audit_logger.flush()
+
     if not os.path.exists(log_file):
         return "No audit log file found."
 
@@ -36,20 +228,24 @@ def generate_audit_report(log_file=AUDIT_LOG_FILE):
     report_lines.append(f"Total log entries: {len(lines)}")
     report_lines.append("")
 
-    # Simple summary: count entries by type (INFO, WARNING, ERROR)
+    # Count entries by level, and by event scaled back up by each record's sampling rate
     counts = {'INFO': 0, 'WARNING': 0, 'ERROR': 0}
+    events = {}
     for line in lines:
-        if 'INFO' in line:
-            counts['INFO'] += 1
-        elif 'WARNING' in line:
-            counts['WARNING'] += 1
-        elif 'ERROR' in line:
-            counts['ERROR'] += 1
+        level, event, rate = _parse_line(line)
+        if level in counts:
+            counts[level] += 1
+        events[event] = events.get(event, 0) + 1 / rate
 
     report_lines.append("Log entry counts by level:")
     for level, count in counts.items():
         report_lines.append(f"  {level}: {count}")
 
+    report_lines.append("")
+    report_lines.append("Estimated event counts (sampled events scaled by their rate):")
+    for event, count in sorted(events.items()):
+        report_lines.append(f"  {event}: {round(count)}")
+
     report_lines.append("")
     report_lines.append("Recent log entries:")
     report_lines.extend(lines[-10:])  # last 10 entries
@@ -7,15 +7,15 @@ Functions:
 1. Level Assignment: Starts entries at L=0 on publication.
 2. Advances to L=1 when entry is referenced by ≥3 entries at L=0.
 3. For L>1, requires ≥3 incoming references from entries at level L-1 and weight threshold.
-4. Marks entries as final at high level (e.g., L=3).
+4. Marks entries as final at high level (e.g., L=3), by appending them to the persistent finality log.
+   The miner reward owed for a final entry is recorded with it; the finality stream pays it in batches
+   (see finality_stream.py).
 """
 
 from consensus_engine.weight_accumulation import get_weight_at_level
-from lib.database_access import update_entry_level, get_entry_references
+from lib.database_access import update_entry_level, get_entry_references, append_finality
 import logging
 
-from consensus_engine.token_rewards import reward_miner
-
 logger = logging.getLogger('confirmation_levels')
 
 W0 = 3  # base weight
@@ -29,34 +29,36 @@ class ConfirmationLevels:
     def __init__(self, db):
         self.db = db
 
-    def assign_level(self, entry_hash, miner_id=None):
+    def evaluate(self, entry_hash):
+        """
+        Return (current_level, next_level, reference_count, weight) without changing anything.
+        next_level is None if the entry cannot advance yet; weight is None when the rule does not use it.
+        """
         entry = get_entry_references(self.db, entry_hash)
         current_level = entry.get('level', 0)
+        refs = entry.get('references', [])
 
         if current_level == 0:
             # Check if referenced by ≥3 entries at L=0
-            refs = entry.get('references', [])
             count = sum(1 for r in refs if self.get_entry_level(r) == 0)
-            if count >= 3:
-                update_entry_level(self.db, entry_hash, 1)
-                current_level = 1
+            return current_level, (1 if count >= 3 else None), count, None
 
-        else:
-            # For L>1
-            next_level = current_level + 1
-            refs = entry.get('references', [])
-            count = sum(1 for r in refs if self.get_entry_level(r) == current_level)
-            weight = get_weight_at_level(self.db, entry_hash, current_level)
-            if count >= 3 and weight >= weight_threshold(current_level):
-                update_entry_level(self.db, entry_hash, next_level)
-                current_level = next_level
+        # For L>1
+        next_level = current_level + 1
+        count = sum(1 for r in refs if self.get_entry_level(r) == current_level)
+        weight = get_weight_at_level(self.db, entry_hash, current_level)
+        if count >= 3 and weight >= weight_threshold(current_level):
+            return current_level, next_level, count, weight
+        return current_level, None, count, weight
+
+    def assign_level(self, entry_hash, miner_id=None):
+        current_level, next_level, _, _ = self.evaluate(entry_hash)
+        if next_level is not None:
+            update_entry_level(self.db, entry_hash, next_level)
+            current_level = next_level
 
-        if current_level >= FINAL_LEVEL:
-            self.mark_entry_final(entry_hash)
+        if current_level >= FINAL_LEVEL and self.mark_entry_final(entry_hash, current_level, miner_id):
             logger.info(f"Entry {entry_hash} marked as final at level {current_level}")
-            # Reward miner when entry is final
-            if miner_id and self.db:
-                reward_miner(self.db, miner_id)
 
         return current_level
 
@@ -64,8 +66,12 @@ class ConfirmationLevels:
         entry = get_entry_references(self.db, entry_hash)
         return entry.get('level', 0)
 
-    def mark_entry_final(self, entry_hash):
-        # Mark entry as final in database
-        logger.info(f"Marking entry {entry_hash} as final")
-        # Implementation to update database to mark finality
-        pass
+    def mark_entry_final(self, entry_hash, level=FINAL_LEVEL, miner_id=None):
+        """
+        Append entry_hash to the finality log, owing miner_id its reward.
+        Returns the finality record, or None if the entry was already final.
+        """
+        record = append_finality(self.db, entry_hash, level, miner_id)
+        if record is not None:
+            logger.info(f"Marking entry {entry_hash} as final with sequence number {record['seq']}")
+        return record
@@ -51,7 +51,7 @@ class ConflictResolver:
         """
         weight = get_accumulated_weight(self.db, entry_hash)
         stake = database_access.get_stake(self.db, entry_hash)
-        audit_logger.info(f"Scoring branch {entry_hash} with weight {weight} and stake {stake}")
+        audit_logger.event('branch_scored', entry_hash=entry_hash, weight=weight, stake=stake)
         return weight + stake
 
     def resolve_conflicts(self, conflict_groups):
@@ -65,6 +65,6 @@ class ConflictResolver:
                 if entry_hash != winner:
                     database_access.mark_invalid(self.db, entry_hash)
                     logger.info(f"Entry {entry_hash} marked invalid due to conflict resolution")
-                    audit_logger.info(f"Entry {entry_hash} marked invalid due to conflict resolution")
+                    audit_logger.event('entry_invalidated', entry_hash=entry_hash, winner=winner)
             logger.info(f"Conflict resolved, winner: {winner}")
-            audit_logger.info(f"Conflict resolved, winner: {winner}")
+            audit_logger.event('conflict_resolved', winner=winner, scores=scores)
@@ -0,0 +1,216 @@
+"""
+dag_analytics.py
+
+Batch analytics over the whole DAG with NumPy, for audits, restarts and conflict scoring.
+
+Functions:
+1. CSR Export: export_csr numbers every stored entry in topological order (by height, then hash) and
+   exports the predecessor -> successor edges as a CSR adjacency matrix over those integer IDs.
+2. Cumulative Weights: cumulative_weights computes, for every entry at once, its base weight plus the
+   base weight of each distinct descendant. Descendant sets are packed bitsets folded one height layer
+   at a time in reverse topological order, over column blocks so memory stays bounded.
+3. Level Eligibility: level_eligibility applies the ConfirmationLevels rules to every entry at once:
+   the level an entry would reach if assign_level ran on it now.
+4. Persistence: persist_weights writes the computed weights of non-final entries through update_weight in one
+   transaction, e.g. to rebuild weights at a restart. It refuses a snapshot the ledger has moved past.
+Weights match weight_accumulation.compute_accumulated_weight. Level eligibility matches
+ConfirmationLevels.assign_level wherever the stored weight is current, i.e. for every entry below FREEZE_LEVEL;
+final entries keep the weight they were frozen with, which these functions do not reproduce.
+Requires NumPy (listed in requirements.txt); the rest of the node runs without it.
+"""
+
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # Only the batch analytics need NumPy
+    np = None
+
+from consensus_engine.confirmation_levels import W0, R
+from consensus_engine.weight_accumulation import FREEZE_LEVEL, get_base_weight, update_weight
+from lib import database_access
+
+logger = logging.getLogger('dag_analytics')
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("dag_analytics requires NumPy (pip install numpy)")
+
+class DagMatrix:
+    """
+    CSR adjacency of the DAG: the successors of entry i are indices[indptr[i]:indptr[i + 1]].
+    IDs follow topological order, so every successor has a larger ID and a larger height.
+    """
+    def __init__(self, hashes, indptr, indices, heights, levels, version=0):
+        self.hashes = hashes
+        self.index = {entry_hash: i for i, entry_hash in enumerate(hashes)}
+        self.indptr = indptr
+        self.indices = indices
+        self.heights = heights
+        self.levels = levels
+        # Ledger version the snapshot was taken at (see database_access.get_ledger_version)
+        self.version = version
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def layers(self):
+        """
+        Return (start, end) ID ranges of entries sharing a height, lowest height first.
+        """
+        if len(self.hashes) == 0:
+            return []
+        bounds = np.flatnonzero(np.diff(self.heights)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(self.hashes)]))
+        return list(zip(starts.tolist(), ends.tolist()))
+
+def export_csr(db):
+    """
+    Export every stored entry of db as a DagMatrix.
+    Predecessors that are not stored are left out, as the scalar functions ignore them too.
+    """
+    _require_numpy()
+    version = database_access.get_ledger_version(db)
+    predecessors = {}
+    levels = {}
+    for entry_hash, entry in getattr(db, 'entries', {}).items():
+        predecessors[entry_hash] = entry.get('predecessor_hashes', [])
+        levels[entry_hash] = entry.get('level', 0)
+
+    # Heights are recomputed rather than read from the ledger index, which can lag for entries stored out of order
+    heights = {}
+    for entry_hash in predecessors:
+        stack = [entry_hash]
+        while stack:
+            current = stack[-1]
+            if current in heights:
+                stack.pop()
+                continue
+            pending = [p for p in predecessors[current] if p in predecessors and p not in heights]
+            if pending:
+                stack.extend(pending)
+                continue
+            heights[current] = 1 + max((heights[p] for p in predecessors[current] if p in predecessors), default=-1)
+            stack.pop()
+
+    hashes = sorted(predecessors, key=lambda h: (heights[h], h))
+    index = {entry_hash: i for i, entry_hash in enumerate(hashes)}
+    sources, targets = [], []
+    for entry_hash in hashes:
+        # Repeated references are kept, since assign_level counts each one
+        for p_hash in predecessors[entry_hash]:
+            if p_hash in index:
+                sources.append(index[p_hash])
+                targets.append(index[entry_hash])
+    sources = np.array(sources, dtype=np.int64)
+    targets = np.array(targets, dtype=np.int64)
+    order = np.lexsort((targets, sources))
+    indices = targets[order]
+    indptr = np.zeros(len(hashes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(hashes)), out=indptr[1:])
+    return DagMatrix(hashes, indptr, indices,
+                     np.array([heights[h] for h in hashes], dtype=np.int64),
+                     np.array([levels[h] for h in hashes], dtype=np.int64), version)
+
+def _fold_block(matrix, layers, first, last):
+    """
+    Return the descendant bitsets of entries [0, last) restricted to descendants in [first, last).
+    Only entries below last can reach the block, since descendants always have larger IDs.
+    """
+    words = (last - first + 63) // 64
+    bits = np.zeros((last, words), dtype='<u8')
+    indptr, indices = matrix.indptr, matrix.indices
+    for start, end in reversed(layers):
+        if start >= last:
+            continue
+        end = min(end, last)
+        lo, hi = indptr[start], indptr[end]
+        if lo == hi:
+            continue
+        successors = indices[lo:hi]
+        # A successor beyond the block has no descendants inside it either
+        reachable = successors < last
+        contributions = np.zeros((hi - lo, words), dtype='<u8')
+        contributions[reachable] = bits[successors[reachable]]
+        own = np.flatnonzero((successors >= first) & reachable)
+        offsets = successors[own] - first
+        contributions[own, offsets // 64] |= np.left_shift(np.uint64(1), (offsets % 64).astype(np.uint64))
+        counts = np.diff(indptr[start:end + 1])
+        rows = np.flatnonzero(counts)
+        segments = indptr[start:end][rows] - lo
+        bits[start + rows] = np.bitwise_or.reduceat(contributions, segments, axis=0)
+    return bits
+
+def cumulative_weights(matrix, block_size=4096, row_chunk=4096):
+    """
+    Return the cumulative weight of every entry, indexed by ID.
+    """
+    _require_numpy()
+    n = len(matrix)
+    base = np.array([get_base_weight(h) for h in matrix.hashes], dtype=np.int64)
+    weights = base.copy()
+    layers = matrix.layers()
+    for first in range(0, n, block_size):
+        last = min(first + block_size, n)
+        bits = _fold_block(matrix, layers, first, last)
+        packed = bits.view(np.uint8)
+        for row in range(0, last, row_chunk):
+            stop = min(row + row_chunk, last)
+            members = np.unpackbits(packed[row:stop], axis=1, bitorder='little')[:, :last - first]
+            weights[row:stop] += members.astype(np.int64) @ base[first:last]
+    return weights
+
+def level_eligibility(matrix, weights):
+    """
+    Return, for every entry, the level assign_level would move it to now (its current level if none).
+    L=0 -> 1 needs at least 3 referencing entries at L=0; L -> L+1 needs at least 3 referencing entries
+    at L and a weight of at least W0 * R**L.
+    """
+    _require_numpy()
+    n = len(matrix)
+    levels = matrix.levels
+    rows = np.repeat(np.arange(n), np.diff(matrix.indptr))
+    same_level = levels[matrix.indices] == levels[rows]
+    counts = np.bincount(rows[same_level], minlength=n)
+    thresholds = W0 * np.power(R, levels)
+    eligible = (counts >= 3) & ((levels == 0) | (weights >= thresholds))
+    return levels + eligible.astype(np.int64)
+
+def analyze(db, block_size=4096):
+    """
+    Compute weights and level eligibility for every stored entry.
+    Returns {hash: {'weight', 'level', 'eligible_level'}}.
+    """
+    matrix = export_csr(db)
+    weights = cumulative_weights(matrix, block_size)
+    eligible = level_eligibility(matrix, weights)
+    logger.info(f"Analyzed {len(matrix)} entries and {len(matrix.indices)} references")
+    return {
+        entry_hash: {'weight': int(weights[i]), 'level': int(matrix.levels[i]), 'eligible_level': int(eligible[i])}
+        for i, entry_hash in enumerate(matrix.hashes)
+    }
+
+def persist_weights(db, matrix, weights):
+    """
+    Store the computed weight of every non-final entry through update_weight, in one transaction.
+    Entries at FREEZE_LEVEL keep the weight they were frozen with, as propagate_weight leaves them alone.
+    Raises RuntimeError, storing nothing, if anything was written to the ledger since matrix was exported
+    or while the weights are stored. Returns the number of weights stored.
+    """
+    stale = "The ledger changed after the DAG was exported; export it again"
+    stored = 0
+    with database_access.transaction(db, []):
+        if database_access.get_ledger_version(db) != matrix.version:
+            raise RuntimeError(stale)
+        # The version check makes the snapshot's levels current
+        for entry_hash, level, weight in zip(matrix.hashes, matrix.levels.tolist(), weights.tolist()):
+            if level >= FREEZE_LEVEL:
+                continue
+            update_weight(db, entry_hash, weight, audit=False)
+            stored += 1
+        # Every write of ours moves the version on by one; anything beyond that came from another writer
+        if database_access.get_ledger_version(db) != matrix.version + stored:
+            raise RuntimeError(stale)
+    logger.info(f"Persisted weights of {stored} entries")
+    return stored
@@ -8,32 +8,44 @@ Functions:
 2. Acyclicity: Enforces directed, acyclic structure by validating timestamps.
 3. Graph Integrity: Uses database to store DAG and detect orphaned or invalid references.
 4. Traversal: Provides functions for traversing DAG to compute weights or resolve conflicts.
+   Cumulative weights are propagated as each entry is stored (see weight_accumulation.py).
+5. Bulk Ingestion: Adds a batch of entries in any order, sorted topologically and committed in one write.
+6. Range Queries: Pages and streams entries by height (longest predecessor path from a genesis entry)
+   or timestamp, in time proportional to the slice rather than the whole DAG.
+7. Reachability: Ancestor/descendant queries and past cones go through a cached bitset index (see reachability.py).
 """
 
-from lib.database_access import store_entry, get_entry, entry_exists
-import time
-import logging
-
-logger = logging.getLogger('dag_structure')
+from collections import deque
+from itertools import chain
 
-from lib.database_access import store_entry, get_entry, entry_exists
+from consensus_engine.reachability import ReachabilityIndex
+from consensus_engine.weight_accumulation import propagate_weight, propagate_weights
+from lib.database_access import (store_entry, get_entry, entry_exists, get_tips, transaction, on_rollback,
+                                  get_entries_by_height, get_entries_by_time)
 import time
 import logging
 
 logger = logging.getLogger('dag_structure')
 
+PREDECESSOR_COUNT = 3  # every entry references exactly this many predecessors
+
 class DAG:
     def __init__(self, db):
+        # Entries are read through db, so the DAG holds no copy of them in memory
         self.db = db
-        self.entries = {}  # key: entry hash, value: entry data
-        self.tips = set()  # entries with no successors
+        # Entries with no successors; the store keeps this set current, so it is correct right after a restart
+        self.tips = set(get_tips(db))
+        self.reachability = ReachabilityIndex(db)
 
-    def add_entry(self, entry):
+    def _check_entry(self, entry):
+        """
+        Raise ValueError if entry cannot be added on top of the stored DAG.
+        """
         # Validate predecessors
         predecessors = entry.get('predecessor_hashes', [])
-        if len(predecessors) != 3:
-            logger.error("Entry must reference exactly 3 predecessors")
-            raise ValueError("Entry must reference exactly 3 predecessors")
+        if len(predecessors) != PREDECESSOR_COUNT:
+            logger.error(f"Entry must reference exactly {PREDECESSOR_COUNT} predecessors")
+            raise ValueError(f"Entry must reference exactly {PREDECESSOR_COUNT} predecessors")
 
         # Check acyclicity by timestamp
         entry_timestamp = entry.get('timestamp')
@@ -46,35 +58,165 @@ class DAG:
                 logger.error("Predecessor timestamp must be less than entry timestamp")
                 raise ValueError("Predecessor timestamp must be less than entry timestamp")
 
-        entry_hash = entry.get('hash')
-        if entry_exists(self.db, entry_hash):
+        if entry_exists(self.db, entry.get('hash')):
             logger.error("Entry already exists")
             raise ValueError("Entry already exists")
 
-        # Store entry
-        store_entry(self.db, entry_hash, entry)
-        self.entries[entry_hash] = entry
+    def _link(self, entry):
+        entry_hash = entry.get('hash')
+        former_tips = [p_hash for p_hash in entry.get('predecessor_hashes', []) if p_hash in self.tips]
+        on_rollback(self.db, lambda: self._unlink(entry_hash, former_tips))
 
         # Update tips
-        for p_hash in predecessors:
+        for p_hash in entry.get('predecessor_hashes', []):
             if p_hash in self.tips:
                 self.tips.remove(p_hash)
         self.tips.add(entry_hash)
+        self.reachability.add_entry(entry)
+
+    def _unlink(self, entry_hash, former_tips):
+        # Undoes _link when the transaction that stored the entry rolls back
+        self.tips.discard(entry_hash)
+        self.tips.update(former_tips)
+        self.reachability.forget(entry_hash)
+
+    def add_entry(self, entry):
+        self._check_entry(entry)
+
+        # Store entry and propagate its weight to its ancestors in one write
+        with transaction(self.db, []):
+            store_entry(self.db, entry.get('hash'), entry)
+            propagate_weight(self.db, entry.get('hash'), entry)
+        self._link(entry)
+
+    def add_entries(self, entries):
+        """
+        Add a batch of entries given in any order.
+        Entries are sorted so every predecessor is added before its successors; a predecessor may be
+        stored already or come from the same batch. All accepted entries are committed in one write.
+        Returns a list of (entry_hash, accepted, message) tuples, in the order the entries were given.
+        """
+        entries = list(entries)
+        results = [None] * len(entries)
+        batch = {}  # entry hash -> position in entries
+        for i, entry in enumerate(entries):
+            entry_hash = entry.get('hash')
+            if entry_hash in batch:
+                results[i] = (entry_hash, False, "Duplicate entry in batch")
+            elif entry_exists(self.db, entry_hash):
+                # Resending stored entries is common when syncing; their successors link to the stored copy
+                results[i] = (entry_hash, False, "Entry already exists")
+            else:
+                batch[entry_hash] = i
+
+        # Kahn's algorithm over the edges between batch entries; ties keep the given order
+        pending = {}
+        waiting = {}  # predecessor hash -> positions of batch entries that reference it
+        ready = deque()
+        for entry_hash, i in batch.items():
+            parents = set(p for p in entries[i].get('predecessor_hashes', []) if p in batch and p != entry_hash)
+            pending[i] = len(parents)
+            for p_hash in parents:
+                waiting.setdefault(p_hash, []).append(i)
+            if not parents:
+                ready.append(i)
+        order = []
+        while ready:
+            i = ready.popleft()
+            order.append(i)
+            for child in waiting.get(entries[i].get('hash'), []):
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+        for i in sorted(set(batch.values()) - set(order)):
+            results[i] = (entries[i].get('hash'), False, "Entry is part of, or depends on, a predecessor cycle")
+
+        accepted = []
+        rejected = set()
+        with transaction(self.db, []):
+            for i in order:
+                entry = entries[i]
+                entry_hash = entry.get('hash')
+                failed = [p for p in entry.get('predecessor_hashes', []) if p in rejected]
+                if failed:
+                    rejected.add(entry_hash)
+                    results[i] = (entry_hash, False, f"Predecessor {failed[0]} was rejected")
+                    continue
+                try:
+                    self._check_entry(entry)
+                except ValueError as e:
+                    rejected.add(entry_hash)
+                    results[i] = (entry_hash, False, str(e))
+                    continue
+                # Buffered by the transaction, but visible to the checks of later entries in the batch
+                store_entry(self.db, entry_hash, entry)
+                accepted.append(entry)
+                results[i] = (entry_hash, True, "Entry accepted")
+            # Ancestors shared by the batch get one weight write, not one per entry
+            propagate_weights(self.db, accepted)
+
+        for entry in accepted:
+            self._link(entry)
+        logger.info(f"Added {len(accepted)} of {len(entries)} entries in one batch")
+        return results
 
     def get_tips(self):
         return list(self.tips)
 
+    def range_by_height(self, start=None, end=None, after=None, limit=100):
+        """
+        Return up to limit (height, hash) pairs with start <= height < end.
+        after is the last pair of the previous page.
+        """
+        return get_entries_by_height(self.db, start, end, after, limit)
+
+    def range_by_time(self, start=None, end=None, after=None, limit=100):
+        """
+        Return up to limit (timestamp, hash) pairs with start <= timestamp < end.
+        after is the last pair of the previous page.
+        """
+        return get_entries_by_time(self.db, start, end, after, limit)
+
+    def _iter_range(self, fetch, start, end, page_size):
+        after = None
+        while True:
+            page = fetch(start, end, after, page_size)
+            for key, entry_hash in page:
+                entry = get_entry(self.db, entry_hash)
+                if entry is not None:
+                    yield key, entry
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def iter_by_height(self, start=None, end=None, page_size=500):
+        """
+        Yield (height, entry) for every entry with start <= height < end, lowest height first.
+        Predecessors always have a lower height, so this order is topological.
+        """
+        return self._iter_range(self.range_by_height, start, end, page_size)
+
+    def iter_by_time(self, start=None, end=None, page_size=500):
+        """
+        Yield (timestamp, entry) for every entry with start <= timestamp < end, oldest first.
+        """
+        return self._iter_range(self.range_by_time, start, end, page_size)
+
+    def is_ancestor(self, ancestor_hash, entry_hash):
+        return self.reachability.is_ancestor(ancestor_hash, entry_hash)
+
+    def ancestors(self, entry_hash, min_height=None):
+        return self.reachability.ancestors(entry_hash, min_height)
+
+    def descendants(self, entry_hash, max_height=None):
+        return self.reachability.descendants(entry_hash, max_height)
+
+    def past_cone(self, entry_hash):
+        return self.reachability.past_cone(entry_hash)
+
     def traverse(self, start_hash, visit_func):
-        visited = set()
-        stack = [start_hash]
-        while stack:
-            current = stack.pop()
-            if current in visited:
-                continue
-            visited.add(current)
-            entry = self.entries.get(current)
+        for current in chain([start_hash], self.ancestors(start_hash)):
+            entry = get_entry(self.db, current)
             if entry is None:
                 continue
             visit_func(entry)
-            for p_hash in entry.get('predecessor_hashes', []):
-                stack.append(p_hash)
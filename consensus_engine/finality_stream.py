@@ -0,0 +1,104 @@
+"""
+finality_stream.py
+
+Publishes finalized entries from the persistent finality log and settles their miner rewards in batches.
+
+Functions:
+1. Notifications: on_promotion is registered as a promotion engine listener. Each 'finalized' event is
+   passed to the stream's listeners as its finality record, e.g. to push it to WebSocket subscribers.
+2. Resumable Reads: since(seq) pages through the finality log after a sequence number, so a subscriber
+   that reconnects catches up from the last record it saw instead of re-polling every entry.
+3. Batched Rewards: Rewards owed by final entries are paid through settle_finality_rewards once
+   reward_batch_size are pending, or reward_interval seconds after the last payment, in one transaction.
+   Full batches are paid as entries finalize; start_settler runs settle() every reward_interval seconds
+   on a daemon thread, so a partial batch is paid even when no more entries finalize.
+   Rewards still pending at shutdown stay in the log and are paid when the next service starts.
+Configured under "finality" in config/pof_parameters.json.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from consensus_engine.token_rewards import settle_finality_rewards
+from lib import database_access
+
+logger = logging.getLogger('finality_stream')
+
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'pof_parameters.json')
+with open(config_path, 'r') as f:
+    finality_config = json.load(f).get('finality', {})
+
+class FinalityStream:
+    def __init__(self, db, reward_batch_size=None, reward_interval=None, page_size=None, clock=time.monotonic):
+        self.db = db
+        self.reward_batch_size = (finality_config.get('reward_batch_size', 64)
+                                  if reward_batch_size is None else reward_batch_size)
+        self.reward_interval = finality_config.get('reward_interval', 5.0) if reward_interval is None else reward_interval
+        self.page_size = finality_config.get('stream_page_size', 500) if page_size is None else page_size
+        self.clock = clock
+        self.last_settled = clock()
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def on_promotion(self, event):
+        if event.get('type') != 'finalized':
+            return
+        record = database_access.get_finality(self.db, event['hash'])
+        if record is not None:
+            for listener in list(self.listeners):
+                try:
+                    listener(record)
+                except Exception as e:
+                    logger.error(f"Finality listener failed: {e}")
+        self.settle()
+
+    def settle(self, force=False):
+        """
+        Pay pending rewards if a batch is full, the reward interval has passed, or force is set.
+        Returns the number of finality records settled.
+        """
+        now = self.clock()
+        due = force or now - self.last_settled >= self.reward_interval
+        settled = settle_finality_rewards(self.db, min_batch=1 if due else self.reward_batch_size)
+        if settled:
+            self.last_settled = now
+            logger.info(f"Settled miner rewards for {settled} final entries")
+        return settled
+
+    def since(self, after=0, limit=None):
+        """
+        Return the next page of finality records after sequence number after.
+        """
+        return database_access.get_finality_since(self.db, after, self.page_size if limit is None else limit)
+
+    def last_seq(self):
+        return database_access.get_finality_seq(self.db)
+
+def start_settler(stream, interval=None):
+    """
+    Run stream.settle() every `interval` seconds (default: its reward_interval) on a daemon thread.
+    Set the returned thread's stop event to end it.
+    """
+    interval = stream.reward_interval if interval is None else interval
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                stream.settle()
+            except Exception as e:
+                logger.error(f"Finality reward settlement failed: {e}")
+
+    thread = threading.Thread(target=run, name='finality-settler', daemon=True)
+    thread.stop = stop
+    thread.start()
+    return thread
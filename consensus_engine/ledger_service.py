@@ -0,0 +1,236 @@
+"""
+ledger_service.py
+
+Single long-lived ledger service shared by every front end in the process.
+
+Functions:
+1. Shared State: Owns the one DAG (entries and tip set) and EntryValidator for the process, so REST,
+   WebSocket, P2P and the miner all see the same tips without reloading anything.
+2. Entry Submission: Validates and adds an entry under one lock, so concurrent front ends cannot
+   interleave validation and insertion of the same entry. Batches (e.g. a backlog synced from a peer)
+   are added in topological order with one write.
+   Entries whose predecessors have not arrived yet are held in an orphan pool and added in cascade
+   once the predecessors land (see orphan_pool.py).
+3. Lookups: Entry and tip queries go through the shared DAG and the ledger indexes.
+   Tips for new entries are picked by a weighted random walk (see tip_selection.py).
+4. Notifications: Listeners are called with every accepted entry, e.g. to push it to WebSocket clients.
+   The confirmation level promotion engine is one of them (see promotion_engine.py), and its
+   finalizations feed the finality stream (see finality_stream.py).
+5. Reset: reset() clears the ledger back to genesis and rebuilds the service's in-memory state on top of it.
+"""
+
+import logging
+from collections import deque
+from threading import RLock
+
+from consensus_engine.dag_structure import DAG, PREDECESSOR_COUNT
+from consensus_engine.finality_stream import FinalityStream, start_settler
+from consensus_engine.orphan_pool import OrphanPool
+from consensus_engine.promotion_engine import PromotionEngine
+from consensus_engine.tip_selection import TipSelector
+from data_ingestion.entry_validator import EntryValidator
+from lib import database_access
+
+logger = logging.getLogger('ledger_service')
+
+class LedgerService:
+    def __init__(self, db):
+        self.db = db
+        self.dag = DAG(db)
+        self.validator = EntryValidator(db)
+        self.tip_selector = TipSelector(db)
+        self.orphans = OrphanPool()
+        self.lock = RLock()
+        self.listeners = []
+        self.promotion = PromotionEngine(db)
+        self.add_listener(self.promotion.on_entry)
+        self.finality = FinalityStream(db)
+        self.promotion.add_listener(self.finality.on_promotion)
+        # Rewards left pending by a previous run are paid right away
+        self.finality.settle(force=True)
+
+    def reset(self):
+        """
+        Clear the ledger back to genesis and rebuild the DAG, tip selector and orphan pool on the empty ledger.
+        Listeners stay registered.
+        """
+        with self.lock:
+            with database_access.transaction(self.db):
+                database_access.reset_ledger(self.db)
+            self.dag = DAG(self.db)
+            self.validator = EntryValidator(self.db)
+            self.tip_selector = TipSelector(self.db)
+            self.orphans = OrphanPool()
+            with self.promotion.lock:
+                self.promotion.watching.clear()
+        logger.info("Ledger state has been reset to genesis.")
+
+    def validate_entry(self, entry):
+        return self.validator.validate_entry(entry, entry.get('hash'))
+
+    def _missing_predecessors(self, entry):
+        return set(p for p in entry.get('predecessor_hashes', [])
+                   if not database_access.entry_exists(self.db, p))
+
+    def _hold_orphan(self, entry, missing):
+        held = self.orphans.add(entry, missing)
+        if held:
+            logger.info(f"Holding orphan {entry.get('hash')} until {sorted(missing)} arrive")
+        return held
+
+    def _promote_orphans(self, entry_hashes):
+        """
+        Add every orphan unblocked by entry_hashes, following chains of orphans in cascade.
+        Returns the promoted entries.
+        """
+        promoted = []
+        pending = deque(entry_hashes)
+        with database_access.transaction(self.db, []):
+            while pending:
+                for orphan in self.orphans.resolve(pending.popleft()):
+                    try:
+                        self.dag.add_entry(orphan)
+                    except ValueError as e:
+                        logger.warning(f"Orphan {orphan.get('hash')} rejected on promotion: {e}")
+                        continue
+                    promoted.append(orphan)
+                    pending.append(orphan.get('hash'))
+        return promoted
+
+    def add_entry(self, entry):
+        """
+        Add an already validated entry to the DAG and notify listeners.
+        Returns False if the entry is held as an orphan until its predecessors arrive.
+        """
+        with self.lock:
+            missing = self._missing_predecessors(entry)
+            # An entry with the wrong number of predecessors could never be promoted; dag.add_entry rejects it
+            if missing and len(entry.get('predecessor_hashes', [])) == PREDECESSOR_COUNT:
+                self._hold_orphan(entry, missing)
+                return False
+            self.dag.add_entry(entry)
+            promoted = self._promote_orphans([entry.get('hash')])
+        for added in [entry] + promoted:
+            self._notify(added)
+        return True
+
+    def submit_entry(self, entry):
+        """
+        Validate entry and add it to the DAG.
+        Returns (accepted, message). An entry held as an orphan counts as accepted.
+        """
+        with self.lock:
+            valid, msg = self.validate_entry(entry)
+            if not valid:
+                return False, msg
+            missing = self._missing_predecessors(entry)
+            if missing:
+                if not self._hold_orphan(entry, missing):
+                    return False, "Entry already held or too large for the orphan pool"
+                return True, "Entry held until its predecessors arrive"
+            try:
+                self.dag.add_entry(entry)
+            except ValueError as e:
+                return False, str(e)
+            promoted = self._promote_orphans([entry.get('hash')])
+        for added in [entry] + promoted:
+            self._notify(added)
+        return True, "Entry accepted"
+
+    def submit_entries(self, entries):
+        """
+        Validate a batch of entries given in any order and add the valid ones to the DAG in one write.
+        Entries whose predecessors are neither stored nor in the batch, directly or through another
+        batch entry, are held as orphans.
+        Returns a list of (entry_hash, accepted, message) tuples, in the order the entries were given.
+        """
+        entries = list(entries)
+        with self.lock:
+            results = [None] * len(entries)
+            valid = {}
+            for i, entry in enumerate(entries):
+                ok, msg = self.validate_entry(entry)
+                if ok:
+                    valid.setdefault(entry.get('hash'), i)
+                else:
+                    results[i] = (entry.get('hash'), False, msg)
+
+            # Orphans are the entries missing a predecessor, plus every batch entry that builds on one
+            children = {}
+            orphaned = deque()
+            for entry_hash, i in valid.items():
+                for p_hash in entries[i].get('predecessor_hashes', []):
+                    if p_hash in valid:
+                        children.setdefault(p_hash, []).append(entry_hash)
+                    elif not database_access.entry_exists(self.db, p_hash):
+                        orphaned.append(entry_hash)
+            held = set()
+            while orphaned:
+                entry_hash = orphaned.popleft()
+                if entry_hash not in held:
+                    held.add(entry_hash)
+                    orphaned.extend(children.get(entry_hash, []))
+
+            ready = [i for i in range(len(entries)) if results[i] is None and entries[i].get('hash') not in held]
+            with database_access.transaction(self.db, []):
+                for i, result in zip(ready, self.dag.add_entries([entries[i] for i in ready])):
+                    results[i] = result
+                for i in range(len(entries)):
+                    if results[i] is None:
+                        entry = entries[i]
+                        self._hold_orphan(entry, self._missing_predecessors(entry))
+                        results[i] = (entry.get('hash'), True, "Entry held until its predecessors arrive")
+                promoted = self._promote_orphans([entry_hash for entry_hash, accepted, msg in results
+                                                  if accepted and msg == "Entry accepted"])
+        for i, (_, accepted, msg) in enumerate(results):
+            if accepted and msg == "Entry accepted":
+                self._notify(entries[i])
+        for entry in promoted:
+            self._notify(entry)
+        return results
+
+    def orphan_stats(self):
+        return self.orphans.stats()
+
+    def get_tips(self):
+        with self.lock:
+            return self.dag.get_tips()
+
+    def select_tips(self, count=3, strategy='walk'):
+        return self.tip_selector.select_tips(count, strategy)
+
+    def get_entry(self, entry_hash):
+        return database_access.get_entry(self.db, entry_hash)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, entry):
+        # Inside a batched write, listeners only hear about the entry once the batch has committed
+        database_access.after_commit(self.db, lambda: self._call_listeners(entry))
+
+    def _call_listeners(self, entry):
+        for listener in list(self.listeners):
+            try:
+                listener(entry)
+            except Exception as e:
+                logger.error(f"Ledger service listener failed: {e}")
+
+_service = None
+_service_lock = RLock()
+
+def get_ledger_service(db=None):
+    """
+    Return the process-wide LedgerService, creating it on first use.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = LedgerService(database_access.db_instance if db is None else db)
+            # Pending rewards are paid on a timer, not only when the next entry finalizes
+            start_settler(_service.finality)
+        return _service
@@ -0,0 +1,127 @@
+"""
+orphan_pool.py
+
+Holds entries that arrive before their predecessors, until the predecessors land.
+
+Functions:
+1. Indexing: Orphans are indexed by each missing predecessor hash, so the arrival of a parent finds
+   its waiting children without scanning the pool.
+2. Promotion: resolve(parent_hash) returns the orphans whose last missing predecessor just arrived;
+   the caller adds them to the DAG and resolves their hashes in turn, so whole chains are promoted in cascade.
+3. Bounds: Orphans expire after a time-to-live, and the oldest are evicted when the pool exceeds its
+   entry count or approximate memory cap.
+4. Counters: stats() reports pool size and memory, added/promoted/expired/evicted counts and
+   resolution latency.
+Configured under "orphan_pool" in config/pof_parameters.json.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import RLock
+
+logger = logging.getLogger('orphan_pool')
+
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'pof_parameters.json')
+with open(config_path, 'r') as f:
+    orphan_config = json.load(f).get('orphan_pool', {})
+
+class OrphanPool:
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None, clock=time.monotonic):
+        self.max_entries = orphan_config.get('max_entries', 10000) if max_entries is None else max_entries
+        self.max_bytes = orphan_config.get('max_bytes', 16 * 1024 * 1024) if max_bytes is None else max_bytes
+        self.ttl = orphan_config.get('ttl', 600) if ttl is None else ttl
+        self.clock = clock
+        self.orphans = OrderedDict()  # entry hash -> (entry, missing hashes, arrival time, size); oldest first
+        self.waiting = {}  # missing predecessor hash -> hashes of orphans waiting for it
+        self.bytes = 0
+        self.counters = {'added': 0, 'promoted': 0, 'expired': 0, 'evicted': 0}
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.lock = RLock()
+
+    def __len__(self):
+        return len(self.orphans)
+
+    def __contains__(self, entry_hash):
+        return entry_hash in self.orphans
+
+    def add(self, entry, missing):
+        """
+        Hold entry until every hash in missing has been resolved.
+        Returns False if the entry is already held or too large for the pool.
+        """
+        entry_hash = entry.get('hash')
+        size = len(json.dumps(entry, default=str))
+        with self.lock:
+            self.expire()
+            if entry_hash in self.orphans or size > self.max_bytes:
+                return False
+            missing = set(missing)
+            self.orphans[entry_hash] = (entry, missing, self.clock(), size)
+            self.bytes += size
+            for parent in missing:
+                self.waiting.setdefault(parent, set()).add(entry_hash)
+            self.counters['added'] += 1
+            while len(self.orphans) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self.orphans))
+                self._remove(oldest)
+                self.counters['evicted'] += 1
+                logger.warning(f"Orphan pool full, evicted {oldest}")
+            return entry_hash in self.orphans
+
+    def resolve(self, parent_hash):
+        """
+        Record that parent_hash is now in the ledger.
+        Returns the orphans that are no longer missing any predecessor, removed from the pool.
+        """
+        ready = []
+        with self.lock:
+            now = self.clock()
+            for orphan_hash in self.waiting.pop(parent_hash, ()):
+                entry, missing, arrived, _ = self.orphans[orphan_hash]
+                missing.discard(parent_hash)
+                if missing:
+                    continue
+                self._remove(orphan_hash)
+                latency = now - arrived
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                self.counters['promoted'] += 1
+                ready.append(entry)
+        return ready
+
+    def expire(self):
+        """
+        Drop orphans older than the time-to-live. Arrival order is insertion order, so only the head is checked.
+        """
+        with self.lock:
+            cutoff = self.clock() - self.ttl
+            while self.orphans:
+                oldest, (_, _, arrived, _) = next(iter(self.orphans.items()))
+                if arrived > cutoff:
+                    break
+                self._remove(oldest)
+                self.counters['expired'] += 1
+
+    def _remove(self, entry_hash):
+        _, missing, _, size = self.orphans.pop(entry_hash)
+        self.bytes -= size
+        for parent in missing:
+            children = self.waiting.get(parent)
+            if children is not None:
+                children.discard(entry_hash)
+                if not children:
+                    del self.waiting[parent]
+
+    def stats(self):
+        with self.lock:
+            promoted = self.counters['promoted']
+            return dict(self.counters,
+                        size=len(self.orphans),
+                        bytes=self.bytes,
+                        missing_parents=len(self.waiting),
+                        avg_resolution_latency=self.latency_total / promoted if promoted else 0.0,
+                        max_resolution_latency=self.latency_max)
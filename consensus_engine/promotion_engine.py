@@ -0,0 +1,114 @@
+"""
+promotion_engine.py
+
+Promotes confirmation levels as entries arrive, instead of calling assign_level by hand per entry.
+
+Functions:
+1. Subscription: on_entry is registered as a ledger service listener and runs for every accepted entry.
+2. Targeted Re-evaluation: A new entry changes the reference counts of its predecessors only, so only they
+   are evaluated. Entries that already have enough references but wait on weight are kept in a watch set
+   and re-checked on every insert, since every insert adds weight to the frontier.
+3. Cascading Promotion: A promoted entry is evaluated again (it may qualify for the next level at once),
+   and its predecessors are evaluated too, since their same-level reference counts just changed.
+   Entries advance through L0 -> L3 one step at a time, using the ConfirmationLevels rules.
+4. Events: Every promotion and finalization is passed to the engine's listeners and the audit log.
+   Finalized entries are appended to the finality log first, so 'finalized' events carry their
+   sequence number (see finality_stream.py).
+"""
+
+import logging
+from collections import deque
+from threading import RLock
+
+from consensus_engine.audit_report import setup_audit_logger
+from consensus_engine.confirmation_levels import ConfirmationLevels, FINAL_LEVEL
+from lib import database_access
+
+logger = logging.getLogger('promotion_engine')
+audit_logger = setup_audit_logger()
+
+class PromotionEngine:
+    def __init__(self, db, final_level=FINAL_LEVEL):
+        self.db = db
+        self.levels = ConfirmationLevels(db)
+        self.final_level = final_level
+        self.watching = set()  # entries at L>=1 with enough references that still need weight
+        self.listeners = []
+        self.lock = RLock()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _emit(self, event):
+        audit_logger.event('entry_' + event['type'], entry_hash=event['hash'],
+                          confirmation_level=event['level'])
+        for listener in list(self.listeners):
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Promotion listener failed: {e}")
+
+    def on_entry(self, entry):
+        """
+        Re-evaluate the entries affected by a newly accepted entry. Returns the events emitted.
+        """
+        return self.evaluate(entry.get('predecessor_hashes', []))
+
+    def rescan(self, entry_hashes):
+        """
+        Evaluate the given entries, e.g. the non-final entries after a restart, when the watch set is empty.
+        """
+        return self.evaluate(entry_hashes)
+
+    def evaluate(self, entry_hashes):
+        events = []
+        with self.lock:
+            queue = deque(entry_hashes)
+            queue.extend(self.watching)
+            queued = set(queue)
+            with database_access.transaction(self.db, []):
+                while queue:
+                    entry_hash = queue.popleft()
+                    queued.discard(entry_hash)
+                    promoted = self._evaluate_one(entry_hash, events)
+                    if not promoted:
+                        continue
+                    for follow_up in [entry_hash] + (database_access.get_predecessors(self.db, entry_hash) or []):
+                        if follow_up not in queued:
+                            queued.add(follow_up)
+                            queue.append(follow_up)
+        for event in events:
+            self._emit(event)
+        return events
+
+    def _evaluate_one(self, entry_hash, events):
+        """
+        Advance entry_hash by one level if it qualifies. Returns True if it was promoted.
+        """
+        if not database_access.entry_exists(self.db, entry_hash):
+            return False
+        current_level, next_level, count, weight = self.levels.evaluate(entry_hash)
+        if current_level >= self.final_level:
+            self.watching.discard(entry_hash)
+            return False
+        if next_level is None:
+            if current_level >= 1 and count >= 3:
+                self.watching.add(entry_hash)
+            else:
+                self.watching.discard(entry_hash)
+            return False
+        self.watching.discard(entry_hash)
+        database_access.update_entry_level(self.db, entry_hash, next_level)
+        events.append({'type': 'promoted', 'hash': entry_hash, 'level': next_level, 'previous_level': current_level})
+        if next_level >= self.final_level:
+            # The submitter solved the entry's PoF, so it is owed the reward
+            entry = database_access.get_entry(self.db, entry_hash) or {}
+            record = self.levels.mark_entry_final(entry_hash, next_level, entry.get('submitter_public_key'))
+            if record is not None:
+                events.append({'type': 'finalized', 'hash': entry_hash, 'level': next_level, 'seq': record['seq']})
+        logger.debug(f"Entry {entry_hash} promoted from L{current_level} to L{next_level}")
+        return True
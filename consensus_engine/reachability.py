@@ -0,0 +1,337 @@
+"""
+reachability.py
+
+Answers ancestor/descendant queries over the DAG without a fresh traversal per query.
+
+Functions:
+1. Sequence Numbers: Every entry seen gets a sequence number, which is its bit position in past-cone bitsets.
+2. Past-Cone Bitsets: The past cone of an entry (all its direct and indirect predecessors) is stored as a
+   compact little-endian bitset, so "is A an ancestor of B" is a single bit test once B's cone is known.
+3. Incremental Maintenance: A new entry's cone is the union of its predecessors' cones and their own bits,
+   so entries added on top of cached cones are indexed in O(cone size / 8) bytes of work.
+4. Bounded Cache: Cones are kept in an LRU cache capped by their total size in bits.
+5. Horizon: Entries more than depth heights below the highest indexed entry are released; the survivors are
+   renumbered, so sequence numbers and cones stay bounded by the window instead of the whole ledger.
+   Queries that reach below the horizon finish with a plain walk over the released part.
+6. Iteration: ancestors() reads the past-cone bitset and yields highest first; descendants() scans the
+   height index upward and tests each candidate's cone, so both are nearest first and bounded by height.
+Configured under "reachability" in config/pof_parameters.json.
+"""
+
+import json
+import logging
+import os
+from collections import OrderedDict, deque
+from itertools import chain
+from threading import RLock
+
+from lib import database_access
+
+logger = logging.getLogger('reachability')
+
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'pof_parameters.json')
+with open(config_path, 'r') as f:
+    reachability_config = json.load(f).get('reachability', {})
+
+def bitset_test(bitset, position):
+    index = position >> 3
+    return index < len(bitset) and bool(bitset[index] >> (position & 7) & 1)
+
+def bitset_union(bitsets):
+    value = 0
+    for bitset in bitsets:
+        value |= int.from_bytes(bitset, 'little')
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+class ReachabilityIndex:
+    def __init__(self, db, cache_bits=None, depth=None):
+        self.db = db
+        self.cache_bits = reachability_config.get('cache_bits', 64 * 1024 * 1024) if cache_bits is None else cache_bits
+        self.depth = reachability_config.get('depth', 100000) if depth is None else depth
+        self.seq = {}  # entry hash -> sequence number (bit position)
+        self.hashes = []  # sequence number -> entry hash
+        self.cones = OrderedDict()  # entry hash -> past-cone bitset, least recently used first
+        self.cached_bits = 0
+        self.horizon = 0  # entries below this height are released
+        self.top = None  # highest height indexed so far
+        self.lock = RLock()
+
+    def _height(self, entry_hash):
+        return database_access.get_height(self.db, entry_hash)
+
+    def _released(self, entry_hash):
+        if not self.horizon:
+            return False
+        height = self._height(entry_hash)
+        return height is not None and height < self.horizon
+
+    def sequence(self, entry_hash):
+        with self.lock:
+            number = self.seq.get(entry_hash)
+            if number is None:
+                number = self.seq[entry_hash] = len(self.hashes)
+                self.hashes.append(entry_hash)
+            return number
+
+    def _cached(self, entry_hash):
+        with self.lock:
+            cone = self.cones.get(entry_hash)
+            if cone is not None:
+                self.cones.move_to_end(entry_hash)
+            return cone
+
+    def _cache(self, entry_hash, cone):
+        with self.lock:
+            old = self.cones.pop(entry_hash, None)
+            if old is not None:
+                self.cached_bits -= len(old) * 8
+            self.cones[entry_hash] = cone
+            self.cached_bits += len(cone) * 8
+            while self.cached_bits > self.cache_bits and len(self.cones) > 1:
+                _, evicted = self.cones.popitem(last=False)
+                self.cached_bits -= len(evicted) * 8
+
+    def forget(self, entry_hash):
+        """
+        Drop the cached cone of an entry whose insertion was rolled back, and its sequence number if it was the last
+        one handed out. Any other number it holds is reclaimed by the next release.
+        """
+        with self.lock:
+            cone = self.cones.pop(entry_hash, None)
+            if cone is not None:
+                self.cached_bits -= len(cone) * 8
+            if self.hashes and self.hashes[-1] == entry_hash:
+                self.hashes.pop()
+                del self.seq[entry_hash]
+
+    def release(self, horizon):
+        """
+        Release every entry below height horizon, and any entry no longer stored. The survivors are renumbered
+        and the cone cache is cleared, since cached cones are keyed by the old numbers.
+        """
+        with self.lock:
+            if horizon <= self.horizon:
+                return
+            self.horizon = horizon
+            kept = []
+            for entry_hash in self.hashes:
+                height = self._height(entry_hash)
+                if height is not None and height >= horizon:
+                    kept.append(entry_hash)
+            released = len(self.hashes) - len(kept)
+            # A new list, so a reader holding the old one still maps old bitsets correctly
+            self.hashes = kept
+            self.seq = {entry_hash: number for number, entry_hash in enumerate(kept)}
+            self.cones.clear()
+            self.cached_bits = 0
+        logger.info(f"Released {released} entries below height {horizon}")
+
+    def add_entry(self, entry):
+        """
+        Index a newly stored entry. Its cone is derived from its predecessors' cones when they are all cached;
+        otherwise it is computed on first query. Moves the horizon up once the entry is a quarter of depth past it.
+        """
+        entry_hash = entry.get('hash')
+        self.sequence(entry_hash)
+        self._advance(self._height(entry_hash))
+        with self.lock:
+            parts = []
+            for p_hash in entry.get('predecessor_hashes', []):
+                if database_access.get_predecessors(self.db, p_hash) is None or self._released(p_hash):
+                    continue
+                cone = self._cached(p_hash)
+                if cone is None:
+                    return
+                parts.append(cone)
+                parts.append(self._bit(p_hash))
+            self._cache(entry_hash, bitset_union(parts))
+
+    def _advance(self, height):
+        if height is None or self.depth is None:
+            return
+        with self.lock:
+            if self.top is None or height > self.top:
+                self.top = height
+            horizon = self.top - self.depth
+            if horizon >= self.horizon + max(1, self.depth // 4):
+                self.release(horizon)
+
+    def _bit(self, entry_hash):
+        number = self.sequence(entry_hash)
+        return (1 << number).to_bytes(number // 8 + 1, 'little')
+
+    def past_cone_bits(self, entry_hash):
+        """
+        Return the past cone of entry_hash above the horizon as a bitset over sequence numbers, computing and
+        caching it if needed. The walk stops at every cached cone, so only the part of the past that is not yet
+        indexed is visited. Hold self.lock while mapping bits back to hashes, since a release renumbers them.
+        """
+        with self.lock:
+            cone = self._cached(entry_hash)
+            if cone is not None:
+                return cone
+            members = []
+            cached = []
+            seen = set()
+            stack = list(database_access.get_predecessors(self.db, entry_hash) or [])
+            while stack:
+                p_hash = stack.pop()
+                if p_hash in seen:
+                    continue
+                seen.add(p_hash)
+                predecessors = database_access.get_predecessors(self.db, p_hash)
+                if predecessors is None or self._released(p_hash):
+                    continue
+                members.append(self.sequence(p_hash))
+                p_cone = self._cached(p_hash)
+                if p_cone is not None:
+                    cached.append(p_cone)
+                else:
+                    stack.extend(predecessors)
+            bits = bytearray((max(members) // 8 + 1) if members else 0)
+            for number in members:
+                bits[number >> 3] |= 1 << (number & 7)
+            cone = bitset_union([bytes(bits)] + cached)
+            self._cache(entry_hash, cone)
+            return cone
+
+    def _members(self, entry_hash):
+        # Hashes of the past cone above the horizon, read from the bitset
+        with self.lock:
+            cone = self.past_cone_bits(entry_hash)
+            hashes = self.hashes
+        members = []
+        for index, byte in enumerate(cone):
+            while byte:
+                low = byte & -byte
+                members.append(hashes[index * 8 + low.bit_length() - 1])
+                byte ^= low
+        return members
+
+    def _below_horizon(self, entry_hash, members, min_height=None):
+        # Plain walk over released ancestors, starting where the cone ends
+        if not self.horizon or (min_height is not None and min_height >= self.horizon):
+            return
+        seen = set(members)
+        queue = deque()
+        for current in chain([entry_hash], members):
+            queue.extend(database_access.get_predecessors(self.db, current) or [])
+        while queue:
+            p_hash = queue.popleft()
+            if p_hash in seen:
+                continue
+            seen.add(p_hash)
+            predecessors = database_access.get_predecessors(self.db, p_hash)
+            if predecessors is None:
+                continue
+            height = self._height(p_hash)
+            if min_height is not None and height is not None and height < min_height:
+                continue
+            yield p_hash
+            queue.extend(predecessors)
+
+    def past_cone(self, entry_hash):
+        """
+        Yield the hash of every entry in the past cone of entry_hash: indexed entries in sequence order,
+        then released ones.
+        """
+        members = self._members(entry_hash)
+        yield from members
+        yield from self._below_horizon(entry_hash, members)
+
+    def is_ancestor(self, ancestor_hash, entry_hash):
+        """
+        Return True if ancestor_hash is a direct or indirect predecessor of entry_hash.
+        Uses cached cones where available and never walks below the ancestor's height.
+        """
+        if ancestor_hash == entry_hash:
+            return False
+        floor = self._height(ancestor_hash)
+        height = self._height(entry_hash)
+        if floor is not None and height is not None and floor >= height:
+            return False
+        with self.lock:
+            # Cones only cover entries above the horizon, so a released ancestor is found by walking
+            use_cones = not self._released(ancestor_hash)
+            target = self.seq.get(ancestor_hash)
+            seen = {entry_hash}
+            queue = deque([entry_hash])
+            while queue:
+                current = queue.popleft()
+                cone = self._cached(current) if use_cones else None
+                if cone is not None:
+                    if target is not None and bitset_test(cone, target):
+                        return True
+                    # Cones are complete, so nothing behind current can be the ancestor either
+                    continue
+                for p_hash in database_access.get_predecessors(self.db, current) or []:
+                    if p_hash == ancestor_hash:
+                        return True
+                    if p_hash in seen:
+                        continue
+                    seen.add(p_hash)
+                    p_height = self._height(p_hash)
+                    if floor is not None and p_height is not None and p_height <= floor:
+                        continue
+                    queue.append(p_hash)
+            return False
+
+    def is_descendant(self, descendant_hash, entry_hash):
+        return self.is_ancestor(entry_hash, descendant_hash)
+
+    def ancestors(self, entry_hash, min_height=None):
+        """
+        Yield the stored ancestors of entry_hash highest first, skipping those below min_height.
+        Indexed ancestors come from the past-cone bitset; released ones follow from a walk below the horizon.
+        """
+        members = self._members(entry_hash)
+        heights = {member: self._height(member) for member in members}
+        if min_height is not None:
+            members = [member for member in members if heights[member] is None or heights[member] >= min_height]
+        members.sort(key=lambda member: (-(heights[member] or 0), member))
+        yield from members
+        yield from self._below_horizon(entry_hash, members, min_height)
+
+    def descendants(self, entry_hash, max_height=None, page_size=100):
+        """
+        Yield the descendants of entry_hash lowest first, skipping those above max_height.
+        Candidates come from the height index, a page at a time, and each is kept if its past-cone bitset
+        holds entry_hash. Released entries and stores without a height index fall back to walking successors.
+        """
+        height = self._height(entry_hash)
+        if height is None or self._released(entry_hash) or not hasattr(getattr(self.db, 'height_index', None), 'range'):
+            yield from self._successor_walk(entry_hash, max_height)
+            return
+        end = max_height + 1 if max_height is not None else None
+        after = None
+        while True:
+            page = database_access.get_entries_by_height(self.db, height + 1, end, after, page_size)
+            for _, candidate in page:
+                with self.lock:
+                    target = self.sequence(entry_hash)
+                    found = bitset_test(self.past_cone_bits(candidate), target)
+                if found:
+                    yield candidate
+            if len(page) < page_size:
+                return
+            after = page[-1]
+
+    def _successor_walk(self, entry_hash, max_height=None):
+        seen = set()
+        queue = deque(database_access.get_successors(self.db, entry_hash))
+        while queue:
+            s_hash = queue.popleft()
+            if s_hash in seen:
+                continue
+            seen.add(s_hash)
+            if max_height is not None:
+                height = self._height(s_hash)
+                if height is not None and height > max_height:
+                    continue
+            yield s_hash
+            queue.extend(database_access.get_successors(self.db, s_hash))
+
+    def stats(self):
+        with self.lock:
+            return {'sequenced': len(self.hashes), 'cached_cones': len(self.cones), 'cached_bits': self.cached_bits,
+                    'horizon': self.horizon}
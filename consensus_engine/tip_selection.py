@@ -0,0 +1,130 @@
+"""
+tip_selection.py
+
+Selects tips for new entries to reference, so that miners spread their approvals across the DAG.
+
+Functions:
+1. Checkpoint: Each walk starts a configurable depth behind a random tip, so its cost is bounded
+   by the recent part of the DAG rather than its full history.
+2. Cumulative Weight: The weight of an entry is one plus the number of distinct entries that approve it
+   directly or indirectly, computed over the checkpoint's future cone with bitsets.
+3. Weighted Random Walk: From the checkpoint, the walker steps to a successor with probability
+   proportional to exp(alpha * (W(successor) - W(heaviest successor))) until it reaches a tip.
+   alpha = 0 gives a uniform walk; large alpha follows the heaviest branch.
+   Weights persisted by weight_accumulation.py are read directly; the cone is only counted when they are missing,
+   at most once per walk.
+Configured under "tip_selection" in config/pof_parameters.json.
+"""
+
+import json
+import logging
+import math
+import os
+import random
+
+from lib import database_access
+
+logger = logging.getLogger('tip_selection')
+
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'pof_parameters.json')
+with open(config_path, 'r') as f:
+    tip_config = json.load(f).get('tip_selection', {})
+
+class TipSelector:
+    def __init__(self, db, alpha=None, depth=None, rng=None):
+        self.db = db
+        self.alpha = tip_config.get('alpha', 0.01) if alpha is None else alpha
+        self.depth = tip_config.get('depth', 15) if depth is None else depth
+        self.rng = rng or random.Random()
+
+    def find_checkpoint(self, tips):
+        """
+        Walk back `depth` steps from a random tip along random predecessors that are still stored.
+        """
+        current = self.rng.choice(tips)
+        for _ in range(self.depth):
+            entry = database_access.get_entry(self.db, current)
+            predecessors = [p for p in (entry or {}).get('predecessor_hashes', [])
+                            if database_access.get_entry(self.db, p) is not None]
+            if not predecessors:
+                break
+            current = self.rng.choice(predecessors)
+        return current
+
+    def cone_weights(self, checkpoint):
+        """
+        Return the cumulative weight of every entry in the future cone of checkpoint.
+        Every approver of a cone entry is itself in the cone, so the weights are exact.
+        """
+        # Collect the cone breadth-first, then fold descendant bitsets back from the tips
+        order = [checkpoint]
+        index = {checkpoint: 0}
+        children = []
+        position = 0
+        while position < len(order):
+            successors = database_access.get_successors(self.db, order[position])
+            kids = []
+            for child in successors:
+                if child not in index:
+                    index[child] = len(order)
+                    order.append(child)
+                kids.append(index[child])
+            children.append(kids)
+            position += 1
+
+        heights = [database_access.get_height(self.db, h) or 0 for h in order]
+        descendants = [0] * len(order)
+        for i in sorted(range(len(order)), key=lambda i: heights[i], reverse=True):
+            bits = 0
+            for child in children[i]:
+                bits |= descendants[child] | (1 << child)
+            descendants[i] = bits
+        return {h: 1 + bin(descendants[i]).count('1') for h, i in index.items()}
+
+    def walk(self, checkpoint):
+        """
+        Random-walk from checkpoint towards the tips and return the tip reached.
+        """
+        weights = None
+        current = checkpoint
+        while True:
+            successors = database_access.get_successors(self.db, current)
+            stored = [database_access.get_weight(self.db, s) for s in successors]
+            if None in stored:
+                # Weights are not persisted for every successor; fall back to counting the cone
+                if weights is None:
+                    weights = self.cone_weights(checkpoint)
+                successors = [s for s in successors if s in weights]
+                stored = [weights[s] for s in successors]
+            if not successors:
+                return current
+            heaviest = max(stored)
+            scores = [math.exp(self.alpha * (w - heaviest)) for w in stored]
+            current = self.rng.choices(successors, weights=scores)[0]
+
+    def select_tips(self, count=3, strategy='walk'):
+        """
+        Return up to `count` distinct tips.
+        strategy='walk' runs one weighted random walk per tip; strategy='all' returns the tip set as is.
+        """
+        tips = database_access.get_tips(self.db)
+        if strategy == 'all':
+            return tips[:count]
+        if strategy != 'walk':
+            raise ValueError(f"Unknown tip selection strategy: {strategy}")
+        if len(tips) <= count:
+            return tips
+        selected = []
+        # A few extra walks make up for walkers that land on a tip already picked
+        for _ in range(count * 4):
+            tip = self.walk(self.find_checkpoint(tips))
+            if tip not in selected:
+                selected.append(tip)
+                if len(selected) == count:
+                    break
+        for tip in self.rng.sample(tips, len(tips)):
+            if len(selected) == count:
+                break
+            if tip not in selected:
+                selected.append(tip)
+        return selected
@@ -6,6 +6,7 @@ from lib import database_access
 import json
 import logging
 import os
+from threading import Lock
 
 logger = logging.getLogger('token_rewards')
 
@@ -25,21 +26,66 @@ def reward_miner(db, miner_id):
     vault_share = int(reward_amount * 0.05)
     miner_share = reward_amount - vault_share
 
-    # Get current balances
-    current_balance = database_access.get_token_balance(db, miner_id) or 0
-    vault_balance = database_access.get_vault_balance(db) or 0
+    with database_access.transaction(db, [('token_balances', miner_id), ('vault_balance', None)]):
+        # Get current balances
+        current_balance = database_access.get_token_balance(db, miner_id) or 0
+        vault_balance = database_access.get_vault_balance(db) or 0
 
-    # Update miner balance
-    new_balance = current_balance + miner_share
-    database_access.store_token_balance(db, miner_id, new_balance)
+        # Update miner balance
+        new_balance = current_balance + miner_share
+        database_access.store_token_balance(db, miner_id, new_balance)
 
-    # Update vault balance
-    new_vault_balance = vault_balance + vault_share
-    database_access.store_vault_balance(db, new_vault_balance)
+        # Update vault balance
+        new_vault_balance = vault_balance + vault_share
+        database_access.store_vault_balance(db, new_vault_balance)
 
     logger.info(f"Rewarded miner {miner_id} with {miner_share} WŁC tokens. New balance: {new_balance}")
     logger.info(f"Added {vault_share} WŁC tokens to vault. New vault balance: {new_vault_balance}")
 
+# Serializes settlement, so two settlers never pay the same finality records
+_settle_lock = Lock()
+
+def reward_miners(db, rewards):
+    """
+    Pay several entry rewards in one transaction.
+    rewards maps each miner_id to the number of entries it is rewarded for.
+    The vault is updated once for the whole batch.
+    """
+    tokenomics = pof_parameters.get('tokenomics', {})
+    reward_amount = tokenomics.get('initial_reward', 50)
+    vault_share = int(reward_amount * 0.05)
+    miner_share = reward_amount - vault_share
+
+    balances = [('token_balances', miner_id) for miner_id in rewards] + [('vault_balance', None)]
+    with database_access.transaction(db, balances):
+        for miner_id, count in rewards.items():
+            current_balance = database_access.get_token_balance(db, miner_id) or 0
+            database_access.store_token_balance(db, miner_id, current_balance + miner_share * count)
+        vault_balance = database_access.get_vault_balance(db) or 0
+        database_access.store_vault_balance(db, vault_balance + vault_share * sum(rewards.values()))
+
+    logger.info(f"Rewarded {len(rewards)} miners for {sum(rewards.values())} entries")
+
+def settle_finality_rewards(db, min_batch=1, limit=None):
+    """
+    Pay the miner rewards owed by finality records that have not been settled yet, in one transaction
+    that also advances the log's reward watermark. Nothing is paid while fewer than min_batch are pending.
+    Returns the number of records settled.
+    """
+    with _settle_lock:
+        records = database_access.get_unrewarded_finality(db, limit)
+        if not records or len(records) < min_batch:
+            return 0
+        rewards = {}
+        for record in records:
+            if record.get('miner_id'):
+                rewards[record['miner_id']] = rewards.get(record['miner_id'], 0) + 1
+        with database_access.transaction(db, [('token_balances', m) for m in rewards] + [('vault_balance', None)]):
+            if rewards:
+                reward_miners(db, rewards)
+            database_access.store_finality_rewarded(db, records[-1]['seq'])
+    return len(records)
+
 def mint_liquid_reward_tokens(db, usdt_amount, recipient_id):
     """
     Mint LiquidRewardWaclainium (LRW) tokens proportional to USDT donations.
@@ -47,12 +93,9 @@ def mint_liquid_reward_tokens(db, usdt_amount, recipient_id):
     # Assume 1 USDT = 1 LRW for simplicity
     lrw_amount = usdt_amount
 
-    # Get current LRW balance
-    current_lrw_balance = database_access.get_lrw_balance(db, recipient_id) or 0
-
-    # Update LRW balance
-    new_lrw_balance = current_lrw_balance + lrw_amount
-    database_access.store_lrw_balance(db, recipient_id, new_lrw_balance)
+    # Credit the recipient atomically so concurrent mints to the same account are not lost
+    new_lrw_balance = database_access.update_balance(
+        db, 'lrw_balances', recipient_id, lambda balance: (balance or 0) + lrw_amount)
 
     logger.info(f"Minted {lrw_amount} LRW tokens to {recipient_id}. New LRW balance: {new_lrw_balance}")
 
@@ -60,16 +103,17 @@ def stake_tokens(db, user_id, amount):
     """
     Stake WŁC tokens to earn 5% APR rewards.
     """
-    current_balance = database_access.get_token_balance(db, user_id)
-    if current_balance < amount:
-        raise ValueError("Insufficient WŁC balance to stake")
+    with database_access.transaction(db, [('token_balances', user_id), ('stake_balances', user_id)]):
+        current_balance = database_access.get_token_balance(db, user_id)
+        if current_balance < amount:
+            raise ValueError("Insufficient WŁC balance to stake")
 
-    current_stake = database_access.get_stake_balance(db, user_id)
-    new_stake = current_stake + amount
-    database_access.store_stake_balance(db, user_id, new_stake)
+        current_stake = database_access.get_stake_balance(db, user_id)
+        new_stake = current_stake + amount
+        database_access.store_stake_balance(db, user_id, new_stake)
 
-    new_balance = current_balance - amount
-    database_access.store_token_balance(db, user_id, new_balance)
+        new_balance = current_balance - amount
+        database_access.store_token_balance(db, user_id, new_balance)
 
     logger.info(f"User {user_id} staked {amount} WŁC tokens. New stake: {new_stake}, New balance: {new_balance}")
 
@@ -77,16 +121,17 @@ def unstake_tokens(db, user_id, amount):
     """
     Unstake WŁC tokens.
     """
-    current_stake = database_access.get_stake_balance(db, user_id)
-    if current_stake < amount:
-        raise ValueError("Insufficient staked balance to unstake")
+    with database_access.transaction(db, [('token_balances', user_id), ('stake_balances', user_id)]):
+        current_stake = database_access.get_stake_balance(db, user_id)
+        if current_stake < amount:
+            raise ValueError("Insufficient staked balance to unstake")
 
-    current_balance = database_access.get_token_balance(db, user_id)
-    new_stake = current_stake - amount
-    database_access.store_stake_balance(db, user_id, new_stake)
+        current_balance = database_access.get_token_balance(db, user_id)
+        new_stake = current_stake - amount
+        database_access.store_stake_balance(db, user_id, new_stake)
 
-    new_balance = current_balance + amount
-    database_access.store_token_balance(db, user_id, new_balance)
+        new_balance = current_balance + amount
+        database_access.store_token_balance(db, user_id, new_balance)
 
     logger.info(f"User {user_id} unstaked {amount} WŁC tokens. New stake: {new_stake}, New balance: {new_balance}")
 
@@ -102,9 +147,11 @@ def distribute_staking_rewards(db):
     if not hasattr(db, 'stake_balances'):
         return
 
-    for user_id, stake_amount in db.stake_balances.items():
-        reward = stake_amount * daily_rate
-        current_rewards = database_access.get_staking_rewards(db, user_id)
-        new_rewards = current_rewards + reward
-        database_access.store_staking_rewards(db, user_id, new_rewards)
-        logger.info(f"Distributed {reward:.6f} staking rewards to {user_id}. Total rewards: {new_rewards:.6f}")
+    # One write for the whole distribution instead of one per staker; it locks every account while it runs
+    with database_access.transaction(db):
+        for user_id, stake_amount in db.stake_balances.items():
+            reward = stake_amount * daily_rate
+            current_rewards = database_access.get_staking_rewards(db, user_id)
+            new_rewards = current_rewards + reward
+            database_access.store_staking_rewards(db, user_id, new_rewards)
+            logger.info(f"Distributed {reward:.6f} staking rewards to {user_id}. Total rewards: {new_rewards:.6f}")
@@ -4,11 +4,22 @@ weight_accumulation.py
 Calculates the accumulated weight of DAG entries to assess their validity and confirmation status.
 Features:
 1. Base Weight: Assigns initial weight to each entry.
-2. Reference Weight: Adds weight from subsequent entries referencing it.
-3. Level-Specific Calculation: Computes weights per confirmation level.
-4. Storage: Updates weights in database via database_access.py.
+2. Reference Weight: An entry's cumulative weight is its base weight plus the base weight of every distinct
+   entry that references it directly or indirectly.
+3. Incremental Propagation: When an entry is inserted, its base weight is added once to each unique ancestor
+   in its past cone. Ancestors at the freeze level (final entries) keep the weight they were frozen with, but
+   the walk passes through them to the non-final entries behind, so every non-final weight matches
+   compute_accumulated_weight. It stops below the lowest non-final height, so an insert writes one weight
+   per non-final ancestor: bounded by how far finality trails the tips, not by the size of the ledger.
+   Batches (propagate_weights) add up the deltas of all their entries first and write each ancestor once.
+4. Level-Specific Calculation: Computes weights per confirmation level.
+5. Storage: Updates weights in database via database_access.py, so lookups are a single O(1) read.
 """
 
+from collections import deque
+import json
+import os
+
 from lib import database_access
 import logging
 from consensus_engine.audit_report import setup_audit_logger
@@ -16,28 +27,107 @@ from consensus_engine.audit_report import setup_audit_logger
 logger = logging.getLogger('weight_accumulation')
 audit_logger = setup_audit_logger()
 
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'pof_parameters.json')
+with open(config_path, 'r') as f:
+    weight_config = json.load(f).get('weight_propagation', {})
+
+# Entries at this level are final; their weight no longer matters, so propagation leaves it as it is
+FREEZE_LEVEL = weight_config.get('freeze_level', 3)
+
 def get_base_weight(entry_hash):
     # Placeholder: base weight could be fixed or based on submitter stake
     return 1
 
-def get_accumulated_weight(db, entry_hash, level=0):
+def propagate_weight(db, entry_hash, entry=None):
     """
-    Recursively calculate accumulated weight for an entry at a given level.
+    Give a newly inserted entry its base weight and add that weight once to each unique, non-final ancestor.
+    Call it once per entry, right after the entry is stored; the writes are committed as one batch.
+    Returns the number of ancestors updated.
     """
-    entry = database_access.get_entry(db, entry_hash)
-    if not entry:
+    entry = entry or database_access.get_entry(db, entry_hash)
+    if entry is None:
         return 0
+    return propagate_weights(db, [entry])
 
-    weight = get_base_weight(entry_hash)
+def _past_cone(db, entry, floor=None):
+    """
+    Yield each unique, non-final ancestor of entry once.
+    Final ancestors are walked through, since entries behind them may still be non-final. The walk stops
+    below floor, the lowest height of any non-final entry, as nothing there needs updating.
+    """
+    seen = set()
+    queue = deque(entry.get('predecessor_hashes', []))
+    while queue:
+        p_hash = queue.popleft()
+        if p_hash in seen:
+            continue
+        seen.add(p_hash)
+        if floor is not None:
+            height = database_access.get_height(db, p_hash)
+            if height is not None and height < floor:
+                continue
+        p_entry = database_access.get_entry(db, p_hash)
+        if p_entry is None:
+            continue
+        if p_entry.get('level', 0) < FREEZE_LEVEL:
+            yield p_hash
+        queue.extend(p_entry.get('predecessor_hashes', []))
 
-    entry_refs = database_access.get_entry_references(db, entry_hash)
-    references = entry_refs.get('references', [])
-    for ref_hash in references:
-        ref_weight = get_accumulated_weight(db, ref_hash, level)
-        weight += ref_weight
+def propagate_weights(db, entries):
+    """
+    Propagate the weights of a batch of newly inserted entries, all stored already.
+    The deltas every entry adds to its ancestors are summed first, so an ancestor shared by the whole
+    batch is written once instead of once per entry. Returns the number of stored ancestors updated.
+    """
+    entries = [entry for entry in entries if entry is not None]
+    new = {entry.get('hash'): get_base_weight(entry.get('hash')) for entry in entries}
+    deltas = {}
+    floor = database_access.get_min_height_below_level(db, FREEZE_LEVEL)
+    for entry in entries:
+        base = new[entry.get('hash')]
+        for p_hash in _past_cone(db, entry, floor):
+            deltas[p_hash] = deltas.get(p_hash, 0) + base
+    updated = 0
+    with database_access.transaction(db, []):
+        for entry_hash, base in new.items():
+            update_weight(db, entry_hash, base + deltas.pop(entry_hash, 0), audit=False)
+        for p_hash, delta in deltas.items():
+            weight = database_access.get_weight(db, p_hash)
+            # A weight computed from scratch already counts the new entries through the successor index
+            weight = compute_accumulated_weight(db, p_hash) if weight is None else weight + delta
+            update_weight(db, p_hash, weight, audit=False)
+            updated += 1
+    audit_logger.event('weight_propagated', entry_hashes=list(new), ancestors=updated)
+    return updated
 
-    audit_logger.info(f"Calculated accumulated weight for {entry_hash}: {weight}")
+def compute_accumulated_weight(db, entry_hash):
+    """
+    Compute an entry's cumulative weight from scratch with one walk over its future cone.
+    Only needed for entries stored before weights were persisted.
+    """
+    weight = get_base_weight(entry_hash)
+    seen = set()
+    queue = deque(database_access.get_successors(db, entry_hash))
+    while queue:
+        s_hash = queue.popleft()
+        if s_hash in seen:
+            continue
+        seen.add(s_hash)
+        weight += get_base_weight(s_hash)
+        queue.extend(database_access.get_successors(db, s_hash))
+    return weight
 
+def get_accumulated_weight(db, entry_hash, level=0):
+    """
+    Return the cumulative weight of an entry, read from the stored weights in O(1).
+    """
+    weight = database_access.get_weight(db, entry_hash)
+    if weight is not None:
+        return weight
+    if not database_access.get_entry(db, entry_hash):
+        return 0
+    weight = compute_accumulated_weight(db, entry_hash)
+    update_weight(db, entry_hash, weight)
     return weight
 
 def get_weight_at_level(db, entry_hash, level):
@@ -47,7 +137,8 @@ def get_weight_at_level(db, entry_hash, level):
     # For now, call get_accumulated_weight with level
     return get_accumulated_weight(db, entry_hash, level)
 
-def update_weight(db, entry_hash, weight):
+def update_weight(db, entry_hash, weight, audit=True):
     database_access.store_weight(db, entry_hash, weight)
-    logger.info(f"Updated weight for {entry_hash}: {weight}")
-    audit_logger.info(f"Updated weight for {entry_hash}: {weight}")
+    logger.debug(f"Updated weight for {entry_hash}: {weight}")
+    if audit:
+        audit_logger.event('weight_updated', entry_hash=entry_hash, weight=weight)
@@ -0,0 +1,162 @@
+"""
+async_db.py
+
+Non-blocking asyncio facade over database_access.
+Features:
+1. Dedicated Writer: Every write runs on a single writer thread, so coroutines never wait on disk I/O.
+2. Batched Commits: Writes queued while the writer is busy are applied in one transaction,
+   so a burst of store_entry calls costs one persist instead of one per call.
+3. Error Isolation: Each write runs in a savepoint, so a failing write is reverted on its own and the rest
+   of the batch still commits.
+4. Lock Order: Writes that go through a ledger service take its lock before the db's transaction lock.
+   Pass that lock as lock, so a batch takes it before opening its transaction and every path acquires
+   the two in the same order.
+5. Awaitable Reads: get_entry and the balance getters run in a thread pool and are awaited.
+"""
+
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from lib import database_access
+
+logger = logging.getLogger('async_db')
+
+class AsyncLedger:
+    def __init__(self, db, max_batch=256, read_workers=4, lock=None):
+        self.db = db
+        self.lock = lock
+        self.max_batch = max_batch
+        self.writes = queue.Queue()
+        self.readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix='ledger-reader')
+        self.closed = False
+        self.writer = threading.Thread(target=self._write_loop, name='ledger-writer', daemon=True)
+        self.writer.start()
+
+    def _write_loop(self):
+        while True:
+            job = self.writes.get()
+            if job is None:
+                return
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self.writes.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            self._apply(batch)
+            if stop:
+                return
+
+    def _apply(self, batch):
+        # Writes lock the balances they touch themselves, so the batch holds no balance locks of its own
+        outcomes = []
+        try:
+            with self.lock or nullcontext(), database_access.transaction(self.db, []):
+                for fn, args, _, _ in batch:
+                    try:
+                        # A failing write only reverts its own changes; the rest of the batch still commits
+                        with database_access.savepoint(self.db):
+                            outcomes.append((fn(*args), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+        except Exception as e:
+            # Persisting the batch failed, so none of its writes took effect
+            outcomes = [(None, e)] * len(batch)
+        for (_, _, future, loop), (result, error) in zip(batch, outcomes):
+            self._resolve(future, loop, result=result, error=error)
+
+    def _resolve(self, future, loop, result=None, error=None):
+        def settle():
+            if future.cancelled():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        loop.call_soon_threadsafe(settle)
+
+    def write(self, fn, *args):
+        """
+        Queue fn(*args) for the writer thread and return an awaitable for its result.
+        fn receives nothing implicitly; pass the db in args when it needs it. A failed write is reverted
+        through the db, so fn should only change state through the db, deferring side effects with
+        database_access.after_commit.
+        """
+        if self.closed:
+            raise RuntimeError("Async ledger is closed")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.writes.put((fn, args, future, loop))
+        return future
+
+    def read(self, fn, *args):
+        """
+        Run fn(*args) in the reader pool and return an awaitable for its result.
+        """
+        return asyncio.get_running_loop().run_in_executor(self.readers, fn, *args)
+
+    async def get_entry(self, entry_hash):
+        return await self.read(database_access.get_entry, self.db, entry_hash)
+
+    async def check_entry_exists(self, entry_hash):
+        return await self.read(database_access.check_entry_exists, self.db, entry_hash)
+
+    async def store_entry(self, entry_hash, entry):
+        return await self.write(database_access.store_entry, self.db, entry_hash, entry)
+
+    async def get_token_balance(self, account):
+        return await self.read(database_access.get_token_balance, self.db, account)
+
+    async def get_lrw_balance(self, account):
+        return await self.read(database_access.get_lrw_balance, self.db, account)
+
+    async def get_stake_balance(self, account):
+        return await self.read(database_access.get_stake_balance, self.db, account)
+
+    async def get_level_counts(self):
+        return await self.read(database_access.get_level_counts, self.db)
+
+    async def store_token_balance(self, account, balance):
+        return await self.write(database_access.store_token_balance, self.db, account, balance)
+
+    async def update_balance(self, table, account, update):
+        return await self.write(database_access.update_balance, self.db, table, account, update)
+
+    def close(self):
+        """
+        Finish every queued write, then stop the writer and reader threads.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.writes.put(None)
+        self.writer.join()
+        self.readers.shutdown(wait=True)
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+def get_async_ledger(db=None, lock=None):
+    """
+    Return the shared AsyncLedger for db (database_access.db_instance by default).
+    lock is the ledger service lock its writes take (see AsyncLedger), if they go through a service.
+    """
+    db = database_access.db_instance if db is None else db
+    with _ledgers_lock:
+        ledger = _ledgers.get(id(db))
+        if ledger is None or ledger.closed:
+            ledger = _ledgers[id(db)] = AsyncLedger(db, lock=lock)
+            atexit.register(ledger.close)
+        elif lock is not None and ledger.lock is None:
+            ledger.lock = lock
+        return ledger
@@ -0,0 +1,120 @@
+"""
+bloom_filter.py
+
+Scalable Bloom filter used as a fast path for duplicate-entry detection.
+Features:
+1. Definite Negatives: A miss proves an entry hash was never stored, without touching the entry store.
+2. Scalable Growth: When a stage fills up, a larger stage with a tighter error rate is added.
+3. Persistence: The filter is saved next to the ledger and reloaded on restart. It is saved with a
+   fingerprint of the keys added to it, so a reload can tell whether it still matches the ledger.
+4. Thread Safety: ScalableBloomFilter serializes adds and saves, so concurrent writers never lose bits.
+"""
+
+import hashlib
+import json
+import math
+import os
+from threading import Lock
+
+FILTER_VERSION = 2
+GROWTH_FACTOR = 2
+TIGHTENING_RATIO = 0.5
+
+def key_fingerprint(key):
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def fingerprint(keys):
+    """
+    Return an order-independent fingerprint of a set of keys: the XOR of their 64-bit digests.
+    """
+    result = 0
+    for key in keys:
+        result ^= key_fingerprint(key)
+    return result
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        # Not thread-safe on its own: the read-modify-write of a byte can drop a concurrent writer's bit
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class ScalableBloomFilter:
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.initial_capacity = capacity
+        self.error_rate = error_rate
+        self.filters = [BloomFilter(capacity, error_rate * TIGHTENING_RATIO)]
+        self.entries = 0
+        self.fingerprint = 0
+        self.lock = Lock()
+
+    def add(self, key):
+        with self.lock:
+            current = self.filters[-1]
+            if current.count >= current.capacity:
+                current = BloomFilter(current.capacity * GROWTH_FACTOR, current.error_rate * TIGHTENING_RATIO)
+                self.filters.append(current)
+            current.add(key)
+            self.entries += 1
+            self.fingerprint ^= key_fingerprint(key)
+
+    def __contains__(self, key):
+        return any(key in f for f in self.filters)
+
+    def __len__(self):
+        return self.entries
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with self.lock, open(tmp_path, 'wb') as f:
+            header = {
+                'version': FILTER_VERSION,
+                'capacity': self.initial_capacity,
+                'error_rate': self.error_rate,
+                'entries': self.entries,
+                'fingerprint': self.fingerprint,
+                'filters': [{'capacity': f.capacity, 'error_rate': f.error_rate, 'count': f.count}
+                            for f in self.filters],
+            }
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for bloom in self.filters:
+                f.write(bloom.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a filter saved with save(), or return None if there is no usable file.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != FILTER_VERSION:
+                return None
+            bloom = cls(header['capacity'], header['error_rate'])
+            bloom.filters = []
+            for spec in header['filters']:
+                stage = BloomFilter(spec['capacity'], spec['error_rate'], count=spec['count'])
+                stage.bits = bytearray(f.read(len(stage.bits)))
+                bloom.filters.append(stage)
+            bloom.entries = header['entries']
+            bloom.fingerprint = header['fingerprint']
+        return bloom
@@ -1,81 +1,524 @@
 """
 Improved implementation of database_access module with basic file-based persistence.
+
+The storage engine backing db_instance is selected by config/storage_config.json:
+- json: the whole ledger is rewritten to a single JSON file on every mutation.
+- wal: every mutation is appended to a log segment (see ledger_log.py).
+- sqlite: tables and indexes in an SQLite database, nothing held in RAM (see sqlite_store.py).
 """
 
+import atexit
+import itertools
 import json
 import os
-from threading import Lock
+import time
+from collections.abc import MutableMapping, MutableSet
+from contextlib import ExitStack, contextmanager, nullcontext
+from threading import Lock, RLock, local
+
+from lib.balance_store import StripedBalanceStore
+from lib.bloom_filter import ScalableBloomFilter, fingerprint
+from lib.entry_codec import CompactEntryStore
+from lib.finality_log import FinalityLog
+from lib.level_index import LevelIndex
+from lib.range_index import RangeIndex
+from lib.time_series import RingSeries, DifficultySeries
+
+# Load storage configuration from JSON config file
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'storage_config.json')
+with open(config_path, 'r') as f:
+    storage_config = json.load(f)
+
+series_config = storage_config.get('time_series', {})
+filter_config = storage_config.get('entry_filter', {})
+# 'compact' keeps entries as 32-byte keys and binary bodies (see entry_codec.py); 'json' keeps plain dicts
+entry_encoding = storage_config.get('entry_encoding', 'json')
+
+# Balance tables and the log op that persists each of them; 'vault_balance' is a single global account
+BALANCE_OPS = {
+    'token_balances': 'token_balance',
+    'lrw_balances': 'lrw_balance',
+    'stake_balances': 'stake_balance',
+    'staking_rewards': 'staking_rewards',
+}
+VAULT = 'vault_balance'
+MISSING = object()
 
 class PersistentDB:
+    # The JSON file is rewritten from memory as a whole, so only one transaction may be open at a time
+    serialize_transactions = True
+
     def __init__(self, filepath='ledger_db.json'):
         self.filepath = filepath
         self.lock = Lock()
+        self.txn_lock = RLock()
+        self.txn_state = local()
+        self.vault_lock = RLock()
+        # Counts the mutations made through this instance, so a snapshot can tell the ledger has moved on
+        self.versions = itertools.count(1)
+        self.version = 0
         self._load()
+        self._attach_archives()
+        self._load_entry_filter()
 
     def _load(self):
+        data = {}
         if os.path.exists(self.filepath):
             with open(self.filepath, 'r') as f:
                 data = json.load(f)
-            self.entries = data.get('entries', {})
-            self.invalid_entries = set(data.get('invalid_entries', []))
-            self.token_balances = data.get('token_balances', {})
-            self.difficulties = data.get('difficulties', [])
-            self.timestamps = data.get('timestamps', [])
-            self.vault_balance = data.get('vault_balance', 0)
-            self.lrw_balances = data.get('lrw_balances', {})
-            self.stake_balances = data.get('stake_balances', {})
-            self.staking_rewards = data.get('staking_rewards', {})
+        self._load_state(data)
+
+    def _load_state(self, data):
+        self.entries = data.get('entries', {})
+        if entry_encoding == 'compact':
+            self.entries = CompactEntryStore(self.entries)
+        self.invalid_entries = set(data.get('invalid_entries', []))
+        self.token_balances = StripedBalanceStore(data.get('token_balances', {}))
+        capacity = series_config.get('capacity', 4096)
+        self.difficulties = DifficultySeries(capacity, values=data.get('difficulties', []))
+        self.timestamps = RingSeries(capacity, typecode='d', values=data.get('timestamps', []))
+        self.vault_balance = data.get('vault_balance', 0)
+        self.lrw_balances = StripedBalanceStore(data.get('lrw_balances', {}))
+        self.stake_balances = StripedBalanceStore(data.get('stake_balances', {}))
+        self.staking_rewards = StripedBalanceStore(data.get('staking_rewards', {}))
+        self.successors = data.get('successors')
+        if self.successors is None:
+            # Ledgers written before the successor index existed are indexed in one pass
+            self.successors = {}
+            for entry_hash, entry in self.entries.items():
+                index_successors(self, entry_hash, entry)
+        self.heights = data.get('heights')
+        self.tips = set(data.get('tips', []))
+        if self.heights is None:
+            # Ledgers written before tips and heights were stored get them in one pass
+            self.heights = {}
+            rebuild_dag_indexes(self, sorted(self.entries.items(), key=lambda item: item[1].get('timestamp') or 0))
+        self.weights = data.get('weights', {})
+        # Range indexes are derived from heights and timestamps, so they are rebuilt rather than stored
+        self.height_index = RangeIndex((height, entry_hash) for entry_hash, height in self.heights.items())
+        self.time_index = RangeIndex((entry['timestamp'], entry_hash) for entry_hash, entry in self.entries.items()
+                                     if entry.get('timestamp') is not None)
+        # Latency histograms only cover promotions seen by this process, so they survive a reload but are not stored
+        latency = getattr(getattr(self, 'level_index', None), 'latency', {})
+        self.level_index = LevelIndex((entry_hash, entry.get('level', 0)) for entry_hash, entry in self.entries.items())
+        self.level_index.latency = latency
+        self.finality_log = FinalityLog(data.get('finality_log', []), data.get('finality_rewarded', 0))
+
+    def _dump_state(self):
+        return {
+            'entries': dict(self.entries.items()),
+            'invalid_entries': list(self.invalid_entries),
+            'token_balances': dict(self.token_balances.items()),
+            'difficulties': self.difficulties.tolist(),
+            'timestamps': self.timestamps.tolist(),
+            'vault_balance': self.vault_balance,
+            'lrw_balances': dict(self.lrw_balances.items()),
+            'stake_balances': dict(self.stake_balances.items()),
+            'staking_rewards': dict(self.staking_rewards.items()),
+            'successors': self.successors,
+            'heights': self.heights,
+            'tips': list(self.tips),
+            'weights': self.weights,
+            'finality_log': list(self.finality_log.records),
+            'finality_rewarded': self.finality_log.rewarded,
+        }
+
+    def _attach_archives(self):
+        """
+        Start archiving points that fall out of the time series rings.
+        Done after loading, so points replayed at startup are not archived a second time.
+        """
+        directory = series_config.get('archive_directory')
+        if directory:
+            self.timestamps.archive_path = os.path.join(directory, 'timestamps.bin')
+            self.difficulties.archive_path = os.path.join(directory, 'difficulties.jsonl')
+
+    def _load_entry_filter(self):
+        """
+        Load the persisted duplicate-detection filter, rebuilding it if it does not cover exactly the stored entries.
+        """
+        self.entry_filter = None
+        if not filter_config.get('enabled', True):
+            return
+        self.entry_filter_path = self.filepath + '.bloom'
+        entry_filter = ScalableBloomFilter.load(self.entry_filter_path)
+        # Matching counts prove nothing if the ledger was rewritten or restored; the key fingerprint does
+        if entry_filter is None or entry_filter.fingerprint != fingerprint(self.entries):
+            entry_filter = ScalableBloomFilter(filter_config.get('capacity', 100000),
+                                               filter_config.get('error_rate', 0.001))
+            for entry_hash in self.entries:
+                entry_filter.add(entry_hash)
+            self.entry_filter_saved = 0 if len(entry_filter) == 0 else None
         else:
-            self.entries = {}
-            self.invalid_entries = set()
-            self.token_balances = {}
-            self.difficulties = []
-            self.timestamps = []
-            self.vault_balance = 0
-            self.lrw_balances = {}
-            self.stake_balances = {}
-            self.staking_rewards = {}
+            self.entry_filter_saved = len(entry_filter)
+        self.entry_filter = entry_filter
+
+    def close(self):
+        # Only write the filter back if it changed since it was loaded
+        if self.entry_filter is not None and len(self.entry_filter) != self.entry_filter_saved:
+            self.entry_filter.save(self.entry_filter_path)
+            self.entry_filter_saved = len(self.entry_filter)
 
     def _save(self):
         with self.lock:
-            data = {
-                'entries': self.entries,
-                'invalid_entries': list(self.invalid_entries),
-                'token_balances': self.token_balances,
-                'difficulties': self.difficulties,
-                'timestamps': self.timestamps,
-                'vault_balance': self.vault_balance,
-                'lrw_balances': self.lrw_balances,
-                'stake_balances': self.stake_balances,
-                'staking_rewards': self.staking_rewards,
-            }
-            with open(self.filepath, 'w') as f:
+            data = self._dump_state()
+            # Write to a temporary file and swap it in so a crash never leaves a half-written ledger
+            tmp_path = self.filepath + '.tmp'
+            with open(tmp_path, 'w') as f:
                 json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.filepath)
+
+    def in_transaction(self):
+        return getattr(self.txn_state, 'depth', 0) > 0
+
+    def _commit(self, op, *args):
+        """
+        Persist a single mutation that has already been applied in memory.
+        Inside a transaction the mutation is buffered until the transaction commits.
+        """
+        self.version = next(self.versions)
+        if self.in_transaction():
+            self.txn_state.ops.append((op, args))
+            return
+        if self.serialize_transactions:
+            # Wait for an open transaction so its half-applied state is never written out
+            with self.txn_lock:
+                self._persist(op, args)
+        else:
+            self._persist(op, args)
+
+    def _persist(self, op, args):
+        # The JSON engine has no finer granularity than rewriting the whole file
+        self._save()
+
+    def _persist_batch(self, ops):
+        self._save()
+
+    def _has_unlogged_writes(self):
+        # Every in-memory change goes through _commit, so there is nothing to persist without ops
+        return False
+
+    def _balance_locks(self, balances):
+        """
+        Return the locks guarding the given (table, account) pairs, in a global acquisition order.
+        With balances=None every balance lock is returned, making the transaction exclusive.
+        """
+        keyed = {}
+        if balances is None:
+            for table in sorted(BALANCE_OPS):
+                store = getattr(self, table, None)
+                for stripe, lock in enumerate(getattr(store, 'locks', [])):
+                    keyed[(table, stripe)] = lock
+            keyed[(VAULT, 0)] = self.vault_lock
+        else:
+            for table, account in balances:
+                if table == VAULT:
+                    keyed[(VAULT, 0)] = self.vault_lock
+                    continue
+                store = getattr(self, table, None)
+                if hasattr(store, 'lock_for'):
+                    keyed[(table, store.stripe(account))] = store.lock_for(account)
+        return [keyed[key] for key in sorted(keyed)]
+
+    def record_undo(self, undo):
+        """
+        Register undo() to run if the open transaction rolls back.
+        """
+        self.txn_state.undo.append(undo)
+
+    def _rollback(self, undo=()):
+        """
+        Undo a failed transaction by running its undo records newest first.
+        Only what the transaction itself changed is reverted, so concurrent transactions are left alone.
+        """
+        for step in reversed(undo):
+            step()
+
+    @contextmanager
+    def transaction(self, balances=None):
+        """
+        Group several store_* calls into one atomic, single-write unit of work.
+        balances lists the (table, account) pairs the transaction reads and writes, e.g.
+        [('lrw_balances', sender), ('lrw_balances', recipient)]; use ('vault_balance', None) for the vault.
+        Their locks are held until the write is persisted, so transactions over unrelated accounts run
+        in parallel on engines that allow it. Without balances the transaction locks every account.
+        Nested transactions join the outermost one.
+        """
+        state = self.txn_state
+        if self.in_transaction():
+            with ExitStack() as stack:
+                for lock in self._balance_locks(balances or []):
+                    stack.enter_context(lock)
+                state.depth += 1
+                try:
+                    yield self
+                finally:
+                    state.depth -= 1
+            return
+        with ExitStack() as stack:
+            if self.serialize_transactions:
+                stack.enter_context(self.txn_lock)
+            for lock in self._balance_locks(balances):
+                stack.enter_context(lock)
+            state.depth = 1
+            state.ops = []
+            state.undo = []
+            state.after_commit = []
+            try:
+                yield self
+            except BaseException:
+                state.depth = 0
+                undo, state.undo, state.ops, state.after_commit = state.undo, [], [], []
+                self._rollback(undo)
+                raise
+            state.depth = 0
+            ops, state.ops = state.ops, []
+            undo, state.undo = state.undo, []
+            callbacks, state.after_commit = state.after_commit, []
+            # Persist before the locks are released, so records for one account are logged in order
+            if ops or self._has_unlogged_writes():
+                try:
+                    self._persist_batch(ops)
+                except BaseException:
+                    self._rollback(undo)
+                    raise
+        # Run once the locks are released, so callbacks may open transactions of their own
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def savepoint(self):
+        """
+        Inside a transaction, revert only what the block changed if it raises; the transaction goes on.
+        Outside a transaction the block runs in a transaction of its own.
+        """
+        if not self.in_transaction():
+            with self.transaction([]):
+                yield self
+            return
+        state = self.txn_state
+        marks = len(state.undo), len(state.ops), len(state.after_commit)
+        try:
+            yield self
+        except BaseException:
+            undo = state.undo[marks[0]:]
+            del state.undo[marks[0]:], state.ops[marks[1]:], state.after_commit[marks[2]:]
+            self._rollback(undo)
+            raise
+
+    def after_commit(self, callback):
+        """
+        Run callback() once the open transaction has been persisted, or at once outside a transaction.
+        It is dropped if the transaction, or the savepoint it was registered in, rolls back.
+        """
+        if self.in_transaction():
+            self.txn_state.after_commit.append(callback)
+        else:
+            callback()
+
+def attach_entry_archive(db, config):
+    """
+    Attach cold storage for finalized entries to db, if enabled. Pruning is started by start_entry_pruner.
+    """
+    archive_config = config.get('archive', {})
+    if not archive_config.get('enabled', False):
+        return db
+    from lib.entry_archive import EntryArchive
+    db.entry_archive = EntryArchive(archive_config.get('directory', 'ledger_archive'),
+                                    archive_config.get('segment_size', 64 * 1024 * 1024))
+    atexit.register(db.entry_archive.close)
+    return db
+
+def start_entry_pruner(db, config=None):
+    """
+    Start the pruning job of db's entry archive, as configured under "archive".
+    Returns the pruner thread, or None if there is no archive or pruning is disabled.
+    """
+    config = storage_config if config is None else config
+    archive = getattr(db, 'entry_archive', None)
+    archive_config = config.get('archive', {})
+    interval = archive_config.get('prune_interval', 600)
+    if archive is None or interval <= 0:
+        return None
+    from lib.entry_archive import start_pruner
+    return start_pruner(db, archive, interval, archive_config.get('final_level', 3), archive_config.get('depth', 1000))
+
+def open_db(config=None):
+    """
+    Create the storage engine described by the storage configuration.
+    """
+    config = storage_config if config is None else config
+    return attach_entry_archive(_open_engine(config), config)
+
+def _open_engine(config):
+    engine = config.get('engine', 'json')
+    filepath = config.get('filepath', 'ledger_db.json')
+    if engine == 'json':
+        db = PersistentDB(filepath)
+        atexit.register(db.close)
+        return db
+    if engine == 'wal':
+        from lib.ledger_log import LogStructuredDB
+        wal = config.get('wal', {})
+        return LogStructuredDB(
+            directory=wal.get('directory', 'ledger_wal'),
+            segment_size=wal.get('segment_size', 16 * 1024 * 1024),
+            sync_interval=wal.get('sync_interval', 0.05),
+            filepath=filepath,
+            snapshot_interval=wal.get('snapshot_interval', 300),
+        )
+    if engine == 'sqlite':
+        from lib.sqlite_store import SQLiteDB
+        sqlite = config.get('sqlite', {})
+        db = SQLiteDB(sqlite.get('filepath', 'ledger.db'), entry_cache_size=sqlite.get('entry_cache_size', 0),
+                      reader_connections=sqlite.get('reader_connections', 4))
+        atexit.register(db.close)
+        return db
+    raise ValueError(f"Unknown storage engine: {engine}")
+
+def transaction(db, balances=None):
+    """
+    Return a transaction context for db, or a no-op context if db does not support transactions.
+    """
+    if hasattr(db, 'transaction'):
+        return db.transaction(balances)
+    return nullcontext(db)
+
+def _records_undo(db):
+    # Engines whose storage rolls back by itself (SQLite) set record_undo to None
+    return (isinstance(db, PersistentDB) and db.record_undo is not None
+            and getattr(getattr(db, 'txn_state', None), 'depth', 0) > 0)
+
+def on_rollback(db, undo):
+    """
+    Register undo() to run if the transaction open on db rolls back.
+    """
+    if _records_undo(db):
+        db.record_undo(undo)
+
+def remember(db, mapping, key):
+    """
+    Register restoring mapping[key] to its current value (or removing it) on rollback.
+    Called before mapping[key] is changed.
+    """
+    if not _records_undo(db):
+        return
+    previous = mapping.get(key, MISSING)
+    def undo():
+        if previous is MISSING:
+            mapping.pop(key, None)
+        else:
+            mapping[key] = previous
+    on_rollback(db, undo)
+
+def remember_append(db, series):
+    """
+    Register removing the point about to be appended to a ring series on rollback.
+    A point the append pushes out of a full ring is put back, unless it was archived.
+    """
+    if not _records_undo(db):
+        return
+    evicted = series[0] if len(series) == getattr(series, 'capacity', None) else MISSING
+    def undo():
+        series.pop()
+        if evicted is not MISSING and not getattr(series, 'archive_path', None):
+            series.appendleft(evicted)
+    on_rollback(db, undo)
 
-db_instance = PersistentDB()
+def after_commit(db, callback):
+    """
+    Run callback() once the transaction open on db commits, or at once if there is none.
+    """
+    if hasattr(db, 'after_commit'):
+        db.after_commit(callback)
+    else:
+        callback()
+
+def savepoint(db):
+    """
+    Return a context that reverts only its own changes if it raises, without ending the open transaction.
+    """
+    if hasattr(db, 'savepoint'):
+        return db.savepoint()
+    return nullcontext(db)
+
+def update_balance(db, table, account, update):
+    """
+    Atomically replace the balance of account in table with update(current balance).
+    Returns the new balance.
+    """
+    with transaction(db, [(table, account)]):
+        balances = getattr(db, table)
+        balance = update(balances.get(account, 0))
+        remember(db, balances, account)
+        balances[account] = balance
+        db._commit(BALANCE_OPS[table], account, balance)
+    return balance
+
+def compare_and_set_balance(db, table, account, expected, balance):
+    """
+    Set the balance of account in table only if it still equals expected.
+    Returns True if the balance was updated, False if another writer changed it first.
+    """
+    with transaction(db, [(table, account)]):
+        balances = getattr(db, table)
+        remember(db, balances, account)
+        compare_and_set = getattr(balances, 'compare_and_set', None)
+        if compare_and_set is not None:
+            if not compare_and_set(account, expected, balance):
+                return False
+        elif balances.get(account, 0) != expected:
+            return False
+        else:
+            balances[account] = balance
+        db._commit(BALANCE_OPS[table], account, balance)
+    return True
+
+# Stores cleared by reset_ledger; LRW, stake and vault balances survive a reset
+RESET_STORES = ['entries', 'invalid_entries', 'token_balances', 'difficulties', 'timestamps', 'successors',
+                'heights', 'tips', 'weights', 'height_index', 'time_index', 'level_index', 'finality_log']
+
+def clear_ledger(db):
+    for name in RESET_STORES:
+        store = getattr(db, name, None)
+        if store is not None:
+            store.clear()
+
+def reset_ledger(db):
+    """
+    Clear the DAG and token balances back to genesis. The reset is logged, so it survives a restart.
+    In-memory state built on db (e.g. a LedgerService) must be reloaded afterwards.
+    """
+    clear_ledger(db)
+    db._commit('reset')
 
 def get_stake(db, entry_hash):
     return getattr(db, 'stakes', {}).get(entry_hash, 0)
 
 def mark_invalid(db, entry_hash):
     if hasattr(db, 'invalid_entries'):
+        if entry_hash not in db.invalid_entries:
+            on_rollback(db, lambda: db.invalid_entries.discard(entry_hash))
         db.invalid_entries.add(entry_hash)
-        db._save()
+        db._commit('invalid', entry_hash)
 
 def get_token_balance(db, miner_id):
     return getattr(db, 'token_balances', {}).get(miner_id, 0)
 
 def store_token_balance(db, miner_id, balance):
     if hasattr(db, 'token_balances'):
+        remember(db, db.token_balances, miner_id)
         db.token_balances[miner_id] = balance
-        db._save()
+        db._commit('token_balance', miner_id, balance)
 
 def get_vault_balance(db):
     return getattr(db, 'vault_balance', 0)
 
 def store_vault_balance(db, balance):
+    previous = getattr(db, 'vault_balance', 0)
+    on_rollback(db, lambda: setattr(db, 'vault_balance', previous))
     setattr(db, 'vault_balance', balance)
-    db._save()
+    db._commit('vault_balance', balance)
 
 def get_lrw_balance(db, user_id):
     return getattr(db, 'lrw_balances', {}).get(user_id, 0)
@@ -83,8 +526,9 @@ def get_lrw_balance(db, user_id):
 def store_lrw_balance(db, user_id, balance):
     if not hasattr(db, 'lrw_balances'):
         db.lrw_balances = {}
+    remember(db, db.lrw_balances, user_id)
     db.lrw_balances[user_id] = balance
-    db._save()
+    db._commit('lrw_balance', user_id, balance)
 
 def get_stake_balance(db, user_id):
     return getattr(db, 'stake_balances', {}).get(user_id, 0)
@@ -92,8 +536,9 @@ def get_stake_balance(db, user_id):
 def store_stake_balance(db, user_id, balance):
     if not hasattr(db, 'stake_balances'):
         db.stake_balances = {}
+    remember(db, db.stake_balances, user_id)
     db.stake_balances[user_id] = balance
-    db._save()
+    db._commit('stake_balance', user_id, balance)
 
 def get_staking_rewards(db, user_id):
     return getattr(db, 'staking_rewards', {}).get(user_id, 0)
@@ -101,8 +546,9 @@ def get_staking_rewards(db, user_id):
 def store_staking_rewards(db, user_id, amount):
     if not hasattr(db, 'staking_rewards'):
         db.staking_rewards = {}
+    remember(db, db.staking_rewards, user_id)
     db.staking_rewards[user_id] = amount
-    db._save()
+    db._commit('staking_rewards', user_id, amount)
 
 def get_last_m_timestamps(db, m):
     if hasattr(db, 'timestamps'):
@@ -111,22 +557,186 @@ def get_last_m_timestamps(db, m):
 
 def store_difficulty(db, current_target, k, delta):
     if hasattr(db, 'difficulties'):
-        db.difficulties.append({'target': current_target, 'k': k, 'delta': delta})
-        db._save()
+        difficulty = {'target': current_target, 'k': k, 'delta': delta}
+        remember_append(db, db.difficulties)
+        db.difficulties.append(difficulty)
+        db._commit('difficulty', difficulty)
 
 def check_entry_exists(db, entry_hash):
+    # A Bloom filter miss means the entry is definitely new, so storage is only hit on a possible duplicate
+    entry_filter = getattr(db, 'entry_filter', None)
+    if entry_filter is not None and entry_hash not in entry_filter:
+        return False
     if hasattr(db, 'entries'):
         return entry_hash in db.entries
     return False
 
+def index_successors(db, entry_hash, entry):
+    """
+    Record entry_hash as a successor of each of its predecessors in O(1) per predecessor.
+    """
+    successors = db.successors
+    for p_hash in entry.get('predecessor_hashes', []):
+        if hasattr(successors, 'add'):
+            successors.add(p_hash, entry_hash)
+        else:
+            successors.setdefault(p_hash, []).append(entry_hash)
+            on_rollback(db, lambda p_hash=p_hash: _unindex_successor(successors, p_hash, entry_hash))
+
+def _unindex_successor(successors, p_hash, entry_hash):
+    children = successors.get(p_hash, [])
+    if entry_hash in children:
+        children.remove(entry_hash)
+    if not children:
+        successors.pop(p_hash, None)
+
+def index_dag(db, entry_hash, entry):
+    """
+    Record the height of a new entry (one more than its highest predecessor) and update the tip set.
+    Predecessors stop being tips; the entry becomes one unless a successor was stored before it.
+    """
+    heights = getattr(db, 'heights', None)
+    tips = getattr(db, 'tips', None)
+    predecessors = entry.get('predecessor_hashes', [])
+    if isinstance(heights, MutableMapping):
+        height = 1 + max((heights.get(p_hash, -1) for p_hash in predecessors), default=-1)
+        remember(db, heights, entry_hash)
+        heights[entry_hash] = height
+        height_index = getattr(db, 'height_index', None)
+        if isinstance(height_index, RangeIndex):
+            height_index.add(height, entry_hash)
+            on_rollback(db, lambda: height_index.discard(height, entry_hash))
+    if isinstance(tips, MutableSet):
+        former_tips = [p_hash for p_hash in predecessors if p_hash in tips]
+        was_tip = entry_hash in tips
+        def undo_tips():
+            if not was_tip:
+                tips.discard(entry_hash)
+            for p_hash in former_tips:
+                tips.add(p_hash)
+        on_rollback(db, undo_tips)
+        for p_hash in predecessors:
+            tips.discard(p_hash)
+        if get_child_count(db, entry_hash) == 0:
+            tips.add(entry_hash)
+
+def rebuild_dag_indexes(db, entries):
+    """
+    Rebuild heights and tips in one streaming pass over (hash, entry) pairs in timestamp order.
+    The successor index must already be complete.
+    """
+    for entry_hash, entry in entries:
+        index_dag(db, entry_hash, entry)
+
+def index_entry(db, entry_hash, entry):
+    """
+    Update the indexes derived from a newly stored entry.
+    """
+    if hasattr(db, 'successors'):
+        index_successors(db, entry_hash, entry)
+    index_dag(db, entry_hash, entry)
+    if hasattr(db, 'timestamps') and entry.get('timestamp') is not None:
+        remember_append(db, db.timestamps)
+        db.timestamps.append(entry['timestamp'])
+        time_index = getattr(db, 'time_index', None)
+        if isinstance(time_index, RangeIndex):
+            time_index.add(entry['timestamp'], entry_hash)
+            on_rollback(db, lambda: time_index.discard(entry['timestamp'], entry_hash))
+    level_index = getattr(db, 'level_index', None)
+    if level_index is not None:
+        level_index.add(entry_hash, entry.get('level', 0))
+        on_rollback(db, lambda: level_index.discard(entry_hash))
+    entry_filter = getattr(db, 'entry_filter', None)
+    if entry_filter is not None:
+        # Not undone on rollback: a Bloom filter cannot forget, and a stale bit only costs a lookup
+        entry_filter.add(entry_hash)
+
+def get_successors(db, entry_hash):
+    """
+    Return the hashes of the entries that reference entry_hash as a predecessor.
+    """
+    return list(getattr(db, 'successors', {}).get(entry_hash, []))
+
+def get_predecessors(db, entry_hash):
+    """
+    Return the predecessor hashes of a stored entry, or None if it is not stored.
+    Read from the hot store, so archived entries are served from their header without touching the archive.
+    """
+    entries = getattr(db, 'entries', None)
+    entry = entries.get(entry_hash) if entries is not None else None
+    return list(entry.get('predecessor_hashes', [])) if entry is not None else None
+
+def get_child_count(db, entry_hash):
+    """
+    Return how many entries reference entry_hash as a predecessor.
+    """
+    successors = getattr(db, 'successors', {})
+    if hasattr(successors, 'count'):
+        return successors.count(entry_hash)
+    return len(successors.get(entry_hash, []))
+
+def get_tips(db):
+    """
+    Return the hashes of stored entries that no other entry references yet.
+    """
+    tips = getattr(db, 'tips', None)
+    return list(tips) if isinstance(tips, MutableSet) else []
+
+def get_height(db, entry_hash):
+    """
+    Return the height of an entry (0 for entries without stored predecessors), or None if unknown.
+    """
+    heights = getattr(db, 'heights', None)
+    return heights.get(entry_hash) if isinstance(heights, MutableMapping) else None
+
+def get_weight(db, entry_hash):
+    """
+    Return the stored cumulative weight of an entry, or None if none has been stored.
+    """
+    weights = getattr(db, 'weights', None)
+    return weights.get(entry_hash) if isinstance(weights, MutableMapping) else None
+
+def store_weight(db, entry_hash, weight):
+    if hasattr(db, 'weights'):
+        remember(db, db.weights, entry_hash)
+        db.weights[entry_hash] = weight
+        db._commit('weight', entry_hash, weight)
+
+def get_entries_by_height(db, start=None, end=None, after=None, limit=100):
+    """
+    Return up to limit (height, hash) pairs with start <= height < end, ordered by height then hash.
+    Pass the last pair of a page as after to get the next page.
+    """
+    index = getattr(db, 'height_index', None)
+    return index.range(start, end, after, limit) if hasattr(index, 'range') else []
+
+def get_entries_by_time(db, start=None, end=None, after=None, limit=100):
+    """
+    Return up to limit (timestamp, hash) pairs with start <= timestamp < end, ordered by timestamp then hash.
+    Pass the last pair of a page as after to get the next page.
+    """
+    index = getattr(db, 'time_index', None)
+    return index.range(start, end, after, limit) if hasattr(index, 'range') else []
+
 def store_entry(db, entry_hash, entry):
     if hasattr(db, 'entries'):
+        if entry_hash not in db.entries:
+            index_entry(db, entry_hash, entry)
+        remember(db, db.entries, entry_hash)
         db.entries[entry_hash] = entry
-        db._save()
+        db._commit('entry', entry_hash, entry)
 
 def get_entry(db, entry_hash):
     if hasattr(db, 'entries'):
-        return db.entries.get(entry_hash)
+        entry = db.entries.get(entry_hash)
+        # Pruned entries keep only a header in the hot store; the body lives in the archive
+        if isinstance(entry, dict) and entry.get('archived') is True:
+            archive = getattr(db, 'entry_archive', None)
+            body = archive.get(entry_hash) if archive is not None else None
+            if body is not None:
+                body['level'] = entry.get('level', body.get('level', 0))
+                return body
+        return entry
     return None
 
 def entry_exists(db, entry_hash):
@@ -134,17 +744,147 @@ def entry_exists(db, entry_hash):
 
 def update_entry_level(db, entry_hash, level):
     if hasattr(db, 'entries') and entry_hash in db.entries:
-        db.entries[entry_hash]['level'] = level
-        db._save()
+        # Re-store the entry so engines that hand out copies see the change
+        entry = db.entries[entry_hash]
+        previous = entry.get('level', 0)
+        entry['level'] = level
+        db.entries[entry_hash] = entry
+        level_index = getattr(db, 'level_index', None)
+        def undo():
+            restored = db.entries[entry_hash]
+            restored['level'] = previous
+            db.entries[entry_hash] = restored
+            if level_index is not None:
+                level_index.add(entry_hash, previous)
+        on_rollback(db, undo)
+        if level_index is not None and level != previous:
+            timestamp = entry.get('timestamp')
+            latency = time.time() - timestamp if timestamp is not None else None
+            level_index.move(entry_hash, level, previous=previous, latency=latency)
+        db._commit('entry_level', entry_hash, level)
+
+def get_level_counts(db):
+    """
+    Return {level: number of entries at that level}, read from the level index without scanning entries.
+    """
+    level_index = getattr(db, 'level_index', None)
+    return level_index.counts() if level_index is not None else {}
+
+def get_entries_at_level(db, level, after=None, limit=100):
+    """
+    Return (hashes, cursor) for up to limit entries at level. Pass cursor as after to get the next page;
+    it is None on the last page.
+    """
+    level_index = getattr(db, 'level_index', None)
+    return level_index.list(level, after, limit) if level_index is not None else ([], None)
+
+def get_min_height_below_level(db, level):
+    """
+    Return the lowest height of any entry below level, or None if there is none or it cannot be told.
+    No entry below level sits under this height, so walks looking for such entries can stop there.
+    """
+    level_index = getattr(db, 'level_index', None)
+    if hasattr(level_index, 'min_height_below'):
+        return level_index.min_height_below(level)
+    if not hasattr(level_index, 'below'):
+        return None
+    heights = [get_height(db, entry_hash) for entry_hash in level_index.below(level)]
+    if any(height is None for height in heights):
+        return None
+    return min(heights, default=None)
+
+def get_level_latency(db):
+    """
+    Return {level: histogram} of the seconds entries took from publication to reaching each level.
+    """
+    level_index = getattr(db, 'level_index', None)
+    return level_index.latency_stats() if level_index is not None else {}
+
+def append_finality(db, entry_hash, level, miner_id=None):
+    """
+    Append entry_hash to the finality log and return its record, or None if it is already final.
+    miner_id, if given, is owed the reward for the entry; it is paid when the record is settled.
+    """
+    finality_log = getattr(db, 'finality_log', None)
+    if finality_log is None:
+        return None
+    record = finality_log.append(entry_hash, level, miner_id, time.time())
+    if record is not None:
+        on_rollback(db, lambda: finality_log.discard(entry_hash))
+        db._commit('final', record)
+        if hasattr(finality_log, 'publish'):
+            after_commit(db, lambda: finality_log.publish(record['seq']))
+    return record
+
+def get_finality(db, entry_hash):
+    """
+    Return the finality record of entry_hash, or None if it is not final.
+    """
+    finality_log = getattr(db, 'finality_log', None)
+    return finality_log.get(entry_hash) if finality_log is not None else None
+
+def get_finality_since(db, after=0, limit=100):
+    """
+    Return up to limit finality records with a sequence number above after, in sequence order.
+    """
+    finality_log = getattr(db, 'finality_log', None)
+    return finality_log.since(after, limit) if finality_log is not None else []
+
+def get_finality_seq(db):
+    """
+    Return the sequence number of the last finality record (0 if there is none).
+    """
+    finality_log = getattr(db, 'finality_log', None)
+    return finality_log.last_seq() if finality_log is not None else 0
+
+def get_ledger_version(db):
+    """
+    Return a number that changes whenever anything is written to db (0 if db does not track it).
+    """
+    return getattr(db, 'version', 0)
+
+def get_unrewarded_finality(db, limit=None):
+    """
+    Return the finality records whose miner reward has not been settled yet, oldest first.
+    Only committed records are returned: one appended by a transaction still open elsewhere may be rolled back.
+    """
+    finality_log = getattr(db, 'finality_log', None)
+    if finality_log is None:
+        return []
+    rewarded = finality_log.rewarded
+    published = finality_log.published_seq()
+    # Sequence numbers only grow, so no more records than this can follow the watermark
+    pending = published - rewarded
+    if pending <= 0:
+        return []
+    records = finality_log.since(rewarded, pending if limit is None else min(limit, pending))
+    return [record for record in records if record['seq'] <= published]
+
+def store_finality_rewarded(db, seq):
+    if hasattr(db, 'finality_log'):
+        previous = db.finality_log.rewarded
+        on_rollback(db, lambda: setattr(db.finality_log, 'rewarded', previous))
+        db.finality_log.rewarded = seq
+        db._commit('final_rewarded', seq)
+
+def get_entry_cache_stats(db):
+    """
+    Return hit/miss counters of the entry cache, or None if entries are not cached.
+    """
+    stats = getattr(getattr(db, 'entries', None), 'stats', None)
+    return stats() if callable(stats) else None
 
 def get_entry_references(db, entry_hash):
     entry = get_entry(db, entry_hash)
     if entry:
         return {
             'level': entry.get('level', 0),
-            'references': entry.get('references', [])
+            'references': get_successors(db, entry_hash)
         }
     return {
         'level': 0,
         'references': []
     }
+
+# Opened last, so loading an existing ledger can use every index helper defined above
+db_instance = open_db()
@@ -0,0 +1,221 @@
+"""
+entry_archive.py
+
+Cold storage for finalized ledger entries.
+Features:
+1. Compressed Segments: Entry bodies are zlib-compressed compact records (see entry_codec.py)
+   appended to archive segment files that are never rewritten.
+2. Offset Index: An append-only index maps each archived hash to its segment, offset and length.
+3. Header-Only Hot Store: Pruned entries are replaced in the ledger by headers that keep what
+   DAG traversal needs (hash, predecessors, timestamp, level); get_entry still returns the full body.
+4. Background Pruning: A pruner thread, started by the node (see run_system.py), periodically archives
+   finalized entries more than `depth` heights below the highest entry. Candidates are read from the
+   finality log after the last sequence number a previous pass got through, so a pass only looks at
+   entries finalized since then. That cursor is kept in archive.cursor, so it survives a restart.
+Configured under "archive" in config/storage_config.json.
+"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+
+from lib.entry_codec import decode_entry, encode_entry
+
+logger = logging.getLogger('entry_archive')
+
+SEGMENT_PREFIX = 'archive-'
+SEGMENT_SUFFIX = '.seg'
+INDEX_NAME = 'archive.idx'
+CURSOR_NAME = 'archive.cursor'
+HEADER_FIELDS = ('hash', 'predecessor_hashes', 'timestamp', 'level')
+
+def entry_header(entry_hash, entry):
+    """
+    Return the part of an entry that stays in the hot store once its body is archived.
+    """
+    header = {field: entry[field] for field in HEADER_FIELDS if field in entry}
+    header['hash'] = entry.get('hash', entry_hash)
+    header['archived'] = True
+    return header
+
+def is_archived(entry):
+    return isinstance(entry, dict) and entry.get('archived') is True
+
+class EntryArchive:
+    def __init__(self, directory='ledger_archive', segment_size=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        self.index = {}
+        self.cursor = 0  # finality log sequence number pruning has got through
+        self.segment_number = 0
+        self.segment_file = None
+        self.index_file = None
+        self._load_index()
+        self._load_cursor()
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def _load_index(self):
+        path = os.path.join(self.directory, INDEX_NAME)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    entry_hash, segment, offset, length = json.loads(line)
+                except ValueError:
+                    # A torn index record points at data that was never acknowledged
+                    break
+                self.index[entry_hash] = (segment, offset, length)
+                self.segment_number = max(self.segment_number, segment)
+
+    def _load_cursor(self):
+        path = os.path.join(self.directory, CURSOR_NAME)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.cursor = json.load(f)
+
+    def save_cursor(self, cursor):
+        """
+        Record that pruning has got through finality sequence number cursor.
+        Written to a temporary file and swapped in, so a crash leaves either the old or the new cursor.
+        """
+        if cursor == self.cursor:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, CURSOR_NAME)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(cursor, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self.cursor = cursor
+
+    def _open_files(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.segment_number == 0:
+            self.segment_number = 1
+        self.segment_file = open(self._segment_path(self.segment_number), 'ab')
+        self.index_file = open(os.path.join(self.directory, INDEX_NAME), 'ab')
+
+    def __contains__(self, entry_hash):
+        return entry_hash in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def append(self, entries):
+        """
+        Archive (entry_hash, entry) pairs. Data and index are fsynced before this returns,
+        so callers may drop the bodies from the hot store afterwards.
+        """
+        with self.lock:
+            if self.segment_file is None:
+                self._open_files()
+            locations = []
+            for entry_hash, entry in entries:
+                if self.segment_file.tell() >= self.segment_size:
+                    self.segment_file.close()
+                    self.segment_number += 1
+                    self.segment_file = open(self._segment_path(self.segment_number), 'ab')
+                record = zlib.compress(encode_entry(entry))
+                offset = self.segment_file.tell()
+                self.segment_file.write(record)
+                locations.append((entry_hash, (self.segment_number, offset, len(record))))
+            self.segment_file.flush()
+            os.fsync(self.segment_file.fileno())
+            for entry_hash, (segment, offset, length) in locations:
+                self.index_file.write(json.dumps([entry_hash, segment, offset, length]).encode('utf-8') + b'\n')
+            self.index_file.flush()
+            os.fsync(self.index_file.fileno())
+            self.index.update(locations)
+
+    def get(self, entry_hash):
+        """
+        Return the archived body of entry_hash, or None if it was never archived.
+        """
+        location = self.index.get(entry_hash)
+        if location is None:
+            return None
+        segment, offset, length = location
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return decode_entry(zlib.decompress(f.read(length)))
+
+    def close(self):
+        with self.lock:
+            for f in (self.segment_file, self.index_file):
+                if f is not None:
+                    f.close()
+            self.segment_file = None
+            self.index_file = None
+
+def prune_finalized_entries(db, archive, final_level=3, depth=1000, page_size=500):
+    """
+    Move finalized entries more than `depth` heights below the highest entry into the archive.
+    Returns the number of entries archived.
+    """
+    from lib import database_access
+
+    # The highest entry has no successors, so it is always a tip
+    heights = [database_access.get_height(db, tip) for tip in database_access.get_tips(db)]
+    heights = [height for height in heights if height is not None]
+    if not heights:
+        return 0
+    cutoff = max(heights) - depth
+    cursor = archive.cursor
+    if cursor > database_access.get_finality_seq(db):
+        # The finality log was reset; start over
+        cursor = 0
+    candidates = []
+    shallow = False
+    while not shallow:
+        records = database_access.get_finality_since(db, cursor, page_size)
+        if not records:
+            break
+        for record in records:
+            entry_hash = record['hash']
+            height = database_access.get_height(db, entry_hash)
+            if height is not None and height > cutoff:
+                # Entries are finalized roughly in height order; the rest wait for a later pass
+                shallow = True
+                break
+            cursor = record['seq']
+            if record.get('level', final_level) < final_level:
+                continue
+            entry = db.entries.get(entry_hash)
+            if entry is not None and not is_archived(entry):
+                candidates.append((entry_hash, entry))
+    if candidates:
+        # Bodies are durable in the archive before the hot copies are cut down to headers
+        archive.append(candidates)
+        with database_access.transaction(db, []):
+            for entry_hash, entry in candidates:
+                database_access.store_entry(db, entry_hash, entry_header(entry_hash, entry))
+        logger.info(f"Archived {len(candidates)} finalized entries")
+    # Saved only once the headers are stored; a crash before that repeats the pass, skipping archived entries
+    archive.save_cursor(cursor)
+    return len(candidates)
+
+def start_pruner(db, archive, interval=600, final_level=3, depth=1000):
+    """
+    Run prune_finalized_entries every `interval` seconds on a daemon thread.
+    Set the returned thread's stop event to end it.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                prune_finalized_entries(db, archive, final_level, depth)
+            except Exception as e:
+                logger.error(f"Entry archive pruning failed: {e}")
+
+    thread = threading.Thread(target=run, name='entry-archive-pruner', daemon=True)
+    thread.stop = stop
+    thread.start()
+    return thread
@@ -0,0 +1,96 @@
+"""
+entry_cache.py
+
+Size-bounded LRU cache in front of a disk-resident entry store.
+Features:
+1. Bounded Memory: At most max_entries entry bodies are held in memory at any time.
+2. Write-Through: Stores go to the backing store and into the cache, so fresh tips stay resident.
+3. Recency: Every lookup refreshes an entry, keeping tips and the ancestors they validate against hot.
+4. Metrics: Hit, miss and eviction counters for monitoring the cache.
+"""
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from threading import Lock
+
+class LRUEntryCache(MutableMapping):
+    def __init__(self, backing, max_entries=10000):
+        self.backing = backing
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key, value):
+        with self.lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+
+    def __getitem__(self, key):
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+        value = self.backing[key]
+        self._remember(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self.backing[key] = value
+        self._remember(key, value)
+
+    def __delitem__(self, key):
+        with self.lock:
+            self.cache.pop(key, None)
+        del self.backing[key]
+
+    def __contains__(self, key):
+        with self.lock:
+            if key in self.cache:
+                return True
+        return key in self.backing
+
+    def __iter__(self):
+        return iter(self.backing)
+
+    def __len__(self):
+        return len(self.backing)
+
+    def items(self):
+        return self.backing.items()
+
+    def clear(self):
+        self.invalidate()
+        self.backing.clear()
+
+    def discard(self, key):
+        """
+        Drop one cached body, leaving the backing store untouched.
+        """
+        with self.lock:
+            self.cache.pop(key, None)
+
+    def invalidate(self):
+        """
+        Drop every cached body, e.g. after the backing store rolled back.
+        """
+        with self.lock:
+            self.cache.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,297 @@
+"""
+entry_codec.py
+
+Compact binary encoding for ledger entries.
+Features:
+1. Raw Hashes: Entry and predecessor hashes are held as 32-byte values instead of 64-char hex strings.
+2. Fixed-Width Fields: Timestamps and levels are packed as 8- and 4-byte integers.
+3. Canonical Transaction Data: Transaction data is kept as sort_keys JSON bytes, so equal data encodes identically.
+4. Lossless: Fields that do not fit the compact layout (non-hex hashes, float timestamps, unknown keys)
+   are carried as tagged or JSON-encoded values, so decode_entry(encode_entry(e)) == e for any entry.
+5. Compact Store: CompactEntryStore is a drop-in dict of entries that keeps only encoded bytes in memory.
+"""
+
+import json
+import struct
+from collections.abc import MutableMapping
+
+ENTRY_VERSION = 1
+HASH_SIZE = 32
+ABSENT = object()
+
+# Bits of the field mask, in encoding order
+F_HASH = 0x01
+F_PREDECESSORS = 0x02
+F_TIMESTAMP = 0x04
+F_TRANSACTION = 0x08
+F_SIGNATURE = 0x10
+F_PUBLIC_KEY = 0x20
+F_LEVEL = 0x40
+F_EXTRA = 0x80
+
+KNOWN_FIELDS = ('hash', 'predecessor_hashes', 'timestamp', 'transaction_data',
+                'signature', 'submitter_public_key', 'level')
+
+# Tags for hex-like values
+T_BYTES = 0
+T_TEXT = 1
+T_JSON = 2
+
+# Tags for numeric values
+N_INT64 = 0
+N_INT32 = 1
+N_FLOAT = 2
+N_JSON = 3
+
+def _is_hex(value):
+    return (isinstance(value, str) and len(value) % 2 == 0 and len(value) <= 2 * 0xFFFF
+            and value == value.lower()
+            and all(c in '0123456789abcdef' for c in value))
+
+def hash_to_bytes(value):
+    """
+    Convert a lowercase hex hash to raw bytes; anything else is returned unchanged.
+    """
+    return bytes.fromhex(value) if _is_hex(value) else value
+
+def hash_to_hex(value):
+    return value.hex() if isinstance(value, bytes) else value
+
+def canonical_json(value):
+    return json.dumps(value, sort_keys=True).encode('utf-8')
+
+def _dump_json(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+class CompactEntry:
+    """
+    In-memory entry with raw hash bytes. Fields missing from the source dict hold ABSENT.
+    """
+    __slots__ = ('hash', 'predecessors', 'timestamp', 'transaction_bytes', 'signature',
+                 'public_key', 'level', 'extra')
+
+    def __init__(self, hash=ABSENT, predecessors=ABSENT, timestamp=ABSENT, transaction_bytes=ABSENT,
+                 signature=ABSENT, public_key=ABSENT, level=ABSENT, extra=None):
+        self.hash = hash
+        self.predecessors = predecessors
+        self.timestamp = timestamp
+        self.transaction_bytes = transaction_bytes
+        self.signature = signature
+        self.public_key = public_key
+        self.level = level
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, entry):
+        extra = {k: v for k, v in entry.items() if k not in KNOWN_FIELDS}
+        compact = cls(extra=extra or None)
+        if 'hash' in entry:
+            compact.hash = hash_to_bytes(entry['hash'])
+        predecessors = entry.get('predecessor_hashes', ABSENT)
+        if isinstance(predecessors, list) and len(predecessors) < 256:
+            compact.predecessors = tuple(hash_to_bytes(p) for p in predecessors)
+        elif predecessors is not ABSENT:
+            compact.extra = dict(compact.extra or {}, predecessor_hashes=predecessors)
+        compact.timestamp = entry.get('timestamp', ABSENT)
+        if 'transaction_data' in entry:
+            compact.transaction_bytes = canonical_json(entry['transaction_data'])
+        if 'signature' in entry:
+            compact.signature = hash_to_bytes(entry['signature'])
+        if 'submitter_public_key' in entry:
+            compact.public_key = hash_to_bytes(entry['submitter_public_key'])
+        compact.level = entry.get('level', ABSENT)
+        return compact
+
+    @property
+    def transaction_data(self):
+        if self.transaction_bytes is ABSENT:
+            return None
+        return json.loads(self.transaction_bytes)
+
+    def to_dict(self):
+        entry = {}
+        if self.hash is not ABSENT:
+            entry['hash'] = hash_to_hex(self.hash)
+        if self.predecessors is not ABSENT:
+            entry['predecessor_hashes'] = [hash_to_hex(p) for p in self.predecessors]
+        if self.timestamp is not ABSENT:
+            entry['timestamp'] = self.timestamp
+        if self.transaction_bytes is not ABSENT:
+            entry['transaction_data'] = json.loads(self.transaction_bytes)
+        if self.signature is not ABSENT:
+            entry['signature'] = hash_to_hex(self.signature)
+        if self.public_key is not ABSENT:
+            entry['submitter_public_key'] = hash_to_hex(self.public_key)
+        if self.level is not ABSENT:
+            entry['level'] = self.level
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    def encode(self):
+        mask = 0
+        parts = []
+        if self.hash is not ABSENT:
+            mask |= F_HASH
+            parts.append(_pack_token(self.hash))
+        if self.predecessors is not ABSENT:
+            mask |= F_PREDECESSORS
+            parts.append(struct.pack('>B', len(self.predecessors)))
+            parts.extend(_pack_token(p) for p in self.predecessors)
+        if self.timestamp is not ABSENT:
+            mask |= F_TIMESTAMP
+            parts.append(_pack_number(self.timestamp, N_INT64))
+        if self.transaction_bytes is not ABSENT:
+            mask |= F_TRANSACTION
+            parts.append(struct.pack('>I', len(self.transaction_bytes)) + self.transaction_bytes)
+        if self.signature is not ABSENT:
+            mask |= F_SIGNATURE
+            parts.append(_pack_token(self.signature))
+        if self.public_key is not ABSENT:
+            mask |= F_PUBLIC_KEY
+            parts.append(_pack_token(self.public_key))
+        if self.level is not ABSENT:
+            mask |= F_LEVEL
+            parts.append(_pack_number(self.level, N_INT32))
+        if self.extra:
+            mask |= F_EXTRA
+            extra = _dump_json(self.extra)
+            parts.append(struct.pack('>I', len(extra)) + extra)
+        return struct.pack('>BB', ENTRY_VERSION, mask) + b''.join(parts)
+
+    @classmethod
+    def decode(cls, data):
+        version, mask = struct.unpack_from('>BB', data, 0)
+        if version != ENTRY_VERSION:
+            raise ValueError(f"Unsupported entry encoding version: {version}")
+        offset = 2
+        compact = cls()
+        if mask & F_HASH:
+            compact.hash, offset = _unpack_token(data, offset)
+        if mask & F_PREDECESSORS:
+            count = data[offset]
+            offset += 1
+            predecessors = []
+            for _ in range(count):
+                p, offset = _unpack_token(data, offset)
+                predecessors.append(p)
+            compact.predecessors = tuple(predecessors)
+        if mask & F_TIMESTAMP:
+            compact.timestamp, offset = _unpack_number(data, offset)
+        if mask & F_TRANSACTION:
+            compact.transaction_bytes, offset = _unpack_sized(data, offset)
+        if mask & F_SIGNATURE:
+            compact.signature, offset = _unpack_token(data, offset)
+        if mask & F_PUBLIC_KEY:
+            compact.public_key, offset = _unpack_token(data, offset)
+        if mask & F_LEVEL:
+            compact.level, offset = _unpack_number(data, offset)
+        if mask & F_EXTRA:
+            extra, offset = _unpack_sized(data, offset)
+            compact.extra = json.loads(extra)
+        return compact
+
+    def __eq__(self, other):
+        return isinstance(other, CompactEntry) and all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+def _pack_token(value):
+    if isinstance(value, bytes):
+        return struct.pack('>BH', T_BYTES, len(value)) + value
+    if isinstance(value, str):
+        text = value.encode('utf-8')
+        return struct.pack('>BI', T_TEXT, len(text)) + text
+    data = _dump_json(value)
+    return struct.pack('>BI', T_JSON, len(data)) + data
+
+def _unpack_token(data, offset):
+    tag = data[offset]
+    if tag == T_BYTES:
+        (size,) = struct.unpack_from('>H', data, offset + 1)
+        start = offset + 3
+        return bytes(data[start:start + size]), start + size
+    raw, end = _unpack_sized(data, offset + 1)
+    if tag == T_TEXT:
+        return raw.decode('utf-8'), end
+    return json.loads(raw), end
+
+def _pack_number(value, width):
+    # bool is an int subclass, but must come back as a bool
+    if isinstance(value, int) and not isinstance(value, bool):
+        if width == N_INT32 and -2**31 <= value < 2**31:
+            return struct.pack('>Bi', N_INT32, value)
+        if -2**63 <= value < 2**63:
+            return struct.pack('>Bq', N_INT64, value)
+    if isinstance(value, float):
+        return struct.pack('>Bd', N_FLOAT, value)
+    data = _dump_json(value)
+    return struct.pack('>BI', N_JSON, len(data)) + data
+
+def _unpack_number(data, offset):
+    tag = data[offset]
+    if tag == N_INT32:
+        return struct.unpack_from('>i', data, offset + 1)[0], offset + 5
+    if tag == N_INT64:
+        return struct.unpack_from('>q', data, offset + 1)[0], offset + 9
+    if tag == N_FLOAT:
+        return struct.unpack_from('>d', data, offset + 1)[0], offset + 9
+    raw, end = _unpack_sized(data, offset + 1)
+    return json.loads(raw), end
+
+def _unpack_sized(data, offset):
+    (size,) = struct.unpack_from('>I', data, offset)
+    start = offset + 4
+    return bytes(data[start:start + size]), start + size
+
+def encode_entry(entry):
+    """
+    Encode an entry dict into its compact binary form.
+    """
+    return CompactEntry.from_dict(entry).encode()
+
+def decode_entry(data):
+    """
+    Decode the compact binary form back into the original entry dict.
+    """
+    return CompactEntry.decode(data).to_dict()
+
+class CompactEntryStore(MutableMapping):
+    """
+    Dict of entries keyed by hex hash that holds only 32-byte keys and encoded bodies in memory.
+    Lookups return a fresh dict, so callers re-store an entry after changing it.
+    """
+    def __init__(self, entries=None):
+        self.entries = {}
+        for entry_hash, entry in (entries or {}).items():
+            self[entry_hash] = entry
+
+    def __getitem__(self, entry_hash):
+        return decode_entry(self.entries[hash_to_bytes(entry_hash)])
+
+    def get_compact(self, entry_hash):
+        """
+        Return the stored entry as a CompactEntry, or None if it is not stored.
+        """
+        data = self.entries.get(hash_to_bytes(entry_hash))
+        return CompactEntry.decode(data) if data is not None else None
+
+    def __setitem__(self, entry_hash, entry):
+        self.entries[hash_to_bytes(entry_hash)] = encode_entry(entry)
+
+    def __delitem__(self, entry_hash):
+        del self.entries[hash_to_bytes(entry_hash)]
+
+    def __contains__(self, entry_hash):
+        return hash_to_bytes(entry_hash) in self.entries
+
+    def __iter__(self):
+        return (hash_to_hex(key) for key in list(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def items(self):
+        return [(hash_to_hex(key), decode_entry(data)) for key, data in list(self.entries.items())]
+
+    def clear(self):
+        self.entries.clear()
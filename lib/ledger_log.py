@@ -0,0 +1,347 @@
+"""
+ledger_log.py
+
+Log-structured storage engine for the AquiMatrix ledger.
+Features:
+1. Append-Only Segments: Each store_* mutation is appended as one compact JSON record.
+2. Atomic Batches: A transaction is written as a single batch record. Values a batch sets outright
+   (cumulative weights) are logged once per key, with the last value.
+3. Group Commit: A writer returns only once its record has been fsynced. With sync_interval > 0 a background
+   flusher issues the fsync, so one fsync covers every writer that arrived during the interval.
+4. Replay: Startup loads the latest snapshot and replays only the segments written after it.
+5. Segment Rotation: A new segment file is started once the current one reaches segment_size.
+6. Compaction: A background thread periodically folds sealed segments into a new versioned snapshot.
+Selected with "engine": "wal" in config/storage_config.json.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from lib.database_access import PersistentDB, clear_ledger, index_entry
+
+logger = logging.getLogger('ledger_log')
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_SUFFIX = '.json'
+SNAPSHOT_VERSION = 1
+
+def segment_name(number):
+    return f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}"
+
+def snapshot_name(number):
+    return f"{SNAPSHOT_PREFIX}{number:08d}{SNAPSHOT_SUFFIX}"
+
+# Ops whose record sets a value outright, so only the last one per key in a batch has to be logged
+OVERWRITE_OPS = {'weight'}
+
+def coalesce_ops(ops):
+    """
+    Drop records of a batch that a later record for the same key overwrites.
+    """
+    last = {(op, args[0]): i for i, (op, args) in enumerate(ops) if op in OVERWRITE_OPS}
+    return [(op, args) for i, (op, args) in enumerate(ops)
+            if op not in OVERWRITE_OPS or last[(op, args[0])] == i]
+
+def encode_record(op, args):
+    return json.dumps([op, *args], separators=(',', ':')) + '\n'
+
+def apply_record(db, op, args):
+    """
+    Apply one logged mutation to an in-memory ledger.
+    """
+    if op == 'entry':
+        entry_hash, entry = args
+        # Indexes are derived from entry records rather than logged separately
+        if entry_hash not in db.entries:
+            index_entry(db, entry_hash, entry)
+        db.entries[entry_hash] = entry
+    elif op == 'entry_level':
+        entry_hash, level = args
+        if entry_hash in db.entries:
+            # Re-store the entry so stores that hand out copies see the change
+            entry = db.entries[entry_hash]
+            entry['level'] = level
+            db.entries[entry_hash] = entry
+            # Replayed promotions happened in the past, so they move the entry without recording a latency
+            db.level_index.move(entry_hash, level)
+    elif op == 'invalid':
+        db.invalid_entries.add(args[0])
+    elif op == 'token_balance':
+        db.token_balances[args[0]] = args[1]
+    elif op == 'vault_balance':
+        db.vault_balance = args[0]
+    elif op == 'lrw_balance':
+        db.lrw_balances[args[0]] = args[1]
+    elif op == 'stake_balance':
+        db.stake_balances[args[0]] = args[1]
+    elif op == 'staking_rewards':
+        db.staking_rewards[args[0]] = args[1]
+    elif op == 'weight':
+        db.weights[args[0]] = args[1]
+    elif op == 'final':
+        db.finality_log.add(args[0])
+    elif op == 'final_rewarded':
+        db.finality_log.rewarded = args[0]
+    elif op == 'reset':
+        clear_ledger(db)
+    elif op == 'difficulty':
+        db.difficulties.append(args[0])
+    elif op == 'batch':
+        for batch_op, *batch_args in args[0]:
+            apply_record(db, batch_op, batch_args)
+    else:
+        raise ValueError(f"Unknown ledger log record: {op}")
+
+def replay_segment(db, path, truncate=False):
+    """
+    Apply every complete record in a segment file to db.
+    A torn record at the end is dropped, and cut off the file when truncate is set.
+    """
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                op, *args = json.loads(line)
+            except ValueError:
+                # A torn record can only be the tail of the last segment written before a crash
+                logger.warning(f"Dropping torn record in {path} at offset {offset}")
+                break
+            apply_record(db, op, args)
+            offset += len(line)
+    if truncate and offset != os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+
+class LogStructuredDB(PersistentDB):
+    # Each transaction is appended as its own record, so transactions over unrelated accounts run in parallel
+    serialize_transactions = False
+
+    def __init__(self, directory='ledger_wal', segment_size=16 * 1024 * 1024, sync_interval=0.05,
+                 filepath='ledger_db.json', snapshot_interval=300):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.snapshot_interval = snapshot_interval
+        self.segment_file = None
+        self.segment_number = 0
+        # Records written and records known to be fsynced; writers wait until synced catches up with theirs
+        self.written = 0
+        self.synced = 0
+        self.closed = False
+        self.records_since_snapshot = 0
+        self.sync_event = threading.Event()
+        self.compaction_lock = threading.Lock()
+        # Without a snapshot, the JSON file at filepath, if any, is loaded as the base state before replay
+        super().__init__(filepath)
+        self.sync_cond = threading.Condition(self.lock)
+        self.flusher = None
+        if sync_interval > 0:
+            self.flusher = threading.Thread(target=self._flush_loop, name='ledger-log-flusher', daemon=True)
+            self.flusher.start()
+        self.compactor = None
+        if snapshot_interval > 0:
+            self.compactor = threading.Thread(target=self._compact_loop, name='ledger-log-compactor', daemon=True)
+            self.compactor.start()
+        atexit.register(self.close)
+
+    def _load(self):
+        with self.compaction_lock:
+            self._load_base(self)
+            for number in self._tail_segments():
+                replay_segment(self, self._segment_path(number), truncate=True)
+                self.segment_number = number
+
+    def _load_base(self, state):
+        """
+        Load the latest snapshot, or the base JSON file if there is none, into state.
+        Returns the first segment number not covered by it.
+        """
+        snapshot_number = self.latest_snapshot()
+        if snapshot_number is None:
+            PersistentDB._load(state)
+            return 0
+        state._load_state(self._read_snapshot(snapshot_number))
+        self.segment_number = max(self.segment_number, snapshot_number)
+        return snapshot_number
+
+    def _tail_segments(self, stop=None):
+        first = self.latest_snapshot() or 0
+        return [n for n in self.list_segments() if n >= first and (stop is None or n < stop)]
+
+    def _list_files(self, prefix, suffix):
+        if not os.path.isdir(self.directory):
+            return []
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(suffix):
+                numbers.append(int(name[len(prefix):-len(suffix)]))
+        return sorted(numbers)
+
+    def list_segments(self):
+        """
+        Return the numbers of all segment files on disk, in ascending order.
+        """
+        return self._list_files(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+
+    def list_snapshots(self):
+        return self._list_files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+
+    def latest_snapshot(self):
+        """
+        Return the number of the newest snapshot, or None if there is none.
+        A snapshot numbered N holds the state produced by every segment numbered below N.
+        """
+        numbers = self.list_snapshots()
+        return numbers[-1] if numbers else None
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, segment_name(number))
+
+    def _snapshot_path(self, number):
+        return os.path.join(self.directory, snapshot_name(number))
+
+    def _read_snapshot(self, number):
+        with open(self._snapshot_path(number), 'r') as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported ledger snapshot version: {snapshot.get('version')}")
+        return snapshot['state']
+
+    def _apply(self, op, args):
+        apply_record(self, op, args)
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.segment_number == 0:
+            self.segment_number = 1
+        self.segment_file = open(self._segment_path(self.segment_number), 'ab')
+
+    def _rotate(self):
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+        self._mark_synced()
+        self.segment_file.close()
+        self.segment_number += 1
+        self.segment_file = open(self._segment_path(self.segment_number), 'ab')
+        logger.info(f"Rotated ledger log to segment {self.segment_number}")
+
+    def _save(self):
+        # Mutations are persisted record by record; there is no whole-ledger rewrite
+        self.sync()
+
+    def _persist(self, op, args):
+        self._write(encode_record(op, args).encode('utf-8'))
+
+    def _persist_batch(self, ops):
+        # One record for the whole transaction, so replay applies all of it or none of it
+        self._persist('batch', [[[op, *args] for op, args in coalesce_ops(ops)]])
+
+    def _write(self, data):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Ledger log is closed")
+            if self.segment_file is None:
+                self._open_segment()
+            elif self.segment_file.tell() >= self.segment_size:
+                self._rotate()
+            self.segment_file.write(data)
+            self.segment_file.flush()
+            self.written += 1
+            self.records_since_snapshot += 1
+            ticket = self.written
+        if self.sync_interval <= 0:
+            self.sync()
+            return
+        self.sync_event.set()
+        with self.sync_cond:
+            # close() syncs before it sets closed, so a writer released by it is durable too
+            self.sync_cond.wait_for(lambda: self.synced >= ticket or self.closed)
+
+    def _mark_synced(self):
+        # Called with self.lock held, right after an fsync of the current segment
+        self.synced = self.written
+        self.sync_cond.notify_all()
+
+    def sync(self):
+        """
+        fsync every record written so far.
+        """
+        with self.lock:
+            if self.segment_file is not None and self.synced < self.written:
+                os.fsync(self.segment_file.fileno())
+                self._mark_synced()
+
+    def _flush_loop(self):
+        while not self.closed:
+            self.sync_event.wait()
+            self.sync_event.clear()
+            # Let concurrent writers pile up so one fsync covers all of them
+            time.sleep(self.sync_interval)
+            self.sync()
+
+    def compact(self):
+        """
+        Write a snapshot covering every sealed segment, then delete those segments and older snapshots.
+        The snapshot is rebuilt from disk, so writers are only held up while the segment is rotated.
+        Returns the new snapshot number, or None if nothing was written since the last snapshot.
+        """
+        with self.compaction_lock:
+            with self.lock:
+                if self.closed or self.segment_file is None or self.records_since_snapshot == 0:
+                    return None
+                self._rotate()
+                self.records_since_snapshot = 0
+                snapshot_number = self.segment_number
+
+            state = PersistentDB.__new__(PersistentDB)
+            state.filepath = self.filepath
+            self._load_base(state)
+            sealed = self._tail_segments(stop=snapshot_number)
+            for number in sealed:
+                replay_segment(state, self._segment_path(number))
+
+            snapshot = {'version': SNAPSHOT_VERSION, 'segment': snapshot_number, 'state': state._dump_state()}
+            tmp_path = self._snapshot_path(snapshot_number) + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._snapshot_path(snapshot_number))
+
+            for number in self.list_segments():
+                if number < snapshot_number:
+                    os.remove(self._segment_path(number))
+            for number in self.list_snapshots():
+                if number < snapshot_number:
+                    os.remove(self._snapshot_path(number))
+            logger.info(f"Compacted {len(sealed)} ledger log segments into snapshot {snapshot_number}")
+            return snapshot_number
+
+    def _compact_loop(self):
+        while not self.closed:
+            time.sleep(self.snapshot_interval)
+            if self.closed:
+                break
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Ledger log compaction failed: {e}")
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self.sync()
+        with self.lock:
+            self.closed = True
+            self.sync_cond.notify_all()
+            if self.segment_file is not None:
+                self.segment_file.close()
+                self.segment_file = None
+        self.sync_event.set()
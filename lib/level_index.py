@@ -0,0 +1,136 @@
+"""
+level_index.py
+
+In-memory index of entries by confirmation level, with live confirmation latency statistics.
+Features:
+1. O(1) Moves: Each level keeps a dict of its members, so adding an entry or moving it between levels is O(1).
+2. Counts: Per-level counts are kept alongside, so dashboards read them without scanning the ledger.
+3. Pagination: Each level also keeps an append-only list in arrival order. Listings resume after an
+   arrival sequence number, and entries that have since left the level are skipped. The list is compacted
+   once more than half of it is stale.
+4. Latency Histograms: The time from publication (the entry timestamp) to reaching each level is counted
+   in fixed buckets, along with its count, sum and maximum.
+"""
+
+from bisect import bisect_left
+from threading import RLock
+
+# Upper bounds of the latency buckets in seconds; the last bucket takes everything slower
+LATENCY_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 21600, 86400]
+
+class LatencyHistogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        seconds = max(0.0, seconds)
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        buckets = {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets['gt_' + str(self.bounds[-1])] = self.counts[-1]
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': buckets,
+        }
+
+class LevelIndex:
+    def __init__(self, levels=()):
+        self.members = {}  # level -> {entry hash: arrival sequence number}
+        self.order = {}  # level -> [(sequence number, entry hash)] in arrival order, possibly stale
+        self.level_of = {}  # entry hash -> level
+        self.latency = {}  # level -> LatencyHistogram
+        self.seq = 0
+        self.lock = RLock()
+        for entry_hash, level in levels:
+            self.add(entry_hash, level)
+
+    def add(self, entry_hash, level):
+        """
+        Place entry_hash at level, moving it out of its previous level if it had one.
+        """
+        with self.lock:
+            previous = self.level_of.get(entry_hash)
+            if previous == level:
+                return
+            if previous is not None:
+                del self.members[previous][entry_hash]
+                self._compact(previous)
+            self.seq += 1
+            self.members.setdefault(level, {})[entry_hash] = self.seq
+            self.order.setdefault(level, []).append((self.seq, entry_hash))
+            self.level_of[entry_hash] = level
+
+    def move(self, entry_hash, level, previous=None, latency=None):
+        """
+        Record that entry_hash reached level, optionally latency seconds after publication.
+        previous is the level it left; this index tracks that itself and only takes it for engines that do not.
+        """
+        with self.lock:
+            self.add(entry_hash, level)
+            if latency is not None:
+                self.latency.setdefault(level, LatencyHistogram()).observe(latency)
+
+    def discard(self, entry_hash):
+        """
+        Remove entry_hash from the index, e.g. when storing it is rolled back.
+        """
+        with self.lock:
+            level = self.level_of.pop(entry_hash, None)
+            if level is not None:
+                del self.members[level][entry_hash]
+                self._compact(level)
+
+    def _compact(self, level):
+        order = self.order[level]
+        if len(order) > 32 and len(order) > 2 * len(self.members[level]):
+            members = self.members[level]
+            self.order[level] = [(seq, h) for seq, h in order if members.get(h) == seq]
+
+    def clear(self):
+        with self.lock:
+            self.members, self.order, self.level_of, self.latency = {}, {}, {}, {}
+
+    def level(self, entry_hash):
+        return self.level_of.get(entry_hash)
+
+    def below(self, level):
+        """
+        Return the hashes of every entry at a level below level.
+        """
+        with self.lock:
+            return [h for lv, members in self.members.items() if lv < level for h in members]
+
+    def counts(self):
+        with self.lock:
+            return {level: len(members) for level, members in sorted(self.members.items()) if members}
+
+    def latency_stats(self):
+        with self.lock:
+            return {level: histogram.to_dict() for level, histogram in sorted(self.latency.items())}
+
+    def list(self, level, after=None, limit=100):
+        """
+        Return (hashes, cursor) for up to limit entries at level, in the order they reached it.
+        Pass cursor back as after for the next page; it is None once the level is exhausted.
+        """
+        with self.lock:
+            order = self.order.get(level, [])
+            members = self.members.get(level, {})
+            i = bisect_left(order, (int(after) + 1,)) if after is not None else 0
+            page = []
+            while i < len(order) and len(page) < limit:
+                seq, entry_hash = order[i]
+                if members.get(entry_hash) == seq:
+                    page.append(entry_hash)
+                i += 1
+            return page, (str(order[i - 1][0]) if len(page) == limit and i < len(order) else None)
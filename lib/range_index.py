@@ -0,0 +1,55 @@
+"""
+range_index.py
+
+Ordered in-memory index used for height and timestamp range queries over the DAG.
+Features:
+1. Sorted Keys: Holds (key, entry hash) pairs in sorted order; entries mostly arrive with the largest key,
+   so inserts land at or near the end of the list.
+2. Range Slices: range() bisects to the first pair in the range and reads only the requested page,
+   so a slice costs O(log n + page) however large the ledger is.
+3. Keyset Pagination: Pages resume strictly after the last (key, hash) returned, so concurrent inserts
+   never shift or repeat results the way offsets would.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from threading import RLock
+
+class RangeIndex:
+    def __init__(self, pairs=()):
+        self.pairs = sorted(pairs)
+        self.lock = RLock()
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def add(self, key, entry_hash):
+        with self.lock:
+            insort(self.pairs, (key, entry_hash))
+
+    def discard(self, key, entry_hash):
+        with self.lock:
+            i = bisect_left(self.pairs, (key, entry_hash))
+            if i < len(self.pairs) and self.pairs[i] == (key, entry_hash):
+                del self.pairs[i]
+
+    def clear(self):
+        with self.lock:
+            self.pairs = []
+
+    def range(self, start=None, end=None, after=None, limit=100):
+        """
+        Return up to limit (key, hash) pairs with start <= key < end, in ascending order.
+        after is the last pair of the previous page; the page starts strictly after it.
+        """
+        with self.lock:
+            pairs = self.pairs
+            i = bisect_left(pairs, (start,)) if start is not None else 0
+            if after is not None:
+                i = max(i, bisect_right(pairs, tuple(after)))
+            page = []
+            while i < len(pairs) and len(page) < limit:
+                if end is not None and pairs[i][0] >= end:
+                    break
+                page.append(pairs[i])
+                i += 1
+            return page
@@ -0,0 +1,633 @@
+"""
+sqlite_store.py
+
+SQLite storage engine for the AquiMatrix ledger.
+Features:
+1. Disk-Resident Tables: Entries, balances, stakes, difficulties and timestamps live in SQLite, not in RAM.
+2. Indexed Lookups: get_entry, check_entry_exists and the balance getters are primary-key lookups.
+3. WAL Journal: The database runs in WAL mode. Reads borrow a connection from a small bounded pool, so readers
+   never block the writer and only ever see committed rows; a thread inside a transaction reads its own writes.
+4. Drop-In Views: Each table is exposed as a dict/set/list-like view, so database_access works unchanged.
+5. Successor Index: An indexed predecessor -> successor table answers get_entry_references.
+   Heights and the tip set are kept in their own tables, so tips are served right after startup.
+6. Entry Cache: With entry_cache_size set, get_entry is served through a bounded LRU cache (see entry_cache.py).
+7. Compact Bodies: With "entry_encoding": "compact", entry bodies are stored as binary blobs (see entry_codec.py).
+8. Range Queries: Height and timestamp slices are read from composite (key, hash) indexes, one page at a time.
+9. Level Index: Per-level entry counts are kept in their own table and updated on every insert and promotion;
+   entries at a level are listed from a composite (level, hash) index.
+10. Finality Log: Finalized entries are numbered by an autoincrement key, so resuming from a sequence number
+    is an index range scan.
+Selected with "engine": "sqlite" in config/storage_config.json.
+"""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from collections.abc import MutableMapping, MutableSet
+from queue import Empty, LifoQueue
+from threading import Lock, local
+
+from lib.database_access import PersistentDB, entry_encoding, index_successors, rebuild_dag_indexes
+from lib.entry_cache import LRUEntryCache
+from lib.entry_codec import decode_entry, encode_entry
+from lib.level_index import LatencyHistogram
+
+BALANCE_TABLES = ['token_balances', 'lrw_balances', 'stake_balances', 'staking_rewards', 'stakes']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    hash TEXT PRIMARY KEY,
+    timestamp INTEGER,
+    level INTEGER NOT NULL DEFAULT 0,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS entries_level ON entries (level);
+CREATE TABLE IF NOT EXISTS invalid_entries (hash TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS difficulties (seq INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS timestamps (seq INTEGER PRIMARY KEY AUTOINCREMENT, value);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS successors (pred TEXT NOT NULL, succ TEXT NOT NULL, UNIQUE (pred, succ));
+CREATE TABLE IF NOT EXISTS heights (hash TEXT PRIMARY KEY, height INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS heights_height ON heights (height, hash);
+CREATE INDEX IF NOT EXISTS entries_timestamp_hash ON entries (timestamp, hash);
+CREATE TABLE IF NOT EXISTS tips (hash TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS weights (hash TEXT PRIMARY KEY, weight);
+CREATE INDEX IF NOT EXISTS entries_level_hash ON entries (level, hash);
+CREATE TABLE IF NOT EXISTS level_counts (level INTEGER PRIMARY KEY, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS finality_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL UNIQUE,
+    level INTEGER NOT NULL,
+    miner_id TEXT,
+    time REAL
+);
+""" + "".join(
+    # Amount columns are deliberately untyped so ints stay ints and floats stay floats
+    f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, amount);\n" for table in BALANCE_TABLES
+)
+
+class SQLiteTable(MutableMapping):
+    """
+    Dict-like view over a two-column key/value table.
+    """
+    def __init__(self, db, table, key_column='key', value_column='amount'):
+        self.db = db
+        self.table = table
+        self.key_column = key_column
+        self.value_column = value_column
+
+    def encode(self, value):
+        return value
+
+    def decode(self, value):
+        return value
+
+    def __getitem__(self, key):
+        row = self.db.query_one(
+            f"SELECT {self.value_column} FROM {self.table} WHERE {self.key_column} = ?", (key,))
+        if row is None:
+            raise KeyError(key)
+        return self.decode(row[0])
+
+    def __setitem__(self, key, value):
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self.table} ({self.key_column}, {self.value_column}) VALUES (?, ?)",
+            (key, self.encode(value)))
+
+    def __delitem__(self, key):
+        if self.db.execute(f"DELETE FROM {self.table} WHERE {self.key_column} = ?", (key,)) == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.db.query_one(
+            f"SELECT 1 FROM {self.table} WHERE {self.key_column} = ?", (key,)) is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.db.query(f"SELECT {self.key_column} FROM {self.table}"))
+
+    def __len__(self):
+        return self.db.query_one(f"SELECT COUNT(*) FROM {self.table}")[0]
+
+    def items(self):
+        rows = self.db.query(f"SELECT {self.key_column}, {self.value_column} FROM {self.table}")
+        return [(key, self.decode(value)) for key, value in rows]
+
+    def clear(self):
+        self.db.execute(f"DELETE FROM {self.table}")
+
+def decode_body(value):
+    # Rows written under either entry encoding can be read back
+    if isinstance(value, bytes):
+        return decode_entry(value)
+    return json.loads(value)
+
+class SQLiteEntries(SQLiteTable):
+    """
+    Entry table view; timestamp and level are mirrored into indexed columns.
+    """
+    def __init__(self, db):
+        super().__init__(db, 'entries', key_column='hash', value_column='body')
+
+    def encode(self, value):
+        if entry_encoding == 'compact':
+            return encode_entry(value)
+        return json.dumps(value, separators=(',', ':'))
+
+    def decode(self, value):
+        return decode_body(value)
+
+    def __setitem__(self, key, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (hash, timestamp, level, body) VALUES (?, ?, ?, ?)",
+            (key, value.get('timestamp'), value.get('level', 0), self.encode(value)))
+
+class SQLiteSet(MutableSet):
+    """
+    Set-like view over a single-column table.
+    """
+    def __init__(self, db, table, column='hash'):
+        self.db = db
+        self.table = table
+        self.column = column
+
+    def __contains__(self, value):
+        return self.db.query_one(
+            f"SELECT 1 FROM {self.table} WHERE {self.column} = ?", (value,)) is not None
+
+    def __iter__(self):
+        return (row[0] for row in self.db.query(f"SELECT {self.column} FROM {self.table}"))
+
+    def __len__(self):
+        return self.db.query_one(f"SELECT COUNT(*) FROM {self.table}")[0]
+
+    def add(self, value):
+        self.db.execute(f"INSERT OR IGNORE INTO {self.table} ({self.column}) VALUES (?)", (value,))
+
+    def discard(self, value):
+        self.db.execute(f"DELETE FROM {self.table} WHERE {self.column} = ?", (value,))
+
+    def clear(self):
+        self.db.execute(f"DELETE FROM {self.table}")
+
+class SQLiteSuccessors:
+    """
+    Predecessor -> successors index; the UNIQUE constraint doubles as the lookup index on pred.
+    """
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, pred, succ):
+        self.db.execute("INSERT OR IGNORE INTO successors (pred, succ) VALUES (?, ?)", (pred, succ))
+
+    def get(self, pred, default=None):
+        rows = self.db.query("SELECT succ FROM successors WHERE pred = ? ORDER BY rowid", (pred,))
+        return [row[0] for row in rows] if rows else default
+
+    def __contains__(self, pred):
+        return self.db.query_one("SELECT 1 FROM successors WHERE pred = ?", (pred,)) is not None
+
+    def count(self, pred):
+        return self.db.query_one("SELECT COUNT(*) FROM successors WHERE pred = ?", (pred,))[0]
+
+    def clear(self):
+        self.db.execute("DELETE FROM successors")
+
+class SQLiteRangeIndex:
+    """
+    Range view over a (key, hash) column pair, answered from a composite index with keyset pagination.
+    """
+    def __init__(self, db, table, key_column):
+        self.db = db
+        self.table = table
+        self.key_column = key_column
+
+    def __len__(self):
+        return self.db.query_one(f"SELECT COUNT({self.key_column}) FROM {self.table}")[0]
+
+    def range(self, start=None, end=None, after=None, limit=100):
+        clauses, params = [f"{self.key_column} IS NOT NULL"], []
+        if start is not None:
+            clauses.append(f"{self.key_column} >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"{self.key_column} < ?")
+            params.append(end)
+        if after is not None:
+            clauses.append(f"({self.key_column}, hash) > (?, ?)")
+            params.extend(after)
+        rows = self.db.query(
+            f"SELECT {self.key_column}, hash FROM {self.table} WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {self.key_column}, hash LIMIT ?", params + [limit])
+        return [tuple(row) for row in rows]
+
+    def clear(self):
+        # The rows belong to the underlying table, which is cleared through its own view
+        pass
+
+class SQLiteLevelIndex:
+    """
+    Level index over the entries table. Counts live in level_counts, so reading them is one small query;
+    latency histograms are kept in memory, as in LevelIndex.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.latency = {}
+
+    def _shift(self, level, delta):
+        self.db.execute("INSERT OR IGNORE INTO level_counts (level, count) VALUES (?, 0)", (level,))
+        self.db.execute("UPDATE level_counts SET count = count + ? WHERE level = ?", (delta, level))
+
+    def add(self, entry_hash, level):
+        # Called once per new entry, before its row is written
+        self._shift(level, 1)
+
+    def move(self, entry_hash, level, previous=None, latency=None):
+        if previous is None:
+            row = self.db.query_one("SELECT level FROM entries WHERE hash = ?", (entry_hash,))
+            previous = row[0] if row else None
+        if previous == level:
+            return
+        if previous is not None:
+            self._shift(previous, -1)
+        self._shift(level, 1)
+        if latency is not None:
+            self.latency.setdefault(level, LatencyHistogram()).observe(latency)
+
+    def counts(self):
+        rows = self.db.query("SELECT level, count FROM level_counts WHERE count > 0 ORDER BY level")
+        return {level: count for level, count in rows}
+
+    def latency_stats(self):
+        return {level: histogram.to_dict() for level, histogram in sorted(self.latency.items())}
+
+    def min_height_below(self, level):
+        row = self.db.query_one(
+            "SELECT MIN(h.height) FROM entries e JOIN heights h ON h.hash = e.hash WHERE e.level < ?", (level,))
+        return row[0] if row else None
+
+    def list(self, level, after=None, limit=100):
+        # Listed in hash order, so the cursor is simply the last hash of the page
+        rows = self.db.query(
+            "SELECT hash FROM entries WHERE level = ? AND hash > ? ORDER BY hash LIMIT ?",
+            (level, after or '', limit))
+        page = [row[0] for row in rows]
+        return page, (page[-1] if len(page) == limit else None)
+
+    def rebuild(self):
+        self.db.execute("DELETE FROM level_counts")
+        self.db.execute("INSERT INTO level_counts (level, count) SELECT level, COUNT(*) FROM entries GROUP BY level")
+
+    def clear(self):
+        self.db.execute("DELETE FROM level_counts")
+        self.latency = {}
+
+class SQLiteFinalityLog:
+    """
+    Finality log view; the reward watermark is kept in the meta table.
+    """
+    COLUMNS = ('seq', 'hash', 'level', 'miner_id', 'time')
+
+    def __init__(self, db):
+        self.db = db
+
+    def _record(self, row):
+        return dict(zip(self.COLUMNS, row)) if row is not None else None
+
+    def add(self, record):
+        self.db.execute(
+            "INSERT OR IGNORE INTO finality_log (seq, hash, level, miner_id, time) VALUES (?, ?, ?, ?, ?)",
+            tuple(record.get(column) for column in self.COLUMNS))
+
+    def append(self, entry_hash, level, miner_id=None, timestamp=None):
+        # INSERT OR IGNORE would use up a sequence number on a duplicate, leaving a gap
+        if self.db.execute(
+                "INSERT INTO finality_log (hash, level, miner_id, time) SELECT ?, ?, ?, ? "
+                "WHERE NOT EXISTS (SELECT 1 FROM finality_log WHERE hash = ?)",
+                (entry_hash, level, miner_id, timestamp, entry_hash)) == 0:
+            return None
+        return self.get(entry_hash)
+
+    def get(self, entry_hash):
+        return self._record(self.db.query_one(
+            "SELECT seq, hash, level, miner_id, time FROM finality_log WHERE hash = ?", (entry_hash,)))
+
+    def last_seq(self):
+        return self.db.query_one("SELECT COALESCE(MAX(seq), 0) FROM finality_log")[0]
+
+    def published_seq(self):
+        # Outside a transaction reads go through the reader pool, which only sees committed rows
+        return self.last_seq()
+
+    def since(self, after=0, limit=100):
+        rows = self.db.query(
+            "SELECT seq, hash, level, miner_id, time FROM finality_log WHERE seq > ? ORDER BY seq LIMIT ?",
+            (after or 0, limit))
+        return [self._record(row) for row in rows]
+
+    @property
+    def rewarded(self):
+        row = self.db.query_one("SELECT value FROM meta WHERE key = 'finality_rewarded'")
+        return row[0] if row else 0
+
+    @rewarded.setter
+    def rewarded(self, seq):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('finality_rewarded', ?)", (seq,))
+
+    def clear(self):
+        self.db.execute("DELETE FROM finality_log")
+        self.rewarded = 0
+
+    def __len__(self):
+        return self.db.query_one("SELECT COUNT(*) FROM finality_log")[0]
+
+class SQLiteSeries:
+    """
+    Append-only list-like view over a table ordered by an autoincrement sequence.
+    """
+    def __init__(self, db, table, column='value', as_json=False):
+        self.db = db
+        self.table = table
+        self.column = column
+        self.as_json = as_json
+
+    def decode(self, value):
+        return json.loads(value) if self.as_json else value
+
+    def append(self, value):
+        if self.as_json:
+            value = json.dumps(value, separators=(',', ':'))
+        self.db.execute(f"INSERT INTO {self.table} ({self.column}) VALUES (?)", (value,))
+
+    def __len__(self):
+        return self.db.query_one(f"SELECT COUNT(*) FROM {self.table}")[0]
+
+    def __iter__(self):
+        rows = self.db.query(f"SELECT {self.column} FROM {self.table} ORDER BY seq")
+        return (self.decode(row[0]) for row in rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) and index.step is None and index.stop is None \
+                and index.start is not None and index.start < 0:
+            # Fast path for the "last m values" query
+            rows = self.db.query(
+                f"SELECT {self.column} FROM {self.table} ORDER BY seq DESC LIMIT ?", (-index.start,))
+            return [self.decode(row[0]) for row in reversed(rows)]
+        return list(self)[index]
+
+    def clear(self):
+        self.db.execute(f"DELETE FROM {self.table}")
+
+class SQLiteEntryCache(LRUEntryCache):
+    """
+    Entry cache that never holds a body read or written inside a transaction that has not committed yet,
+    since the cache is shared by every thread.
+    """
+    def __init__(self, db, backing, max_entries):
+        super().__init__(backing, max_entries)
+        self.db = db
+        self.pending = local()  # keys written by this thread's open transaction
+
+    def _pending(self):
+        if not hasattr(self.pending, 'keys'):
+            self.pending.keys = set()
+        return self.pending.keys
+
+    def __getitem__(self, key):
+        if not self.db.in_transaction():
+            return super().__getitem__(key)
+        pending = self._pending()
+        with self.lock:
+            if key not in pending and key in self.cache:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.misses += 1
+        # Not remembered: the body may be one this transaction has not committed yet
+        return self.backing[key]
+
+    def __setitem__(self, key, value):
+        if not self.db.in_transaction():
+            super().__setitem__(key, value)
+            return
+        self.backing[key] = value
+        self._forget_on_commit(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        if self.db.in_transaction():
+            self._forget_on_commit(key)
+
+    def __contains__(self, key):
+        if self.db.in_transaction() and key in self._pending():
+            return key in self.backing
+        return super().__contains__(key)
+
+    def _forget_on_commit(self, key):
+        self.discard(key)
+        self._pending().add(key)
+        # Another thread may cache the committed body before this transaction commits
+        self.db.after_commit(lambda: self._forget(key))
+
+    def _forget(self, key):
+        self.discard(key)
+        self._pending().discard(key)
+
+    def invalidate(self):
+        super().invalidate()
+        self._pending().clear()
+
+class SQLiteDB(PersistentDB):
+    # Rows are reverted by the SQLite rollback itself, so no undo records are kept
+    record_undo = None
+
+    def __init__(self, filepath='ledger.db', entry_cache_size=0, reader_connections=4):
+        self.entry_cache_size = entry_cache_size
+        self.closed = False
+        # Idle read connections; at most reader_connections are ever opened, however many threads read
+        self.readers = LifoQueue()
+        self.reader_count = 0
+        self.reader_limit = max(1, reader_connections)
+        self.reader_lock = Lock()
+        self.conn = sqlite3.connect(filepath, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        super().__init__(filepath)
+        if self.query_one("SELECT 1 FROM successors") is None and len(self.entries):
+            # Databases created before the successor index existed are indexed in one pass
+            with self.transaction():
+                for entry_hash, entry in self.entries.items():
+                    index_successors(self, entry_hash, entry)
+        if self.query_one("SELECT 1 FROM heights") is None and len(self.entries):
+            # Heights and tips are derived in one pass over the entries in timestamp order
+            with self.transaction():
+                rebuild_dag_indexes(self, self.iter_entries_by_time())
+        if self.query_one("SELECT 1 FROM level_counts") is None and len(self.entries):
+            # Level counts are taken from the entries table once; afterwards they are kept up to date
+            with self.transaction():
+                self.level_index.rebuild()
+
+    def execute(self, sql, params=()):
+        """
+        Run a write statement and return the number of affected rows.
+        Outside a transaction the statement commits at once, so it can never be swept into
+        (or rolled back with) another thread's transaction on the shared connection.
+        """
+        with self.txn_lock, self.lock:
+            rowcount = self.conn.execute(sql, params).rowcount
+            if not self.in_transaction():
+                self.conn.commit()
+            return rowcount
+
+    def _shares_writer(self):
+        # Inside a transaction reads must see its own writes; in-memory databases cannot be opened twice
+        return self.in_transaction() or self.filepath == ':memory:'
+
+    @contextmanager
+    def _reader(self):
+        """
+        Borrow an idle read connection, opening one while fewer than reader_limit exist, else wait for one.
+        """
+        try:
+            conn = self.readers.get_nowait()
+        except Empty:
+            with self.reader_lock:
+                opening = self.reader_count < self.reader_limit
+                if opening:
+                    self.reader_count += 1
+            conn = sqlite3.connect(self.filepath, check_same_thread=False) if opening else self.readers.get()
+        try:
+            yield conn
+        finally:
+            if self.closed:
+                conn.close()
+            else:
+                self.readers.put(conn)
+
+    def _read(self, sql, params, fetch):
+        if self._shares_writer():
+            with self.lock:
+                return fetch(self.conn.execute(sql, params))
+        with self._reader() as conn:
+            cursor = conn.execute(sql, params)
+            try:
+                return fetch(cursor)
+            finally:
+                # Reset the statement, or its read snapshot stays open and later reads miss new commits
+                cursor.close()
+
+    def query(self, sql, params=()):
+        return self._read(sql, params, lambda cursor: cursor.fetchall())
+
+    def query_one(self, sql, params=()):
+        return self._read(sql, params, lambda cursor: cursor.fetchone())
+
+    def iter_entries_by_time(self):
+        """
+        Yield (hash, entry) pairs oldest first. The cursor streams rows, so the table is never loaded at once.
+        Only used during startup, before other threads share the connection.
+        """
+        for entry_hash, body in self.conn.execute("SELECT hash, body FROM entries ORDER BY timestamp"):
+            yield entry_hash, decode_body(body)
+
+    def _load(self):
+        self.entries = SQLiteEntries(self)
+        if self.entry_cache_size > 0:
+            self.entries = SQLiteEntryCache(self, self.entries, self.entry_cache_size)
+        self.invalid_entries = SQLiteSet(self, 'invalid_entries')
+        self.difficulties = SQLiteSeries(self, 'difficulties', column='body', as_json=True)
+        self.timestamps = SQLiteSeries(self, 'timestamps')
+        for table in BALANCE_TABLES:
+            setattr(self, table, SQLiteTable(self, table))
+        self.successors = SQLiteSuccessors(self)
+        self.heights = SQLiteTable(self, 'heights', key_column='hash', value_column='height')
+        self.tips = SQLiteSet(self, 'tips')
+        self.weights = SQLiteTable(self, 'weights', key_column='hash', value_column='weight')
+        self.height_index = SQLiteRangeIndex(self, 'heights', 'height')
+        self.time_index = SQLiteRangeIndex(self, 'entries', 'timestamp')
+        self.level_index = SQLiteLevelIndex(self)
+        self.finality_log = SQLiteFinalityLog(self)
+
+    def _attach_archives(self):
+        # Series rows already live on disk; nothing falls out of a ring here
+        pass
+
+    @property
+    def vault_balance(self):
+        row = self.query_one("SELECT value FROM meta WHERE key = 'vault_balance'")
+        return row[0] if row else 0
+
+    @vault_balance.setter
+    def vault_balance(self, balance):
+        self.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('vault_balance', ?)", (balance,))
+
+    def _save(self):
+        with self.lock:
+            self.conn.commit()
+
+    def _persist(self, op, args):
+        # The row was already written through a table view; only the transaction is left to commit
+        self._save()
+
+    def _persist_batch(self, ops):
+        self._save()
+
+    def _has_unlogged_writes(self):
+        # Index rebuilds write through execute() without logging an op; they still have to be committed
+        with self.lock:
+            return self.conn.in_transaction
+
+    @contextmanager
+    def savepoint(self):
+        if not self.in_transaction():
+            with self.transaction([]):
+                yield self
+            return
+        state = self.txn_state
+        marks = len(state.ops), len(state.after_commit)
+        if not hasattr(state, 'savepoints'):
+            state.savepoints = []
+        name = f"sp{len(state.savepoints)}"
+        with self.lock:
+            if not self.conn.in_transaction:
+                # Releasing a savepoint that opened the transaction would commit it
+                self.conn.execute("BEGIN")
+            self.conn.execute(f"SAVEPOINT {name}")
+        state.savepoints.append(name)
+        try:
+            yield self
+        except BaseException:
+            with self.lock:
+                self.conn.execute(f"ROLLBACK TO {name}")
+                self.conn.execute(f"RELEASE {name}")
+            del state.ops[marks[0]:], state.after_commit[marks[1]:]
+            if isinstance(self.entries, LRUEntryCache):
+                self.entries.invalidate()
+            raise
+        else:
+            with self.lock:
+                self.conn.execute(f"RELEASE {name}")
+        finally:
+            state.savepoints.pop()
+
+    def _rollback(self, undo=()):
+        with self.lock:
+            self.conn.rollback()
+        if isinstance(self.entries, LRUEntryCache):
+            self.entries.invalidate()
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        with self.lock:
+            self.closed = True
+            self.conn.commit()
+            self.conn.close()
+        while True:
+            try:
+                self.readers.get_nowait().close()
+            except Empty:
+                break
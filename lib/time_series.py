@@ -0,0 +1,128 @@
+"""
+time_series.py
+
+Fixed-capacity, array-backed time series for ledger metrics such as entry timestamps and difficulties.
+Features:
+1. Ring Buffer: Only the newest `capacity` points are kept; appends never grow memory.
+2. Compact Storage: Numeric series are packed into an `array` instead of a list of Python objects.
+3. Archival: Points pushed out of the ring can be appended to an archive file on disk.
+4. List Semantics: Indexing, negative slicing (e.g. series[-m:]), iteration and len() behave like a list.
+"""
+
+import json
+import os
+from array import array
+
+class RingSeries:
+    def __init__(self, capacity, typecode=None, values=(), archive_path=None):
+        self.capacity = capacity
+        self.typecode = typecode
+        if typecode is None:
+            self.buffer = [None] * capacity
+        else:
+            self.buffer = array(typecode, [0]) * capacity
+        self.start = 0
+        self.size = 0
+        self.archive_path = archive_path
+        # Points loaded from a previous run were archived then, if at all
+        for value in list(values)[-capacity:]:
+            self._push(self.encode(value))
+
+    def encode(self, value):
+        return value
+
+    def decode(self, value):
+        return value
+
+    def _push(self, value):
+        if self.size < self.capacity:
+            self.buffer[(self.start + self.size) % self.capacity] = value
+            self.size += 1
+            return None
+        evicted = self.buffer[self.start]
+        self.buffer[self.start] = value
+        self.start = (self.start + 1) % self.capacity
+        return evicted
+
+    def append(self, value):
+        evicted = self._push(self.encode(value))
+        if evicted is not None and self.archive_path:
+            self.archive(evicted)
+
+    def pop(self):
+        """
+        Remove and return the newest point, e.g. to undo an append.
+        """
+        if self.size == 0:
+            raise IndexError("pop from empty series")
+        self.size -= 1
+        return self.decode(self.buffer[(self.start + self.size) % self.capacity])
+
+    def appendleft(self, value):
+        """
+        Put a point back in front of the oldest one, if there is room.
+        """
+        if self.size < self.capacity:
+            self.start = (self.start - 1) % self.capacity
+            self.buffer[self.start] = self.encode(value)
+            self.size += 1
+
+    def archive(self, value):
+        directory = os.path.dirname(self.archive_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.typecode is None:
+            with open(self.archive_path, 'a') as f:
+                f.write(json.dumps(self.decode(value), separators=(',', ':')) + '\n')
+        else:
+            with open(self.archive_path, 'ab') as f:
+                f.write(array(self.typecode, [value]).tobytes())
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("series index out of range")
+        return self.decode(self.buffer[(self.start + index) % self.capacity])
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.decode(self.buffer[(self.start + i) % self.capacity])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def tolist(self):
+        return list(self)
+
+class DifficultySeries(RingSeries):
+    """
+    Ring of difficulty records, kept as (target, k, delta) tuples and read back as dicts.
+    Targets are arbitrary-precision ints, so this series is not array-packed.
+    """
+    def __init__(self, capacity, values=(), archive_path=None):
+        super().__init__(capacity, values=values, archive_path=archive_path)
+
+    def encode(self, value):
+        return (value['target'], value['k'], value['delta'])
+
+    def decode(self, value):
+        target, k, delta = value
+        return {'target': target, 'k': k, 'delta': delta}
+
+def mean_interval(points):
+    """
+    Average gap between consecutive points. The gaps telescope, so only the end points are read.
+    """
+    if len(points) < 2:
+        return None
+    return (points[-1] - points[0]) / (len(points) - 1)
@@ -1,26 +1,19 @@
 import asyncio
+import collections.abc
 import logging
 import websockets
 import json
 import time
 import hashlib
-import requests
-import lib.database_access as db_access
+from consensus_engine.ledger_service import get_ledger_service
+from lib.async_db import get_async_ledger
 from network import p2p_network
 
 logger = logging.getLogger('mining_backend')
 
-API_URL = "http://localhost:9000"
-
 def reset_ledger():
-    # Clear the in-memory database to reset ledger state
-    global db_access
-    db_access.db_instance.entries.clear()
-    db_access.db_instance.invalid_entries.clear()
-    db_access.db_instance.token_balances.clear()
-    db_access.db_instance.difficulties.clear()
-    db_access.db_instance.timestamps.clear()
-    logger.info("Ledger state has been reset to genesis.")
+    # Clear the shared ledger back to genesis and rebuild the service on top of it
+    get_ledger_service().reset()
 
 def create_entry(predecessor_hashes, nonce):
     timestamp = int(time.time())
@@ -51,6 +44,14 @@ def create_entry(predecessor_hashes, nonce):
     entry["hash"] = entry_hash
     return entry
 
+def to_standard_dict(obj):
+    if isinstance(obj, collections.abc.Mapping):
+        return {str(k): to_standard_dict(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [to_standard_dict(i) for i in obj]
+    else:
+        return obj
+
 async def send_mining_status(websocket):
     import random
     nonce = 0
@@ -77,15 +78,22 @@ async def send_mining_status(websocket):
         today_mining = 0.0
         pending_rewards = 0.0
         fees_paid = 0.0
+        confirmation_levels = {f"L{level}": 0 for level in range(4)}
+        ledger = get_async_ledger()
         try:
-            token_balances = db_access.db_instance.token_balances
-            balance = token_balances.get("main_account", 0.0)
+            balance = await ledger.get_token_balance("main_account") or 0.0
             # For demonstration, set other values statically or calculate as needed
             today_mining = balance * 0.05
             pending_rewards = balance * 0.025
             fees_paid = balance * 0.001
         except Exception as e:
             logger.error(f"Error fetching balance info: {e}")
+        try:
+            # Maintained by the level index on every insert and promotion, so this is not a scan
+            for level, count in (await ledger.get_level_counts()).items():
+                confirmation_levels[f"L{level}"] = count
+        except Exception as e:
+            logger.error(f"Error fetching confirmation level counts: {e}")
 
         status = {
             "status": "Mining",
@@ -95,30 +103,13 @@ async def send_mining_status(websocket):
             "hashrate": int(hashrate),
             "pof_stage_1": 50,
             "pof_stage_2": 75,
-            "confirmation_levels": {
-                "L0": 10,
-                "L1": 5,
-                "L2": 2,
-                "L3": 1
-            },
+            "confirmation_levels": confirmation_levels,
             "balance": balance,
             "today_mining": today_mining,
             "pending_rewards": pending_rewards,
             "fees_paid": fees_paid,
             "ledger_updated": True
         }
-        import collections.abc
-
-import collections.abc
-
-def to_standard_dict(obj):
-    if isinstance(obj, collections.abc.Mapping):
-        return {str(k): to_standard_dict(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [to_standard_dict(i) for i in obj]
-    else:
-        return obj
-
         standard_status = to_standard_dict(status)
         message = {
             "action": "broadcast",
@@ -135,8 +126,13 @@ def to_standard_dict(obj):
         nonce += 1
         await asyncio.sleep(5)
 
-async def mining_real():
-    reset_ledger()
+async def mining_real(reset=False):
+    service = get_ledger_service()
+    ledger = get_async_ledger(service.db, service.lock)
+    if reset:
+        # Only on explicit request: the ledger is shared with every other front end in the process.
+        # Run as its own transaction so it locks every balance, not nested in a batched write
+        await asyncio.get_running_loop().run_in_executor(None, service.reset)
     uri = "ws://localhost:9001"
     nonce = 0
     while True:
@@ -146,22 +142,19 @@ async def mining_real():
                 # Start mining status broadcast in background
                 asyncio.create_task(send_mining_status(websocket))
                 while True:
-                    # Get current tips from REST API
+                    # Get current tips from the shared ledger service
                     try:
-                        response = requests.get(f"{API_URL}/dag/tips")
-                        response.raise_for_status()
-                        tips = response.json().get("tips", [])
-                        if len(tips) < 3:
+                        # Weighted random walks spread approvals instead of every miner taking the same tips
+                        predecessors = await ledger.read(service.select_tips, 3, 'walk')
+                        if len(predecessors) < 3:
                             logger.warning("Less than 3 tips available, waiting...")
                             await asyncio.sleep(5)
                             continue
-                        # Select 3 tips as predecessors
-                        predecessors = tips[:3]
                         # Create new entry referencing these predecessors
                         entry = create_entry(predecessors, nonce)
-                        # Submit entry to REST API
-                        submit_resp = requests.post(f"{API_URL}/entries", json=entry)
-                        if submit_resp.status_code == 200:
+                        # Submit entry to the shared ledger service off the event loop
+                        accepted, msg = await ledger.write(service.submit_entry, entry)
+                        if accepted:
                             logger.info(f"Submitted entry with nonce {nonce} and hash {entry['hash']}")
                             # Propagate entry to peers via P2P network
                             try:
@@ -176,7 +169,7 @@ async def mining_real():
                                 logger.error(f"Error propagating entry to peers: {e}")
                             nonce += 1
                         else:
-                            logger.error(f"Failed to submit entry: {submit_resp.text}")
+                            logger.error(f"Failed to submit entry: {msg}")
                     except Exception as e:
                         logger.error(f"Error during entry submission: {e}")
                     await asyncio.sleep(10)  # Wait before next mining attempt
@@ -185,9 +178,13 @@ async def mining_real():
             logger.info("Retrying connection in 5 seconds...")
             await asyncio.sleep(5)
 
-async def main():
-    await mining_real()
+async def main(reset=False):
+    await mining_real(reset)
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="AquiMatrix miner")
+    parser.add_argument('--reset', action='store_true', help="clear the ledger back to genesis before mining")
+    args = parser.parse_args()
     logging.basicConfig(level=logging.INFO)
-    asyncio.run(main())
+    asyncio.run(main(args.reset))
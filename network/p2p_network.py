@@ -4,6 +4,7 @@ Basic peer-to-peer networking module for AquiMatrix.
 Features:
 - Peer connection management
 - Entry propagation to peers
+- Entry batches (e.g. a synced backlog) added in one write
 - State synchronization requests and responses
 - Simple message broadcasting
 """
@@ -13,6 +14,9 @@ import websockets
 import json
 import logging
 
+from consensus_engine.ledger_service import get_ledger_service
+from lib.async_db import get_async_ledger
+
 logger = logging.getLogger('p2p_network')
 
 class P2PNetwork:
@@ -21,6 +25,9 @@ class P2PNetwork:
         self.port = port
         self.peers = set()
         self.server = None
+        # Built once and reused for every message
+        self.service = get_ledger_service()
+        self.ledger = get_async_ledger(self.service.db, self.service.lock)
 
     async def handler(self, websocket, path):
         self.peers.add(websocket)
@@ -40,19 +47,13 @@ class P2PNetwork:
             if msg_type == 'entry_propagation':
                 entry = data.get('entry')
                 logger.info(f"Received entry propagation from {websocket.remote_address}")
-                # Validate and add entry to ledger
-                from data_ingestion.entry_validator import EntryValidator
-                from consensus_engine.dag_structure import DAG
-                import lib.database_access as db_access
-
-                validator = EntryValidator(db_access.db_instance)
-                dag = DAG(db_access.db_instance)
-
+                # Validate and add entry to the shared ledger
                 entry_hash = entry.get('hash')
-                valid, msg = validator.validate_entry(entry, entry_hash)
+                # Validation reads and the ledger write run off the event loop, so other peers are not stalled
+                valid, msg = await self.ledger.read(self.service.validate_entry, entry)
                 if valid:
                     try:
-                        dag.add_entry(entry)
+                        await self.ledger.write(self.service.add_entry, entry)
                         logger.info(f"Entry {entry_hash} added to DAG from peer propagation")
                         # Broadcast to other peers except sender
                         await self.broadcast(message, exclude=websocket)
@@ -60,13 +61,21 @@ class P2PNetwork:
                         logger.error(f"Failed to add entry to DAG: {e}")
                 else:
                     logger.warning(f"Invalid entry received from peer: {msg}")
+            elif msg_type == 'entry_batch':
+                entries = data.get('entries', [])
+                logger.info(f"Received batch of {len(entries)} entries from {websocket.remote_address}")
+                # Entries may arrive in any order; the whole batch is sorted and written at once
+                results = await self.ledger.write(self.service.submit_entries, entries)
+                accepted = [entry for entry, (_, ok, _) in zip(entries, results) if ok]
+                for entry_hash, ok, msg in results:
+                    if not ok:
+                        logger.warning(f"Entry {entry_hash} from peer batch rejected: {msg}")
+                if accepted:
+                    await self.broadcast(json.dumps({'type': 'entry_batch', 'entries': accepted}), exclude=websocket)
             elif msg_type == 'state_sync_request':
                 logger.info(f"Received state sync request from {websocket.remote_address}")
                 # Placeholder: respond with current ledger tips
-                from consensus_engine.dag_structure import DAG
-                import lib.database_access as db_access
-                dag = DAG(db_access.db_instance)
-                tips = dag.get_tips()
+                tips = self.service.get_tips()
                 response = json.dumps({
                     'type': 'state_sync_response',
                     'tips': tips
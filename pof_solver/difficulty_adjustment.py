@@ -12,6 +12,7 @@ Interacts with database_access.py to store historical difficulty data.
 import time
 import logging
 from lib import database_access
+from lib.time_series import mean_interval
 import json
 import logging
 import os
@@ -37,11 +38,7 @@ class DifficultyAdjustment:
         Calculate average solve time over last M entries.
         """
         timestamps = database_access.get_last_m_timestamps(self.db, self.M)
-        if len(timestamps) < 2:
-            return None
-        intervals = [t2 - t1 for t1, t2 in zip(timestamps[:-1], timestamps[1:])]
-        avg_time = sum(intervals) / len(intervals)
-        return avg_time
+        return mean_interval(timestamps)
 
     def adjust_target(self):
         """
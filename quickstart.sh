@@ -4,20 +4,15 @@
 
 export PYTHONPATH=$(pwd)
 
-echo "Starting REST API server on port 9000..."
-nohup python3 api_gateway/rest_endpoints.py > rest_api.log 2>&1 &
-
-echo "Starting WebSocket server on port 9001..."
-nohup python3 api_gateway/websocket_server.py > websocket_server.log 2>&1 &
-
-echo "Starting Mining backend..."
-nohup python3 mining_backend.py > mining_backend.log 2>&1 &
+# REST API (9000), WebSocket server (9001), P2P node (9002) and miner run in one process
+# so they share a single ledger service and see the same tips.
+# The ledger is kept across restarts; pass --reset to start from genesis
+echo "Starting AquiMatrix node (REST 9000, WebSocket 9001, P2P 9002, miner)..."
+nohup python3 run_system.py "$@" > aquimatrix_node.log 2>&1 &
 
 echo "All services started in the background."
 echo "Logs:"
-echo "  REST API: rest_api.log"
-echo "  WebSocket Server: websocket_server.log"
-echo "  Mining Backend: mining_backend.log"
+echo "  Node: aquimatrix_node.log"
 
 echo ""
 echo "Use the CLI tool to interact with the network:"
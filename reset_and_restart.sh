@@ -31,11 +31,20 @@ else
   echo "Mining backend not running."
 fi
 
+# Find and kill combined node process
+NODE_PID=$(pgrep -f "python3 run_system.py")
+if [ -n "$NODE_PID" ]; then
+  echo "Killing AquiMatrix node (PID $NODE_PID)..."
+  kill $NODE_PID
+else
+  echo "AquiMatrix node not running."
+fi
+
 # Wait a moment to ensure processes are stopped
 sleep 3
 
 echo "Starting all services fresh using quickstart.sh..."
 chmod +x quickstart.sh
-./quickstart.sh
+./quickstart.sh --reset
 
 echo "Reset and restart complete. The system is now starting from genesis."
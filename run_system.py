@@ -1,14 +1,35 @@
+import argparse
 import asyncio
 import logging
+import threading
+from network import p2p_network
 from network.p2p_network import P2PNetwork
+from api_gateway import websocket_server
 import mining_backend
+from lib import database_access
 
 logging.basicConfig(level=logging.INFO)
 
-async def main():
+def start_rest_api():
+    # Imported here so the P2P node and miner still run where Flask is not installed
+    from api_gateway.rest_endpoints import app
+    thread = threading.Thread(target=app.run, kwargs={'host': '0.0.0.0', 'port': 9000}, daemon=True)
+    thread.start()
+    return thread
+
+async def main(reset=False):
+    # Background jobs run only in the node process, not in every script that imports the ledger
+    database_access.start_entry_pruner(database_access.db_instance)
+    # REST, WebSocket, P2P and the miner share one ledger service in this process
+    try:
+        start_rest_api()
+    except ImportError as e:
+        logging.warning(f"REST API not started: {e}")
+    await websocket_server.start_server()
     p2p = P2PNetwork()
     await p2p.start_server()
-    mining_task = asyncio.create_task(mining_backend.mining_real())
+    p2p_network.p2p_instance = p2p
+    mining_task = asyncio.create_task(mining_backend.mining_real(reset))
     try:
         await mining_task
     except asyncio.CancelledError:
@@ -17,4 +38,7 @@ async def main():
         await p2p.stop_server()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Run an AquiMatrix node")
+    parser.add_argument('--reset', action='store_true', help="clear the ledger back to genesis before starting")
+    args = parser.parse_args()
+    asyncio.run(main(args.reset))
@@ -15,6 +15,11 @@ from consensus_engine.confirmation_levels import ConfirmationLevels
 
 class TestConsensusScenarios(unittest.TestCase):
     def setUp(self):
+        # Audit events are not under test here; keep them out of the working directory
+        for module in ('conflict_resolver', 'promotion_engine', 'weight_accumulation'):
+            audit_logger = patch(f'consensus_engine.{module}.audit_logger')
+            audit_logger.start()
+            self.addCleanup(audit_logger.stop)
         self.db = MagicMock()
         self.dag = DAG(self.db)
         self.conflict_resolver = ConflictResolver(self.db)
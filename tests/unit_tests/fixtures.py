@@ -0,0 +1,75 @@
+"""
+fixtures.py
+
+Shared setup for the unit tests.
+Functions:
+1. Audit Log: redirect_audit_log points the audit logger of the consensus modules at a temporary
+   directory for the duration of a test, so tests never write audit.log into the working directory.
+2. Temporary Directory: temp_dir creates a directory that is removed when the test ends.
+3. Ledger Store: temp_db opens a PersistentDB in a temporary directory, for tests that reload or persist.
+4. Mock Store: mock_db returns a MagicMock db whose DAG indexes are real in-memory containers, for tests that
+   only need database_access reads and writes to work.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import consensus_engine.conflict_resolver as conflict_resolver
+import consensus_engine.promotion_engine as promotion_engine
+import consensus_engine.weight_accumulation as weight_accumulation
+from consensus_engine.audit_report import AuditLogger
+from lib.database_access import PersistentDB
+from lib.range_index import RangeIndex
+
+AUDITED_MODULES = (conflict_resolver, promotion_engine, weight_accumulation)
+
+def redirect_audit_log(test):
+    """
+    Give the audited modules an AuditLogger writing to a temporary directory until test ends.
+    Returns the logger; its file is audit_logger.log_file.
+    """
+    directory = tempfile.mkdtemp()
+    # Cleanups run last-in first-out, so the logger is closed before its directory is removed
+    test.addCleanup(shutil.rmtree, directory)
+    audit_logger = AuditLogger(os.path.join(directory, 'audit.log'))
+    test.addCleanup(audit_logger.close)
+    for module in AUDITED_MODULES:
+        patcher = patch.object(module, 'audit_logger', audit_logger)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return audit_logger
+
+def temp_dir(test):
+    """
+    Return a new temporary directory, removed once test ends.
+    """
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    return directory
+
+def temp_db(test, name='ledger_db.json'):
+    """
+    Return a PersistentDB stored in a temporary directory; reopen it with PersistentDB(db.filepath).
+    """
+    return PersistentDB(os.path.join(temp_dir(test), name))
+
+def mock_db():
+    """
+    Return a MagicMock standing in for a ledger store. Entries, successors, heights, tips and weights are real
+    containers, so store_entry and the DAG queries behave as on PersistentDB, and every write bumps db.version.
+    Nothing is written to disk and transactions are no-ops.
+    """
+    db = MagicMock()
+    db.entries = {}
+    db.successors = {}
+    db.heights = {}
+    db.tips = set()
+    db.weights = {}
+    db.height_index = RangeIndex()
+    db.entry_filter = None
+    db.version = 0
+    db._commit.side_effect = lambda *op: setattr(db, 'version', db.version + 1)
+    db.after_commit.side_effect = lambda callback: callback()
+    return db
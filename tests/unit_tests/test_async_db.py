@@ -0,0 +1,136 @@
+"""
+test_async_db.py
+
+Unit tests for the asyncio ledger facade.
+Tests:
+- Concurrent awaited writes are applied and batched into fewer persists.
+- A failing write fails alone while the rest of its batch commits.
+- A failing write is reverted without reloading the ledger, and only committed writes notify listeners.
+- Awaited reads see committed writes.
+- Service writes through the async ledger and direct service calls take locks in one order and never deadlock.
+"""
+
+import asyncio
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import lib.database_access as database_access
+from consensus_engine.ledger_service import LedgerService
+from lib.async_db import AsyncLedger
+from lib.database_access import PersistentDB
+from lib.sqlite_store import SQLiteDB
+from fixtures import redirect_audit_log, temp_dir
+
+class TestAsyncLedger(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        redirect_audit_log(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+        self.db = PersistentDB(self.path)
+        self.ledger = AsyncLedger(self.db)
+
+    def tearDown(self):
+        self.ledger.close()
+
+    def test_batched_writes(self):
+        async def run():
+            return await asyncio.gather(*[
+                self.ledger.store_entry(f'e{i}', {'hash': f'e{i}', 'timestamp': i}) for i in range(50)
+            ])
+
+        with patch.object(self.db, '_save', wraps=self.db._save) as mock_save:
+            asyncio.run(run())
+        self.assertLess(mock_save.call_count, 50)
+        self.assertEqual(len(PersistentDB(self.path).entries), 50)
+
+    def test_failing_write_is_isolated(self):
+        def fail():
+            raise ValueError("bad write")
+
+        async def run():
+            return await asyncio.gather(
+                self.ledger.store_token_balance('alice', 5),
+                self.ledger.write(fail),
+                self.ledger.update_balance('token_balances', 'alice', lambda b: b + 1),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(run())
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], 6)
+        self.assertEqual(database_access.get_token_balance(PersistentDB(self.path), 'alice'), 6)
+
+    def check_partial_failure(self, db, ledger):
+        notified = []
+
+        def add(entry_hash, fail):
+            database_access.store_entry(db, entry_hash, {'hash': entry_hash, 'timestamp': 1})
+            database_access.after_commit(db, lambda: notified.append(entry_hash))
+            if fail:
+                raise ValueError("bad timestamp")
+
+        async def run():
+            return await asyncio.gather(ledger.write(add, 'a', False), ledger.write(add, 'b', True),
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(notified, ['a'])
+        self.assertIsNotNone(database_access.get_entry(db, 'a'))
+        self.assertIsNone(database_access.get_entry(db, 'b'))
+
+    def test_failing_write_reverts_alone(self):
+        with patch.object(self.db, '_load', wraps=self.db._load) as mock_load:
+            self.check_partial_failure(self.db, self.ledger)
+        mock_load.assert_not_called()
+        self.assertNotIn('b', PersistentDB(self.path).entries)
+
+    def test_failing_write_reverts_alone_sqlite(self):
+        db = SQLiteDB(os.path.join(self.tmpdir, 'ledger.db'))
+        ledger = AsyncLedger(db)
+        self.check_partial_failure(db, ledger)
+        ledger.close()
+        db.close()
+
+    def test_reads(self):
+        async def run():
+            await self.ledger.store_entry('e1', {'hash': 'e1'})
+            return await self.ledger.get_entry('e1'), await self.ledger.get_token_balance('nobody')
+
+        self.assertEqual(asyncio.run(run()), ({'hash': 'e1'}, 0))
+
+    def test_service_writes_do_not_deadlock(self):
+        for name in ['g1', 'g2', 'g3']:
+            database_access.store_entry(self.db, name, {'hash': name, 'timestamp': 0, 'predecessor_hashes': []})
+        service = LedgerService(self.db)
+        service.dag.tips.update(['g1', 'g2', 'g3'])
+        ledger = AsyncLedger(self.db, lock=service.lock)
+
+        def entry(name):
+            return {'hash': name, 'timestamp': 1, 'predecessor_hashes': ['g1', 'g2', 'g3']}
+
+        async def via_ledger():
+            return await asyncio.gather(*[ledger.write(service.submit_entry, entry(f'a{i}')) for i in range(30)])
+
+        def via_rest():
+            # As the REST endpoint does: straight into the service from a request thread
+            for i in range(30):
+                service.submit_entry(entry(f'r{i}'))
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.extend(asyncio.run(via_ledger()))),
+                   threading.Thread(target=via_rest)]
+        with patch.object(service.validator, 'validate_entry', return_value=(True, "ok")):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        ledger.close()
+        self.assertTrue(all(accepted for accepted, _ in results))
+        self.assertEqual(len(database_access.get_tips(self.db)), 60)
+
+if __name__ == '__main__':
+    unittest.main()
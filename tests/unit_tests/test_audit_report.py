@@ -0,0 +1,80 @@
+"""
+test_audit_report.py
+
+Unit tests for the asynchronous audit pipeline.
+Tests:
+- Events are written as structured JSON lines in batches by the writer thread.
+- Per-event sampling drops events and tags the ones kept with their rate.
+- close() writes every queued event, and the report scales sampled counts back up.
+- Counters stay exact under concurrent events.
+"""
+
+import json
+import os
+import random
+import threading
+import unittest
+
+from consensus_engine.audit_report import AuditLogger, generate_audit_report
+from fixtures import temp_dir
+
+class TestAuditLogger(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(temp_dir(self), 'audit.log')
+
+    def read(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_structured_records_and_flush(self):
+        audit = AuditLogger(self.path, batch_size=4, flush_interval=10, sample_rates={})
+        audit.event('conflict_resolved', winner='w', scores={'w': 3})
+        audit.warning("disk almost full")
+        audit.flush(timeout=5)
+        records = self.read()
+        self.assertEqual([r['event'] for r in records], ['conflict_resolved', 'message'])
+        self.assertEqual(records[0]['scores'], {'w': 3})
+        self.assertEqual(records[1]['level'], 'WARNING')
+        audit.close()
+
+    def test_sampling_and_lossless_close(self):
+        audit = AuditLogger(self.path, batch_size=1000, flush_interval=60,
+                            sample_rates={'weight_updated': 0.25}, rng=random.Random(1))
+        for i in range(400):
+            audit.event('weight_updated', entry_hash=f"e{i}", weight=i)
+        for i in range(50):
+            audit.event('branch_scored', entry_hash=f"b{i}")
+        audit.close()
+        records = self.read()
+        sampled = [r for r in records if r['event'] == 'weight_updated']
+        self.assertEqual(len(records) - len(sampled), 50)
+        self.assertEqual(len(sampled), audit.counters['recorded'] - 50)
+        self.assertEqual(len(sampled) + audit.counters['sampled_out'], 400)
+        self.assertTrue(all(r['sample_rate'] == 0.25 for r in sampled))
+        self.assertLess(len(sampled), 200)
+        audit.event('late', entry_hash='x')
+        self.assertEqual(self.read()[-1]['event'], 'late')
+        report = generate_audit_report(self.path)
+        self.assertIn("branch_scored: 50", report)
+        self.assertIn(f"weight_updated: {len(sampled) * 4}", report)
+
+    def test_concurrent_counters(self):
+        audit = AuditLogger(self.path, batch_size=64, flush_interval=60, sample_rates={'weight_updated': 0.5})
+
+        def emit():
+            for i in range(500):
+                audit.event('weight_updated', entry_hash=f"e{i}")
+
+        threads = [threading.Thread(target=emit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        audit.close()
+        stats = audit.stats()
+        self.assertEqual(stats['recorded'] + stats['sampled_out'], 4000)
+        self.assertEqual(stats['written'], stats['recorded'])
+        self.assertEqual(len(self.read()), stats['recorded'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+test_balance_store.py
+
+Unit tests for the lock-striped balance store.
+Tests:
+- compare_and_set only applies when the balance is unchanged.
+- Concurrent credits to shared accounts lose no updates.
+- Opposing transfers between the same accounts neither deadlock nor lose funds.
+- A failed transaction restores the balances it declared.
+"""
+
+import os
+import threading
+import unittest
+
+import lib.database_access as database_access
+from lib.balance_store import StripedBalanceStore
+from lib.ledger_log import LogStructuredDB
+from fixtures import temp_dir
+
+class TestBalanceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.db = LogStructuredDB(directory=os.path.join(self.tmpdir, 'wal'), sync_interval=0,
+                                  filepath=os.path.join(self.tmpdir, 'ledger_db.json'), snapshot_interval=0)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _run_threads(self, targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+            self.assertFalse(thread.is_alive())
+
+    def test_compare_and_set(self):
+        store = StripedBalanceStore({'alice': 10})
+        self.assertTrue(store.compare_and_set('alice', 10, 15))
+        self.assertFalse(store.compare_and_set('alice', 10, 20))
+        self.assertTrue(store.compare_and_set('bob', 0, 5))
+        self.assertEqual(dict(store.items()), {'alice': 15, 'bob': 5})
+        self.assertTrue(database_access.compare_and_set_balance(self.db, 'lrw_balances', 'carol', 0, 7))
+        self.assertFalse(database_access.compare_and_set_balance(self.db, 'lrw_balances', 'carol', 0, 9))
+        self.assertEqual(database_access.get_lrw_balance(self.db, 'carol'), 7)
+
+    def test_concurrent_credits(self):
+        accounts = ['a', 'b', 'c', 'd']
+
+        def credit():
+            for i in range(200):
+                database_access.update_balance(self.db, 'token_balances', accounts[i % 4], lambda b: b + 1)
+
+        self._run_threads([credit] * 8)
+        for account in accounts:
+            self.assertEqual(database_access.get_token_balance(self.db, account), 400)
+        self.db.close()
+        reloaded = LogStructuredDB(directory=self.db.directory, sync_interval=0,
+                                   filepath=self.db.filepath, snapshot_interval=0)
+        self.assertEqual(database_access.get_token_balance(reloaded, 'a'), 400)
+        reloaded.close()
+
+    def test_opposing_transfers(self):
+        database_access.store_lrw_balance(self.db, 'alice', 1000)
+        database_access.store_lrw_balance(self.db, 'bob', 1000)
+
+        def transfer(sender, recipient):
+            for _ in range(100):
+                with database_access.transaction(self.db, [('lrw_balances', sender), ('lrw_balances', recipient)]):
+                    database_access.store_lrw_balance(
+                        self.db, sender, database_access.get_lrw_balance(self.db, sender) - 1)
+                    database_access.store_lrw_balance(
+                        self.db, recipient, database_access.get_lrw_balance(self.db, recipient) + 1)
+
+        self._run_threads([lambda: transfer('alice', 'bob'), lambda: transfer('bob', 'alice')] * 2)
+        self.assertEqual(database_access.get_lrw_balance(self.db, 'alice'), 1000)
+        self.assertEqual(database_access.get_lrw_balance(self.db, 'bob'), 1000)
+
+    def test_rollback_restores_declared_balances(self):
+        database_access.store_stake_balance(self.db, 'alice', 10)
+        database_access.store_lrw_balance(self.db, 'bob', 3)
+        with self.assertRaises(RuntimeError):
+            with database_access.transaction(self.db, [('stake_balances', 'alice'), ('stake_balances', 'dave')]):
+                database_access.store_stake_balance(self.db, 'alice', 0)
+                database_access.store_stake_balance(self.db, 'dave', 10)
+                raise RuntimeError("crash mid-transfer")
+        self.assertEqual(database_access.get_stake_balance(self.db, 'alice'), 10)
+        self.assertNotIn('dave', self.db.stake_balances)
+        self.assertEqual(database_access.get_lrw_balance(self.db, 'bob'), 3)
+
+if __name__ == '__main__':
+    unittest.main()
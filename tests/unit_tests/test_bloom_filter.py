@@ -0,0 +1,99 @@
+"""
+test_bloom_filter.py
+
+Unit tests for lib.bloom_filter and its use in database_access.check_entry_exists.
+Tests:
+- No false negatives as the filter grows past its initial capacity.
+- The filter survives a save/load round trip.
+- check_entry_exists only consults the entry store on a possible duplicate.
+- A stale persisted filter is rebuilt on load, even when the ledger has as many entries as it.
+- Concurrent adds lose no keys.
+"""
+
+import os
+import json
+import threading
+import unittest
+from unittest.mock import patch
+
+import lib.database_access as database_access
+from lib.bloom_filter import ScalableBloomFilter
+from lib.database_access import PersistentDB
+from fixtures import temp_dir
+
+class TestBloomFilter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+
+    def test_scalable_growth(self):
+        bloom = ScalableBloomFilter(capacity=50, error_rate=0.01)
+        keys = [f'entry{i}' for i in range(500)]
+        for key in keys:
+            bloom.add(key)
+        self.assertGreater(len(bloom.filters), 1)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f'other{i}' in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_save_and_load(self):
+        bloom = ScalableBloomFilter(capacity=10, error_rate=0.01)
+        for i in range(30):
+            bloom.add(f'entry{i}')
+        path = os.path.join(self.tmpdir, 'filter.bloom')
+        bloom.save(path)
+        loaded = ScalableBloomFilter.load(path)
+        self.assertEqual(len(loaded), 30)
+        self.assertTrue(all(f'entry{i}' in loaded for i in range(30)))
+
+    def test_check_entry_exists_fast_path(self):
+        db = PersistentDB(self.path)
+        database_access.store_entry(db, 'e1', {'hash': 'e1', 'timestamp': 1})
+        with patch.object(db, 'entries', wraps=db.entries) as entries:
+            self.assertFalse(database_access.check_entry_exists(db, 'new-entry'))
+            entries.__contains__.assert_not_called()
+        self.assertTrue(database_access.check_entry_exists(db, 'e1'))
+
+    def test_persisted_across_restarts(self):
+        db = PersistentDB(self.path)
+        database_access.store_entry(db, 'e1', {'hash': 'e1', 'timestamp': 1})
+        db.close()
+        self.assertTrue(os.path.exists(self.path + '.bloom'))
+        self.assertTrue(database_access.check_entry_exists(PersistentDB(self.path), 'e1'))
+
+        # An entry stored after the filter was saved must still be found
+        db = PersistentDB(self.path)
+        database_access.store_entry(db, 'e2', {'hash': 'e2', 'timestamp': 2})
+        self.assertTrue(database_access.check_entry_exists(PersistentDB(self.path), 'e2'))
+
+    def test_rewritten_ledger_rebuilds_filter(self):
+        db = PersistentDB(self.path)
+        database_access.store_entry(db, 'e1', {'hash': 'e1', 'timestamp': 1})
+        db.close()
+        # Replace the ledger with a different one of the same size, e.g. restored from a backup
+        with open(self.path) as f:
+            data = json.load(f)
+        data['entries'] = {'e2': {'hash': 'e2', 'timestamp': 2}}
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+        db = PersistentDB(self.path)
+        self.assertTrue(database_access.check_entry_exists(db, 'e2'))
+
+    def test_concurrent_adds(self):
+        bloom = ScalableBloomFilter(capacity=100, error_rate=0.01)
+
+        def add(start):
+            for i in range(start, start + 500):
+                bloom.add(f'entry{i}')
+
+        threads = [threading.Thread(target=add, args=(n * 500,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(bloom), 4000)
+        self.assertEqual(sum(f.count for f in bloom.filters), 4000)
+        self.assertTrue(all(f'entry{i}' in bloom for i in range(4000)))
+
+if __name__ == '__main__':
+    unittest.main()
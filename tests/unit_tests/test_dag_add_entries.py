@@ -0,0 +1,75 @@
+"""
+test_dag_add_entries.py
+
+Unit tests for bulk entry ingestion.
+Tests:
+- Out-of-order batches are added in topological order with a single write.
+- Entries with missing or rejected predecessors are reported without blocking the rest.
+- Duplicates and predecessor cycles are rejected.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from consensus_engine.dag_structure import DAG
+from lib.database_access import store_entry, check_entry_exists
+from fixtures import redirect_audit_log, temp_db
+
+def make_entry(name, timestamp, predecessors):
+    return {'hash': name, 'timestamp': timestamp, 'predecessor_hashes': predecessors}
+
+class TestAddEntries(unittest.TestCase):
+    def setUp(self):
+        redirect_audit_log(self)
+        self.db = temp_db(self)
+        for i, name in enumerate(['g1', 'g2', 'g3']):
+            store_entry(self.db, name, make_entry(name, i, []))
+        self.dag = DAG(self.db)
+
+    def test_out_of_order_batch_single_write(self):
+        batch = [
+            make_entry('c', 30, ['a', 'b', 'g3']),
+            make_entry('b', 20, ['a', 'g2', 'g3']),
+            make_entry('a', 10, ['g1', 'g2', 'g3']),
+        ]
+        with patch.object(self.db, '_save', wraps=self.db._save) as save:
+            results = self.dag.add_entries(batch)
+        self.assertEqual(results, [('c', True, "Entry accepted"), ('b', True, "Entry accepted"),
+                                   ('a', True, "Entry accepted")])
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(self.dag.get_tips(), ['c'])
+        self.assertTrue(all(check_entry_exists(self.db, h) for h in 'abc'))
+
+    def test_rejections_cascade(self):
+        batch = [
+            make_entry('a', 10, ['g1', 'g2', 'missing']),
+            make_entry('b', 20, ['a', 'g2', 'g3']),
+            make_entry('c', 5, ['g1', 'g2', 'g3']),
+            make_entry('d', 1, ['c', 'g2', 'g3']),
+        ]
+        results = self.dag.add_entries(batch)
+        self.assertEqual(results[0], ('a', False, "Predecessor missing not found"))
+        self.assertEqual(results[1], ('b', False, "Predecessor a was rejected"))
+        self.assertEqual(results[2], ('c', True, "Entry accepted"))
+        self.assertEqual(results[3], ('d', False, "Predecessor timestamp must be less than entry timestamp"))
+        self.assertFalse(check_entry_exists(self.db, 'a'))
+        self.assertFalse(check_entry_exists(self.db, 'd'))
+
+    def test_duplicates_and_cycles(self):
+        batch = [
+            make_entry('a', 10, ['g1', 'g2', 'g3']),
+            make_entry('a', 10, ['g1', 'g2', 'g3']),
+            make_entry('x', 10, ['y', 'g2', 'g3']),
+            make_entry('y', 10, ['x', 'g2', 'g3']),
+            make_entry('g1', 10, ['g1', 'g2', 'g3']),
+        ]
+        results = self.dag.add_entries(batch)
+        self.assertTrue(results[0][1])
+        self.assertEqual(results[1], ('a', False, "Duplicate entry in batch"))
+        self.assertFalse(results[2][1])
+        self.assertFalse(results[3][1])
+        self.assertIn("cycle", results[2][2])
+        self.assertEqual(results[4], ('g1', False, "Entry already exists"))
+
+if __name__ == '__main__':
+    unittest.main()
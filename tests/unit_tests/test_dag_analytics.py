@@ -0,0 +1,85 @@
+"""
+test_dag_analytics.py
+
+Unit tests for the NumPy batch analytics.
+Tests:
+- The CSR export lists each entry's successors under topologically ordered IDs.
+- Batch weights equal compute_accumulated_weight for every entry, across several column blocks.
+- Batch level eligibility equals what ConfirmationLevels.assign_level would assign.
+- Persisting weights leaves frozen entries alone and refuses a snapshot the ledger has moved past.
+- Without NumPy the batch functions raise ImportError.
+"""
+
+import random
+import unittest
+from unittest.mock import patch
+
+import lib.database_access as database_access
+import consensus_engine.confirmation_levels as confirmation_levels
+from consensus_engine.weight_accumulation import FREEZE_LEVEL, compute_accumulated_weight
+from consensus_engine import dag_analytics
+from fixtures import mock_db
+
+class TestDagAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.db = mock_db()
+        rng = random.Random(7)
+        names = []
+        for i in range(120):
+            name = f"e{i:03d}"
+            predecessors = [rng.choice(names[-20:]) for _ in range(3)] if names else []
+            level = rng.choice([0, 0, 1, 1, 2])
+            database_access.store_entry(self.db, name, {'hash': name, 'timestamp': i, 'level': level,
+                                                        'predecessor_hashes': predecessors})
+            names.append(name)
+        self.names = names
+
+    def test_csr_export(self):
+        matrix = dag_analytics.export_csr(self.db)
+        self.assertEqual(len(matrix), 120)
+        for i, entry_hash in enumerate(matrix.hashes):
+            successors = matrix.indices[matrix.indptr[i]:matrix.indptr[i + 1]]
+            self.assertTrue(all(s > i for s in successors))
+            self.assertEqual(sorted(matrix.hashes[s] for s in successors),
+                             sorted(database_access.get_successors(self.db, entry_hash)))
+
+    def test_weights_and_levels_match_scalar(self):
+        matrix = dag_analytics.export_csr(self.db)
+        weights = dag_analytics.cumulative_weights(matrix, block_size=16, row_chunk=32)
+        eligible = dag_analytics.level_eligibility(matrix, weights)
+        dag_analytics.persist_weights(self.db, matrix, weights)
+        levels = confirmation_levels.ConfirmationLevels(self.db)
+        # assign_level reads the stored weights, which now hold the batch results
+        with patch.object(confirmation_levels, 'update_entry_level'):
+            for i, entry_hash in enumerate(matrix.hashes):
+                self.assertEqual(weights[i], compute_accumulated_weight(self.db, entry_hash))
+                self.assertEqual(database_access.get_weight(self.db, entry_hash), weights[i])
+                self.assertEqual(eligible[i], levels.assign_level(entry_hash))
+
+    def test_persist_weights(self):
+        frozen = 'e000'
+        database_access.update_entry_level(self.db, frozen, FREEZE_LEVEL)
+        database_access.store_weight(self.db, frozen, 1)
+        matrix = dag_analytics.export_csr(self.db)
+        weights = dag_analytics.cumulative_weights(matrix)
+        self.assertEqual(dag_analytics.persist_weights(self.db, matrix, weights), len(matrix) - 1)
+        self.assertEqual(database_access.get_weight(self.db, 'e001'), compute_accumulated_weight(self.db, 'e001'))
+        # Frozen weights are left as they were
+        self.assertEqual(database_access.get_weight(self.db, frozen), 1)
+
+    def test_persist_weights_stale_snapshot(self):
+        matrix = dag_analytics.export_csr(self.db)
+        weights = dag_analytics.cumulative_weights(matrix)
+        # A level change leaves the entry count alone but still makes the snapshot stale
+        database_access.update_entry_level(self.db, 'e000', 1)
+        with self.assertRaises(RuntimeError):
+            dag_analytics.persist_weights(self.db, matrix, weights)
+        self.assertIsNone(database_access.get_weight(self.db, 'e001'))
+
+    def test_requires_numpy(self):
+        with patch.object(dag_analytics, 'np', None):
+            with self.assertRaises(ImportError):
+                dag_analytics.export_csr(self.db)
+
+if __name__ == '__main__':
+    unittest.main()
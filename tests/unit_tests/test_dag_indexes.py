@@ -0,0 +1,76 @@
+"""
+test_dag_indexes.py
+
+Unit tests for the stored tip set, heights and child counts.
+Tests:
+- Tips, heights and child counts follow each stored entry.
+- A restarted DAG serves the same tips on every storage engine.
+- Ledgers saved without these indexes get them rebuilt at load.
+"""
+
+import json
+import os
+import unittest
+
+import lib.database_access as database_access
+from consensus_engine.dag_structure import DAG
+from lib.database_access import PersistentDB
+from lib.ledger_log import LogStructuredDB
+from lib.sqlite_store import SQLiteDB
+from fixtures import redirect_audit_log, temp_dir
+
+def store_diamond(db):
+    database_access.store_entry(db, 'g', {'hash': 'g', 'timestamp': 1, 'predecessor_hashes': []})
+    database_access.store_entry(db, 'a', {'hash': 'a', 'timestamp': 2, 'predecessor_hashes': ['g']})
+    database_access.store_entry(db, 'b', {'hash': 'b', 'timestamp': 3, 'predecessor_hashes': ['g']})
+    database_access.store_entry(db, 'c', {'hash': 'c', 'timestamp': 4, 'predecessor_hashes': ['a', 'b']})
+    database_access.store_entry(db, 'd', {'hash': 'd', 'timestamp': 5, 'predecessor_hashes': ['a']})
+
+class TestDagIndexes(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        redirect_audit_log(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+
+    def check(self, db):
+        self.assertEqual(sorted(DAG(db).get_tips()), ['c', 'd'])
+        self.assertEqual([database_access.get_height(db, h) for h in 'gabcd'], [0, 1, 1, 2, 2])
+        self.assertEqual(database_access.get_child_count(db, 'a'), 2)
+        self.assertEqual(database_access.get_child_count(db, 'c'), 0)
+
+    def test_json_restart(self):
+        store_diamond(PersistentDB(self.path))
+        self.check(PersistentDB(self.path))
+
+    def test_wal_restart(self):
+        wal_dir = os.path.join(self.tmpdir, 'wal')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        store_diamond(db)
+        db.compact()
+        database_access.store_entry(db, 'e', {'hash': 'e', 'timestamp': 6, 'predecessor_hashes': ['d']})
+        db.close()
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.assertEqual(sorted(database_access.get_tips(db)), ['c', 'e'])
+        self.assertEqual(database_access.get_height(db, 'e'), 3)
+        db.close()
+
+    def test_sqlite_restart(self):
+        path = os.path.join(self.tmpdir, 'ledger.db')
+        db = SQLiteDB(path)
+        store_diamond(db)
+        db.close()
+        db = SQLiteDB(path)
+        self.check(db)
+        db.close()
+
+    def test_legacy_rebuild(self):
+        store_diamond(PersistentDB(self.path))
+        with open(self.path) as f:
+            data = json.load(f)
+        del data['heights'], data['tips'], data['successors']
+        with open(self.path, 'w') as f:
+            json.dump(data, f)
+        self.check(PersistentDB(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+test_entry_archive.py
+
+Unit tests for archival pruning of finalized entries.
+Tests:
+- Finalized entries more than depth heights down are cut down to headers and still served by get_entry.
+- Recent and unfinalized entries stay in the hot store.
+- A pass resumes from the finality log where the previous one stopped, so late finalizations are picked up.
+- The archive index and the pruning cursor survive a restart.
+- Opening the db does not start the pruner; start_entry_pruner does, as configured.
+"""
+
+import os
+import threading
+import unittest
+
+import lib.database_access as database_access
+from lib.database_access import PersistentDB
+from lib.entry_archive import EntryArchive, prune_finalized_entries
+from fixtures import temp_dir
+
+class TestEntryArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+        self.archive_dir = os.path.join(self.tmpdir, 'archive')
+        self.db = PersistentDB(self.path)
+        self.db.entry_archive = EntryArchive(self.archive_dir)
+        for i in range(10):
+            database_access.store_entry(self.db, f'e{i}', {
+                'hash': f'e{i}',
+                'predecessor_hashes': [f'e{i - 1}'] if i else [],
+                'timestamp': 1000 + i,
+                'transaction_data': {'n': i},
+                'level': 3 if i != 2 else 1,
+            })
+            if i != 2:
+                database_access.append_finality(self.db, f'e{i}', 3)
+
+    def tearDown(self):
+        self.db.entry_archive.close()
+
+    def test_prune_and_fetch(self):
+        archived = prune_finalized_entries(self.db, self.db.entry_archive, final_level=3, depth=5)
+        # e0..e4 are more than five heights below e9; e2 is not final
+        self.assertEqual(archived, 4)
+        self.assertEqual(self.db.entries['e0'],
+                         {'hash': 'e0', 'predecessor_hashes': [], 'timestamp': 1000, 'level': 3, 'archived': True})
+        self.assertNotIn('archived', self.db.entries['e2'])
+        self.assertNotIn('archived', self.db.entries['e5'])
+        self.assertEqual(database_access.get_entry(self.db, 'e1')['transaction_data'], {'n': 1})
+        self.assertEqual(prune_finalized_entries(self.db, self.db.entry_archive, final_level=3, depth=5), 0)
+
+    def test_later_finality(self):
+        prune_finalized_entries(self.db, self.db.entry_archive, final_level=3, depth=5)
+        # The pass stopped at e5, the first final entry that is not deep enough yet
+        self.assertEqual(self.db.entry_archive.cursor, 4)
+        database_access.update_entry_level(self.db, 'e2', 3)
+        database_access.append_finality(self.db, 'e2', 3)
+        for i in range(10, 15):
+            database_access.store_entry(self.db, f'e{i}', {
+                'hash': f'e{i}', 'predecessor_hashes': [f'e{i - 1}'], 'timestamp': 1000 + i})
+        # e5..e9 are now deep enough, and e2 is picked up behind them
+        self.assertEqual(prune_finalized_entries(self.db, self.db.entry_archive, final_level=3, depth=5), 6)
+        self.assertTrue(self.db.entries['e2']['archived'])
+        self.assertEqual(database_access.get_entry(self.db, 'e2')['transaction_data'], {'n': 2})
+        self.assertEqual(self.db.entry_archive.cursor, 10)
+
+    def test_archive_survives_restart(self):
+        prune_finalized_entries(self.db, self.db.entry_archive, final_level=3, depth=5)
+        self.db.entry_archive.close()
+        db = PersistentDB(self.path)
+        db.entry_archive = EntryArchive(self.archive_dir)
+        self.assertEqual(len(db.entry_archive), 4)
+        self.assertEqual(database_access.get_entry(db, 'e3')['transaction_data'], {'n': 3})
+        self.assertEqual(database_access.get_successors(db, 'e3'), ['e4'])
+        self.assertEqual(db.entry_archive.cursor, 4)
+        db.entry_archive.close()
+
+    def test_pruner_is_started_explicitly(self):
+        config = {'engine': 'json', 'filepath': self.path,
+                  'archive': {'enabled': True, 'directory': self.archive_dir, 'prune_interval': 600}}
+        db = database_access.open_db(config)
+        self.assertIsNotNone(db.entry_archive)
+        self.assertNotIn('entry-archive-pruner', [t.name for t in threading.enumerate()])
+        pruner = database_access.start_entry_pruner(db, config)
+        self.assertTrue(pruner.is_alive())
+        pruner.stop.set()
+        pruner.join(5)
+        db.entry_archive.close()
+        db.close()
+        config['archive']['prune_interval'] = 0
+        self.assertIsNone(database_access.start_entry_pruner(db, config))
+
+if __name__ == '__main__':
+    unittest.main()
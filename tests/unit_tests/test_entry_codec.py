@@ -0,0 +1,64 @@
+"""
+test_entry_codec.py
+
+Unit tests for the compact binary entry encoding.
+Tests:
+- Typical and irregular entries survive an encode/decode round trip unchanged.
+- Hex hashes are held as 32 raw bytes and the encoding is smaller than JSON.
+- CompactEntryStore behaves like a dict of entries.
+"""
+
+import hashlib
+import json
+import unittest
+
+from lib.entry_codec import CompactEntry, CompactEntryStore, decode_entry, encode_entry
+
+def make_entry(n):
+    hashes = [hashlib.sha256(f"{n}-{i}".encode()).hexdigest() for i in range(4)]
+    return {
+        'hash': hashes[0],
+        'predecessor_hashes': hashes[1:],
+        'timestamp': 1700000000 + n,
+        'transaction_data': {'nonce': n, 'data': 'payload'},
+        'signature': hashlib.sha512(str(n).encode()).hexdigest(),
+        'submitter_public_key': hashlib.sha256(b'key').hexdigest(),
+        'level': 2,
+    }
+
+class TestEntryCodec(unittest.TestCase):
+    def test_round_trip(self):
+        entry = make_entry(1)
+        self.assertEqual(decode_entry(encode_entry(entry)), entry)
+        irregular = {
+            'hash': 'e1',
+            'predecessor_hashes': ['ABCDEF', 'p2', None],
+            'timestamp': 1.5,
+            'transaction_data': None,
+            'level': True,
+            'memo': {'note': 'kept'},
+        }
+        self.assertEqual(decode_entry(encode_entry(irregular)), irregular)
+        self.assertEqual(decode_entry(encode_entry({})), {})
+
+    def test_compact_size(self):
+        entry = make_entry(2)
+        compact = CompactEntry.from_dict(entry)
+        self.assertEqual(len(compact.hash), 32)
+        self.assertTrue(all(len(p) == 32 for p in compact.predecessors))
+        self.assertLess(len(encode_entry(entry)) * 2, len(json.dumps(entry)))
+
+    def test_store(self):
+        store = CompactEntryStore()
+        entry = make_entry(4)
+        store[entry['hash']] = entry
+        store['x1'] = {'hash': 'x1'}
+        self.assertIn(entry['hash'], store)
+        self.assertEqual(store[entry['hash']], entry)
+        self.assertEqual(sorted(store), sorted([entry['hash'], 'x1']))
+        self.assertEqual(store.get_compact('x1').hash, 'x1')
+        del store['x1']
+        self.assertEqual(len(store), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+test_finality_stream.py
+
+Unit tests for the finality log, batched finality rewards and the finality stream.
+Tests:
+- FinalityLog numbers each final entry once and pages through records after a sequence number.
+- Every storage engine keeps the finality log and its reward watermark across a restart.
+- Rewards are settled in batches, in one transaction, and only once per record.
+- A finality record is not rewarded until the transaction that appended it commits.
+- Promotion to the final level publishes sequence-numbered records to stream listeners.
+- The settler thread pays a partial batch once the reward interval has passed, with no new finalizations.
+"""
+
+import os
+import threading
+import unittest
+
+import consensus_engine.token_rewards as token_rewards
+import lib.database_access as database_access
+from consensus_engine.finality_stream import FinalityStream, start_settler
+from consensus_engine.promotion_engine import PromotionEngine
+from consensus_engine.weight_accumulation import propagate_weight
+from lib.database_access import PersistentDB
+from lib.finality_log import FinalityLog
+from lib.ledger_log import LogStructuredDB
+from lib.sqlite_store import SQLiteDB
+from fixtures import redirect_audit_log, temp_dir, temp_db
+
+REWARD = token_rewards.pof_parameters['tokenomics']['initial_reward']
+MINER_SHARE = REWARD - int(REWARD * 0.05)
+
+class TestFinalityLog(unittest.TestCase):
+    def test_append_and_since(self):
+        log = FinalityLog()
+        self.assertEqual(log.append('a', 3, 'm')['seq'], 1)
+        self.assertIsNone(log.append('a', 3, 'm'))
+        log.append('b', 3)
+        log.append('c', 3)
+        self.assertEqual([r['hash'] for r in log.since(1)], ['b', 'c'])
+        self.assertEqual([r['hash'] for r in log.since(0, limit=1)], ['a'])
+        self.assertEqual(log.since(3), [])
+        self.assertEqual(FinalityLog(log.records).last_seq(), 3)
+
+    def test_published_seq(self):
+        log = FinalityLog()
+        for entry_hash in 'abc':
+            log.append(entry_hash, 3)
+        log.publish(1)
+        log.publish(3)
+        # b is still unpublished, so c is not counted either
+        self.assertEqual(log.published_seq(), 1)
+        log.discard('b')
+        self.assertEqual(log.published_seq(), 3)
+
+class TestFinalityEngines(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        redirect_audit_log(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+
+    def finalize(self, db):
+        for i, miner in enumerate(['m1', 'm2', 'm1', None]):
+            database_access.append_finality(db, f"e{i}", 3, miner)
+        self.assertIsNone(database_access.append_finality(db, 'e0', 3, 'm1'))
+        # Three pending records are not a batch of four yet
+        self.assertEqual(token_rewards.settle_finality_rewards(db, min_batch=5), 0)
+        self.assertEqual(token_rewards.settle_finality_rewards(db, min_batch=2, limit=2), 2)
+        database_access.append_finality(db, 'e4', 3, 'm2')
+
+    def check(self, db):
+        self.assertEqual([r['seq'] for r in database_access.get_finality_since(db, 2)], [3, 4, 5])
+        self.assertEqual(database_access.get_finality(db, 'e1')['miner_id'], 'm2')
+        self.assertEqual(database_access.get_token_balance(db, 'm1'), MINER_SHARE)
+        # Only the records after the watermark are paid
+        self.assertEqual(token_rewards.settle_finality_rewards(db), 3)
+        self.assertEqual(token_rewards.settle_finality_rewards(db), 0)
+        self.assertEqual(database_access.get_token_balance(db, 'm1'), 2 * MINER_SHARE)
+        self.assertEqual(database_access.get_token_balance(db, 'm2'), 2 * MINER_SHARE)
+        self.assertEqual(database_access.get_vault_balance(db), 4 * (REWARD - MINER_SHARE))
+
+    def test_json(self):
+        self.finalize(PersistentDB(self.path))
+        self.check(PersistentDB(self.path))
+
+    def test_wal(self):
+        wal_dir = os.path.join(self.tmpdir, 'wal')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.finalize(db)
+        db.close()
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.check(db)
+        db.close()
+
+    def test_open_finalization_is_not_rewarded(self):
+        # The wal engine lets transactions run in parallel, so another one may be open during settlement
+        db = LogStructuredDB(directory=os.path.join(self.tmpdir, 'wal'), sync_interval=0,
+                             filepath=self.path, snapshot_interval=0)
+        appended, release = threading.Event(), threading.Event()
+
+        def finalize():
+            try:
+                with database_access.transaction(db, []):
+                    database_access.append_finality(db, 'e0', 3, 'm1')
+                    appended.set()
+                    release.wait(5)
+                    raise RuntimeError("rolled back")
+            except RuntimeError:
+                pass
+
+        thread = threading.Thread(target=finalize)
+        thread.start()
+        self.assertTrue(appended.wait(5))
+        self.assertEqual(token_rewards.settle_finality_rewards(db), 0)
+        release.set()
+        thread.join(5)
+        database_access.append_finality(db, 'e1', 3, 'm2')
+        self.assertEqual(token_rewards.settle_finality_rewards(db), 1)
+        self.assertEqual(database_access.get_token_balance(db, 'm1'), 0)
+        self.assertEqual(database_access.get_token_balance(db, 'm2'), MINER_SHARE)
+        db.close()
+
+    def test_sqlite(self):
+        path = os.path.join(self.tmpdir, 'ledger.db')
+        db = SQLiteDB(path)
+        self.finalize(db)
+        db.close()
+        db = SQLiteDB(path)
+        self.check(db)
+        db.close()
+
+class TestFinalityStream(unittest.TestCase):
+    def setUp(self):
+        redirect_audit_log(self)
+        self.db = temp_db(self)
+        self.now = 0.0
+        self.stream = FinalityStream(self.db, reward_batch_size=4, reward_interval=10, clock=lambda: self.now)
+        self.records = []
+        self.stream.add_listener(self.records.append)
+        self.engine = PromotionEngine(self.db)
+        self.engine.add_listener(self.stream.on_promotion)
+
+    def insert(self, name, predecessors):
+        entry = {'hash': name, 'timestamp': 0, 'predecessor_hashes': predecessors,
+                 'submitter_public_key': 'miner'}
+        database_access.store_entry(self.db, name, entry)
+        propagate_weight(self.db, name, entry)
+        self.engine.on_entry(entry)
+
+    def test_stream_and_batched_rewards(self):
+        previous = []
+        for layer in range(12):
+            current = [f"l{layer}_{i}" for i in range(3)]
+            for name in current:
+                self.insert(name, previous)
+            previous = current
+        seqs = [r['seq'] for r in self.records]
+        self.assertTrue(seqs)
+        self.assertEqual(seqs, list(range(1, len(seqs) + 1)))
+        self.assertEqual(self.stream.since(0), self.records)
+        self.assertEqual(self.stream.since(seqs[-2]), self.records[-1:])
+        # Rewards are paid a full batch at a time; the remainder waits for the interval
+        paid = database_access.get_token_balance(self.db, 'miner') // MINER_SHARE
+        self.assertEqual(paid % 4, 0)
+        self.assertEqual(self.db.finality_log.rewarded, paid)
+        self.now = 10
+        self.stream.settle()
+        self.assertEqual(database_access.get_token_balance(self.db, 'miner'), len(seqs) * MINER_SHARE)
+
+    def test_settler(self):
+        database_access.append_finality(self.db, 'e0', 3, 'miner')
+        self.assertEqual(self.stream.settle(), 0)
+        self.now = 10
+        settler = start_settler(self.stream, interval=0.01)
+        try:
+            for _ in range(500):
+                if self.db.finality_log.rewarded:
+                    break
+                settler.stop.wait(0.01)
+        finally:
+            settler.stop.set()
+            settler.join()
+        self.assertEqual(database_access.get_token_balance(self.db, 'miner'), MINER_SHARE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+test_ledger_log.py
+
+Unit tests for lib.ledger_log.LogStructuredDB.
+Tests:
+- Mutations made through database_access survive a restart via log replay.
+- A torn record at the tail of a segment is dropped on replay.
+- Segments rotate once they reach the configured size.
+- The successor index is rebuilt from entry records on replay.
+- Compaction folds sealed segments into a snapshot and startup replays only the tail.
+- With a background flusher, writers return only after an fsync that covers their record, and share it.
+"""
+
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import lib.database_access as database_access
+from lib.ledger_log import LogStructuredDB
+from fixtures import temp_dir
+
+class TestLedgerLog(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.wal_dir = os.path.join(self.tmpdir, 'wal')
+        self.db = self.open_db()
+
+    def tearDown(self):
+        self.db.close()
+
+    def open_db(self, segment_size=1024 * 1024):
+        return LogStructuredDB(directory=self.wal_dir, segment_size=segment_size, sync_interval=0,
+                               filepath=os.path.join(self.tmpdir, 'ledger_db.json'), snapshot_interval=0)
+
+    def reopen(self):
+        self.db.close()
+        self.db = self.open_db()
+        return self.db
+
+    def test_group_commit(self):
+        self.db.close()
+        db = LogStructuredDB(directory=self.wal_dir, sync_interval=0.05,
+                             filepath=os.path.join(self.tmpdir, 'ledger_db.json'), snapshot_interval=0)
+        fsyncs = []
+        seen = []
+        real_fsync = os.fsync
+
+        def fsync(fd):
+            fsyncs.append(db.written)
+            real_fsync(fd)
+
+        def write(i):
+            database_access.store_token_balance(db, f"m{i}", i)
+            # Number of fsyncs that had happened by the time the write returned
+            seen.append(len(fsyncs))
+
+        with patch('lib.ledger_log.os.fsync', side_effect=fsync):
+            threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(len(seen), 8)
+        self.assertNotIn(0, seen)
+        self.assertEqual(db.synced, 8)
+        # The writers arrived within one flush interval, so they shared fsyncs
+        self.assertLess(len(fsyncs), 8)
+        db.close()
+        self.db = self.open_db()
+        self.assertEqual(database_access.get_token_balance(self.db, 'm7'), 7)
+
+    def test_replay_restores_state(self):
+        entry = {'hash': 'e1', 'timestamp': 1, 'predecessor_hashes': []}
+        database_access.store_entry(self.db, 'e1', entry)
+        database_access.update_entry_level(self.db, 'e1', 2)
+        database_access.store_token_balance(self.db, 'miner', 47)
+        database_access.store_vault_balance(self.db, 3)
+        database_access.store_lrw_balance(self.db, 'user', 10)
+        database_access.store_difficulty(self.db, 1000, 64, 5)
+        database_access.mark_invalid(self.db, 'bad')
+
+        db = self.reopen()
+        self.assertEqual(database_access.get_entry(db, 'e1')['level'], 2)
+        self.assertEqual(database_access.get_token_balance(db, 'miner'), 47)
+        self.assertEqual(database_access.get_vault_balance(db), 3)
+        self.assertEqual(database_access.get_lrw_balance(db, 'user'), 10)
+        self.assertEqual(db.difficulties, [{'target': 1000, 'k': 64, 'delta': 5}])
+        self.assertIn('bad', db.invalid_entries)
+
+    def test_torn_tail_is_dropped(self):
+        database_access.store_token_balance(self.db, 'miner', 1)
+        path = os.path.join(self.wal_dir, 'segment-00000001.log')
+        self.db.close()
+        with open(path, 'ab') as f:
+            f.write(b'["token_balance","miner",')
+
+        db = self.reopen()
+        self.assertEqual(database_access.get_token_balance(db, 'miner'), 1)
+        database_access.store_token_balance(db, 'miner', 2)
+        self.assertEqual(database_access.get_token_balance(self.reopen(), 'miner'), 2)
+
+    def test_segments_rotate(self):
+        self.db.close()
+        self.db = self.open_db(segment_size=64)
+        for i in range(10):
+            database_access.store_token_balance(self.db, f'miner{i}', i)
+        self.assertGreater(len(self.db.list_segments()), 1)
+        db = self.reopen()
+        self.assertEqual(database_access.get_token_balance(db, 'miner9'), 9)
+
+    def test_compaction(self):
+        database_access.store_token_balance(self.db, 'miner', 1)
+        database_access.store_difficulty(self.db, 1000, 64, 5)
+        self.assertEqual(self.db.compact(), 2)
+        self.assertIsNone(self.db.compact())
+        database_access.store_token_balance(self.db, 'miner', 2)
+        self.assertEqual(self.db.list_segments(), [2])
+        self.assertEqual(self.db.compact(), 3)
+        self.assertEqual(self.db.list_snapshots(), [3])
+        database_access.store_lrw_balance(self.db, 'user', 5)
+
+        db = self.reopen()
+        self.assertEqual(database_access.get_token_balance(db, 'miner'), 2)
+        self.assertEqual(database_access.get_lrw_balance(db, 'user'), 5)
+        self.assertEqual(len(db.difficulties), 1)
+
+    def test_successor_index_replay(self):
+        database_access.store_entry(self.db, 'p', {'hash': 'p', 'timestamp': 1, 'predecessor_hashes': []})
+        for child in ['c1', 'c2']:
+            entry = {'hash': child, 'timestamp': 2, 'predecessor_hashes': ['p', 'x', 'y']}
+            database_access.store_entry(self.db, child, entry)
+        database_access.store_entry(self.db, 'c1', {'hash': 'c1', 'timestamp': 2, 'predecessor_hashes': ['p', 'x', 'y']})
+        self.assertEqual(database_access.get_entry_references(self.db, 'p')['references'], ['c1', 'c2'])
+
+        db = self.reopen()
+        self.assertEqual(database_access.get_entry_references(db, 'p')['references'], ['c1', 'c2'])
+        self.assertEqual(database_access.get_successors(db, 'x'), ['c1', 'c2'])
+        self.assertEqual(database_access.get_successors(db, 'c1'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+test_ledger_service.py
+
+Unit tests for the shared ledger service.
+Tests:
+- Accepted entries update the one shared tip set and reach listeners.
+- Rejected entries leave the tips unchanged.
+- get_ledger_service returns the same instance to every caller.
+- reset() clears the ledger durably and rebuilds the service on the empty ledger.
+"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+import consensus_engine.ledger_service as ledger_service
+from consensus_engine.ledger_service import LedgerService
+from lib.database_access import PersistentDB, get_entry, store_entry
+from lib.ledger_log import LogStructuredDB
+from fixtures import redirect_audit_log, temp_dir, temp_db
+
+class TestLedgerService(unittest.TestCase):
+    def setUp(self):
+        redirect_audit_log(self)
+        self.db = temp_db(self)
+        for i, name in enumerate(['g1', 'g2', 'g3']):
+            store_entry(self.db, name, {'hash': name, 'timestamp': i, 'predecessor_hashes': []})
+        self.service = LedgerService(self.db)
+        self.service.dag.tips.update(['g1', 'g2', 'g3'])
+
+    def test_submit_updates_shared_tips(self):
+        seen = []
+        self.service.add_listener(seen.append)
+        entry = {'hash': 'e1', 'timestamp': 10, 'predecessor_hashes': ['g1', 'g2', 'g3']}
+        with patch.object(self.service.validator, 'validate_entry', return_value=(True, "ok")):
+            accepted, _ = self.service.submit_entry(entry)
+        self.assertTrue(accepted)
+        self.assertEqual(self.service.get_tips(), ['e1'])
+        self.assertEqual(seen, [entry])
+        self.assertEqual(self.service.get_entry('e1'), entry)
+
+    def test_rejected_entry(self):
+        with patch.object(self.service.validator, 'validate_entry', return_value=(False, "bad signature")):
+            accepted, msg = self.service.submit_entry({'hash': 'e2'})
+        self.assertFalse(accepted)
+        self.assertEqual(msg, "bad signature")
+        self.assertEqual(sorted(self.service.get_tips()), ['g1', 'g2', 'g3'])
+
+    def test_singleton(self):
+        with patch.object(ledger_service, '_service', None):
+            first = ledger_service.get_ledger_service(self.db)
+            self.assertIs(ledger_service.get_ledger_service(), first)
+
+    def test_reset(self):
+        seen = []
+        self.service.add_listener(seen.append)
+        self.service.orphans.add({'hash': 'o1', 'predecessor_hashes': ['x', 'y', 'z']}, {'x', 'y', 'z'})
+        self.service.reset()
+        self.assertEqual(self.service.get_tips(), [])
+        self.assertEqual(self.service.orphan_stats()['size'], 0)
+        self.assertIsNone(get_entry(PersistentDB(self.db.filepath), 'g1'))
+        # Listeners survive the reset
+        self.assertIn(seen.append, self.service.listeners)
+        self.assertIn(self.service.promotion.on_entry, self.service.listeners)
+
+    def test_reset_is_logged(self):
+        tmpdir = temp_dir(self)
+        wal_dir = os.path.join(tmpdir, 'wal')
+        path = os.path.join(tmpdir, 'wal_ledger.json')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=path, snapshot_interval=0)
+        store_entry(db, 'g1', {'hash': 'g1', 'timestamp': 0, 'predecessor_hashes': []})
+        LedgerService(db).reset()
+        store_entry(db, 'n1', {'hash': 'n1', 'timestamp': 1, 'predecessor_hashes': []})
+        db.close()
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=path, snapshot_interval=0)
+        self.assertIsNone(get_entry(db, 'g1'))
+        self.assertIsNotNone(get_entry(db, 'n1'))
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
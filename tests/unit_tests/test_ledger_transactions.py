@@ -0,0 +1,107 @@
+"""
+test_ledger_transactions.py
+
+Unit tests for PersistentDB.transaction.
+Tests:
+- A transaction persists all of its mutations with a single write.
+- A failing transaction leaves neither memory nor disk half-applied.
+- A WAL transaction is replayed as one unit.
+- A rollback reverts only its own entry and index changes, leaving concurrent transactions intact.
+"""
+
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import consensus_engine.token_rewards as token_rewards
+import lib.database_access as database_access
+from lib.database_access import PersistentDB
+from lib.ledger_log import LogStructuredDB
+from fixtures import temp_dir
+
+class TestLedgerTransactions(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+        self.db = PersistentDB(self.path)
+
+    def test_single_write_per_transaction(self):
+        database_access.store_token_balance(self.db, 'user', 100)
+        with patch.object(self.db, '_save', wraps=self.db._save) as mock_save:
+            token_rewards.stake_tokens(self.db, 'user', 40)
+        mock_save.assert_called_once()
+        reloaded = PersistentDB(self.path)
+        self.assertEqual(database_access.get_stake_balance(reloaded, 'user'), 40)
+        self.assertEqual(database_access.get_token_balance(reloaded, 'user'), 60)
+
+    def test_rollback_on_error(self):
+        database_access.store_lrw_balance(self.db, 'alice', 10)
+        with self.assertRaises(RuntimeError):
+            with database_access.transaction(self.db):
+                database_access.store_lrw_balance(self.db, 'alice', 0)
+                database_access.store_lrw_balance(self.db, 'bob', 10)
+                raise RuntimeError("crash mid-transfer")
+        self.assertEqual(database_access.get_lrw_balance(self.db, 'alice'), 10)
+        self.assertEqual(database_access.get_lrw_balance(self.db, 'bob'), 0)
+        self.assertEqual(database_access.get_lrw_balance(PersistentDB(self.path), 'bob'), 0)
+
+    def test_wal_batch_replay(self):
+        wal_dir = os.path.join(self.tmpdir, 'wal')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path)
+        token_rewards.reward_miner(db, 'miner')
+        db.close()
+        with open(os.path.join(wal_dir, 'segment-00000001.log')) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path)
+        self.assertEqual(database_access.get_token_balance(db, 'miner'), 48)
+        self.assertEqual(database_access.get_vault_balance(db), 2)
+        db.close()
+
+    def test_rollback_reverts_entry_indexes(self):
+        database_access.store_entry(self.db, 'g', {'hash': 'g', 'timestamp': 1, 'predecessor_hashes': []})
+        with self.assertRaises(RuntimeError):
+            with database_access.transaction(self.db, []):
+                database_access.store_entry(self.db, 'a', {'hash': 'a', 'timestamp': 2, 'predecessor_hashes': ['g']})
+                database_access.update_entry_level(self.db, 'g', 1)
+                database_access.store_weight(self.db, 'g', 5)
+                raise RuntimeError("crash mid-insert")
+        self.assertFalse('a' in self.db.entries)
+        self.assertEqual(database_access.get_tips(self.db), ['g'])
+        self.assertEqual(database_access.get_successors(self.db, 'g'), [])
+        self.assertIsNone(database_access.get_height(self.db, 'a'))
+        self.assertEqual(list(self.db.timestamps), [1])
+        self.assertEqual(database_access.get_entries_by_height(self.db), [(0, 'g')])
+        self.assertEqual(database_access.get_level_counts(self.db), {0: 1})
+        self.assertEqual(database_access.get_entry(self.db, 'g').get('level', 0), 0)
+        self.assertIsNone(database_access.get_weight(self.db, 'g'))
+
+    def test_rollback_keeps_concurrent_transaction(self):
+        wal_dir = os.path.join(self.tmpdir, 'wal')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        stored, failed = threading.Event(), threading.Event()
+
+        def writer():
+            with database_access.transaction(db, []):
+                database_access.store_entry(db, 'e1', {'hash': 'e1', 'timestamp': 1, 'predecessor_hashes': []})
+                stored.set()
+                failed.wait(5)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        stored.wait(5)
+        with self.assertRaises(RuntimeError):
+            with database_access.transaction(db):
+                database_access.store_lrw_balance(db, 'bob', 10)
+                raise RuntimeError("unrelated failure")
+        failed.set()
+        thread.join()
+        self.assertIsNotNone(database_access.get_entry(db, 'e1'))
+        self.assertEqual(database_access.get_lrw_balance(db, 'bob'), 0)
+        db.close()
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.assertIsNotNone(database_access.get_entry(db, 'e1'))
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+test_level_index.py
+
+Unit tests for the per-level entry index.
+Tests:
+- LevelIndex moves entries between levels in place and pages through a level with cursors.
+- Latency histograms bucket the time from publication to each level.
+- Every storage engine keeps the same counts through promotions and a restart.
+"""
+
+import os
+import unittest
+
+import lib.database_access as database_access
+from lib.database_access import PersistentDB
+from lib.ledger_log import LogStructuredDB
+from lib.level_index import LatencyHistogram, LevelIndex
+from lib.sqlite_store import SQLiteDB
+from tests.unit_tests.test_dag_indexes import store_diamond
+from fixtures import temp_dir
+
+def list_all(db, level, limit):
+    hashes, cursor = database_access.get_entries_at_level(db, level, limit=limit)
+    while cursor is not None:
+        page, cursor = database_access.get_entries_at_level(db, level, after=cursor, limit=limit)
+        hashes.extend(page)
+    return hashes
+
+class TestLevelIndex(unittest.TestCase):
+    def test_moves_and_pages(self):
+        index = LevelIndex([('a', 0), ('b', 0), ('c', 0)])
+        index.move('a', 1)
+        index.add('d', 0)
+        self.assertEqual(index.counts(), {0: 3, 1: 1})
+        self.assertEqual(index.level('a'), 1)
+        page, cursor = index.list(0, limit=2)
+        self.assertEqual(page, ['b', 'c'])
+        # Moving an entry out of the level does not disturb the cursor
+        index.move('b', 1)
+        self.assertEqual(index.list(0, after=cursor, limit=2), (['d'], None))
+        self.assertEqual(index.list(1), (['a', 'b'], None))
+
+    def test_compaction(self):
+        index = LevelIndex((str(i), 0) for i in range(100))
+        for i in range(90):
+            index.move(str(i), 1)
+        self.assertLess(len(index.order[0]), 100)
+        self.assertEqual(index.list(0)[0], [str(i) for i in range(90, 100)])
+
+    def test_histogram(self):
+        histogram = LatencyHistogram([1, 10])
+        for seconds in (0.5, 1, 7, 30):
+            histogram.observe(seconds)
+        stats = histogram.to_dict()
+        self.assertEqual(stats['buckets'], {'le_1': 2, 'le_10': 1, 'gt_10': 1})
+        self.assertEqual(stats['count'], 4)
+        self.assertEqual(stats['max'], 30)
+
+class TestLevelIndexEngines(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+
+    def promote(self, db):
+        store_diamond(db)
+        database_access.update_entry_level(db, 'g', 1)
+        database_access.update_entry_level(db, 'a', 1)
+        database_access.update_entry_level(db, 'g', 2)
+
+    def check(self, db):
+        self.assertEqual(database_access.get_level_counts(db), {0: 3, 1: 1, 2: 1})
+        self.assertEqual(sorted(list_all(db, 0, limit=2)), ['b', 'c', 'd'])
+        self.assertEqual(list_all(db, 2, limit=1), ['g'])
+        self.assertEqual(list_all(db, 3, limit=1), [])
+
+    def test_json(self):
+        db = PersistentDB(self.path)
+        self.promote(db)
+        self.check(db)
+        latency = database_access.get_level_latency(db)
+        self.assertEqual(latency[1]['count'], 2)
+        self.assertEqual(latency[2]['count'], 1)
+        self.check(PersistentDB(self.path))
+
+    def test_wal(self):
+        wal_dir = os.path.join(self.tmpdir, 'wal')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.promote(db)
+        db.close()
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.check(db)
+        # Replayed promotions carry no latency
+        self.assertEqual(database_access.get_level_latency(db), {})
+        db.close()
+
+    def test_sqlite(self):
+        path = os.path.join(self.tmpdir, 'ledger.db')
+        db = SQLiteDB(path)
+        self.promote(db)
+        self.check(db)
+        db.close()
+        db = SQLiteDB(path)
+        self.check(db)
+        db.execute("DELETE FROM level_counts")
+        db.close()
+        # Databases without level counts get them from the entries table
+        db = SQLiteDB(path)
+        self.check(db)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+test_promotion_engine.py
+
+Unit tests for the event-driven confirmation level promotion engine.
+Tests:
+- Inserting entries promotes their predecessors through L0 -> L3 and emits promotion and finalization events.
+- After every insert, no entry is left that the ConfirmationLevels rules would still promote.
+- Promotions are audited with their confirmation level as a field, at the INFO log level.
+"""
+
+import random
+import json
+import unittest
+
+import lib.database_access as database_access
+from consensus_engine.audit_report import generate_audit_report
+from consensus_engine.confirmation_levels import ConfirmationLevels, FINAL_LEVEL
+from consensus_engine.promotion_engine import PromotionEngine
+from consensus_engine.weight_accumulation import propagate_weight
+from fixtures import redirect_audit_log, temp_db
+
+class TestPromotionEngine(unittest.TestCase):
+    def setUp(self):
+        self.audit_logger = redirect_audit_log(self)
+        self.db = temp_db(self)
+        self.engine = PromotionEngine(self.db)
+        self.events = []
+        self.engine.add_listener(self.events.append)
+        self.names = []
+
+    def insert(self, name, predecessors):
+        entry = {'hash': name, 'timestamp': len(self.names), 'predecessor_hashes': predecessors}
+        database_access.store_entry(self.db, name, entry)
+        propagate_weight(self.db, name, entry)
+        self.names.append(name)
+        self.engine.on_entry(entry)
+
+    def level(self, name):
+        return database_access.get_entry(self.db, name).get('level', 0)
+
+    def test_layers_reach_finality(self):
+        previous = []
+        for layer in range(12):
+            current = [f"l{layer}_{i}" for i in range(3)]
+            for name in current:
+                self.insert(name, previous)
+            previous = current
+        self.assertEqual(self.level('l0_0'), FINAL_LEVEL)
+        self.assertEqual(self.level('l11_0'), 0)
+        finalized = [e['hash'] for e in self.events if e['type'] == 'finalized']
+        self.assertIn('l0_0', finalized)
+        promotions = [(e['previous_level'], e['level']) for e in self.events
+                      if e['type'] == 'promoted' and e['hash'] == 'l0_0']
+        self.assertEqual(promotions, [(0, 1), (1, 2), (2, 3)])
+
+    def test_audit_record(self):
+        self.engine._emit({'type': 'promoted', 'hash': 'e1', 'previous_level': 0, 'level': 1})
+        self.audit_logger.flush(timeout=5)
+        with open(self.audit_logger.log_file) as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record['level'], 'INFO')
+        self.assertEqual(record['event'], 'entry_promoted')
+        self.assertEqual(record['confirmation_level'], 1)
+        self.assertIn("INFO: 1", generate_audit_report(self.audit_logger.log_file))
+
+    def test_no_entry_left_eligible(self):
+        rules = ConfirmationLevels(self.db)
+        rng = random.Random(3)
+        for i in range(80):
+            predecessors = sorted(set(rng.choice(self.names[-8:]) for _ in range(3))) if self.names else []
+            self.insert(f"e{i:02d}", predecessors)
+            # After every insert, the incremental engine must have applied every promotion the rules allow
+            for name in self.names:
+                level, next_level, _, _ = rules.evaluate(name)
+                self.assertTrue(next_level is None or level >= FINAL_LEVEL, (i, name, level))
+        self.assertTrue(any(self.level(name) >= 2 for name in self.names))
+
+if __name__ == '__main__':
+    unittest.main()
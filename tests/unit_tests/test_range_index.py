@@ -0,0 +1,70 @@
+"""
+test_range_index.py
+
+Unit tests for height and timestamp range queries.
+Tests:
+- RangeIndex pages through a key range with keyset cursors.
+- Every storage engine answers the same height and timestamp slices, including after a restart.
+- DAG.iter_by_height streams entries in topological order.
+"""
+
+import os
+import unittest
+
+import lib.database_access as database_access
+from consensus_engine.dag_structure import DAG
+from lib.database_access import PersistentDB
+from lib.ledger_log import LogStructuredDB
+from lib.range_index import RangeIndex
+from lib.sqlite_store import SQLiteDB
+from tests.unit_tests.test_dag_indexes import store_diamond
+from fixtures import redirect_audit_log, temp_dir
+
+class TestRangeIndex(unittest.TestCase):
+    def test_pages(self):
+        index = RangeIndex([(2, 'b'), (1, 'a')])
+        index.add(2, 'a')
+        index.add(5, 'z')
+        self.assertEqual(index.range(2, 5, limit=1), [(2, 'a')])
+        self.assertEqual(index.range(2, 5, after=(2, 'a'), limit=5), [(2, 'b')])
+        self.assertEqual(index.range(after=(2, 'b')), [(5, 'z')])
+        index.discard(5, 'z')
+        self.assertEqual(index.range(3), [])
+
+class TestDagRanges(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = temp_dir(self)
+        redirect_audit_log(self)
+        self.path = os.path.join(self.tmpdir, 'ledger_db.json')
+
+    def check(self, db):
+        dag = DAG(db)
+        self.assertEqual(dag.range_by_height(1, 2), [(1, 'a'), (1, 'b')])
+        first = dag.range_by_height(1, limit=2)
+        self.assertEqual(dag.range_by_height(1, after=first[-1]), [(2, 'c'), (2, 'd')])
+        self.assertEqual([h for _, h in dag.range_by_time(3, 5)], ['b', 'c'])
+        streamed = [entry['hash'] for _, entry in dag.iter_by_height(page_size=2)]
+        self.assertEqual(streamed, ['g', 'a', 'b', 'c', 'd'])
+        self.assertEqual([ts for ts, _ in dag.iter_by_time(4)], [4, 5])
+
+    def test_json(self):
+        store_diamond(PersistentDB(self.path))
+        self.check(PersistentDB(self.path))
+
+    def test_wal(self):
+        wal_dir = os.path.join(self.tmpdir, 'wal')
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        store_diamond(db)
+        db.close()
+        db = LogStructuredDB(directory=wal_dir, sync_interval=0, filepath=self.path, snapshot_interval=0)
+        self.check(db)
+        db.close()
+
+    def test_sqlite(self):
+        db = SQLiteDB(os.path.join(self.tmpdir, 'ledger.db'))
+        store_diamond(db)
+        self.check(db)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
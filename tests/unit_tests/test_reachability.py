@@ -0,0 +1,91 @@
+"""
+test_reachability.py
+
+Unit tests for the reachability index.
+Tests:
+- Ancestor queries agree with the DAG structure, with and without cached cones.
+- Cones of new entries are derived incrementally from their predecessors' cones.
+- Ancestor and descendant generators respect height bounds and read the cone bitsets.
+- Entries below the horizon are released and renumbered, and queries still reach them.
+"""
+
+import unittest
+
+import lib.database_access as database_access
+from consensus_engine.reachability import ReachabilityIndex
+from tests.unit_tests.test_dag_indexes import store_diamond
+from fixtures import redirect_audit_log, mock_db
+
+class TestReachability(unittest.TestCase):
+    def setUp(self):
+        redirect_audit_log(self)
+        self.db = mock_db()
+        store_diamond(self.db)  # g <- a, b; a, b <- c; a <- d
+        self.index = ReachabilityIndex(self.db, cache_bits=1 << 20)
+
+    def test_is_ancestor_cold_and_cached(self):
+        for cached in (False, True):
+            if cached:
+                self.index.past_cone_bits('c')
+                self.index.past_cone_bits('d')
+            self.assertTrue(self.index.is_ancestor('g', 'c'))
+            self.assertTrue(self.index.is_ancestor('b', 'c'))
+            self.assertFalse(self.index.is_ancestor('b', 'd'))
+            self.assertFalse(self.index.is_ancestor('c', 'g'))
+            self.assertFalse(self.index.is_ancestor('c', 'c'))
+        self.assertEqual(sorted(self.index.past_cone('c')), ['a', 'b', 'g'])
+
+    def test_incremental_cone(self):
+        self.index.past_cone_bits('c')
+        self.index.past_cone_bits('d')
+        entry = {'hash': 'e', 'timestamp': 6, 'predecessor_hashes': ['c', 'd']}
+        database_access.store_entry(self.db, 'e', entry)
+        self.index.add_entry(entry)
+        self.assertIn('e', self.index.cones)
+        self.assertEqual(sorted(self.index.past_cone('e')), ['a', 'b', 'c', 'd', 'g'])
+
+    def test_generators(self):
+        self.assertEqual(list(self.index.ancestors('c', min_height=1)), ['a', 'b'])
+        descendants = self.index.descendants('g')
+        self.assertIn(next(descendants), ('a', 'b'))
+        self.assertEqual(sorted(self.index.descendants('g', max_height=1)), ['a', 'b'])
+        self.assertEqual(sorted(self.index.descendants('a')), ['c', 'd'])
+        # Both queries left the cones they read in the cache
+        self.assertIn('c', self.index.cones)
+        self.assertIn('d', self.index.cones)
+
+    def test_release_below_horizon(self):
+        self.index.past_cone_bits('c')
+        self.index.past_cone_bits('d')
+        self.index.release(1)
+        self.assertEqual(self.index.horizon, 1)
+        self.assertNotIn('g', self.index.seq)
+        self.assertEqual(sorted(self.index.hashes), sorted(self.index.seq))
+        self.assertEqual(len(self.index.cones), 0)
+        # Released ancestors are still reported, after the indexed ones
+        self.assertEqual(list(self.index.ancestors('c')), ['a', 'b', 'g'])
+        self.assertEqual(list(self.index.ancestors('c', min_height=1)), ['a', 'b'])
+        self.assertEqual(sorted(self.index.past_cone('d')), ['a', 'g'])
+        self.assertTrue(self.index.is_ancestor('g', 'd'))
+        self.assertFalse(self.index.is_ancestor('b', 'd'))
+        self.assertEqual(sorted(self.index.descendants('g')), ['a', 'b', 'c', 'd'])
+        self.assertNotIn('g', self.index.seq)
+
+    def test_depth_moves_horizon(self):
+        index = ReachabilityIndex(self.db, cache_bits=1 << 20, depth=1)
+        for entry_hash in ('g', 'a', 'b', 'c', 'd'):
+            index.add_entry(database_access.get_entry(self.db, entry_hash))
+        self.assertEqual(index.horizon, 1)
+        self.assertNotIn('g', index.seq)
+        self.assertEqual(list(index.ancestors('c')), ['a', 'b', 'g'])
+
+    def test_forget_releases_last_number(self):
+        entry = {'hash': 'e', 'timestamp': 6, 'predecessor_hashes': ['c']}
+        self.index.add_entry(entry)
+        self.assertIn('e', self.index.seq)
+        self.index.forget('e')
+        self.assertNotIn('e', self.index.seq)
+        self.assertNotIn('e', self.index.hashes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""
+test_sqlite_store.py
+
+Unit tests for lib.sqlite_store.SQLiteDB.
+Tests:
+- Entries, balances and vault balance round-trip through database_access and survive a reopen.
+- Entry level updates are written back to the table.
+- The successor table answers get_entry_references.
+- get_last_m_timestamps and difficulty history read from the series tables.
+- The LRU entry cache stays within its bound and counts hits and misses.
+- Other threads do not see rows, or cached bodies, of a transaction until it commits.
+- Reads from many threads share a bounded pool of connections.
+"""
+
+import os
+import threading
+import unittest
+
+import consensus_engine.token_rewards as token_rewards
+import lib.database_access as database_access
+from lib.sqlite_store import SQLiteDB
+from fixtures import temp_dir
+
+class TestSQLiteStore(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(temp_dir(self), 'ledger.db')
+        self.db = SQLiteDB(self.path)
+
+    def tearDown(self):
+        self.db.close()
+
+    def reopen(self):
+        self.db.close()
+        self.db = SQLiteDB(self.path)
+        return self.db
+
+    def test_entries_round_trip(self):
+        entry = {'hash': 'e1', 'timestamp': 10, 'predecessor_hashes': ['a', 'b', 'c']}
+        database_access.store_entry(self.db, 'e1', entry)
+        database_access.update_entry_level(self.db, 'e1', 1)
+        self.assertTrue(database_access.check_entry_exists(self.db, 'e1'))
+        self.assertFalse(database_access.check_entry_exists(self.db, 'missing'))
+
+        database_access.store_entry(self.db, 'e2', {'hash': 'e2', 'timestamp': 11, 'predecessor_hashes': ['e1', 'a', 'b']})
+
+        db = self.reopen()
+        self.assertEqual(database_access.get_entry(db, 'e1')['level'], 1)
+        self.assertEqual(database_access.get_entry_references(db, 'e1'), {'level': 1, 'references': ['e2']})
+        self.assertEqual(database_access.get_successors(db, 'e2'), [])
+        self.assertIsNone(database_access.get_entry(db, 'missing'))
+
+    def test_balances_and_rewards(self):
+        token_rewards.reward_miner(self.db, 'miner')
+        database_access.store_stake_balance(self.db, 'staker', 365)
+        token_rewards.distribute_staking_rewards(self.db)
+
+        db = self.reopen()
+        self.assertEqual(database_access.get_token_balance(db, 'miner'), 48)
+        self.assertEqual(database_access.get_vault_balance(db), 2)
+        self.assertAlmostEqual(database_access.get_staking_rewards(db, 'staker'), 0.05)
+        self.assertEqual(database_access.get_lrw_balance(db, 'nobody'), 0)
+
+    def test_series(self):
+        for ts in range(5):
+            self.db.timestamps.append(ts)
+        database_access.store_difficulty(self.db, 1000, 64, 5)
+        self.assertEqual(database_access.get_last_m_timestamps(self.db, 3), [2, 3, 4])
+        self.assertEqual(list(self.reopen().difficulties), [{'target': 1000, 'k': 64, 'delta': 5}])
+
+    def test_entry_cache(self):
+        self.db.close()
+        self.db = SQLiteDB(self.path, entry_cache_size=2)
+        for name in ['e1', 'e2', 'e3']:
+            database_access.store_entry(self.db, name, {'hash': name, 'timestamp': 1})
+
+        self.assertEqual(database_access.get_entry(self.db, 'e3')['hash'], 'e3')
+        self.assertEqual(database_access.get_entry(self.db, 'e1')['hash'], 'e1')
+        self.assertIsNone(database_access.get_entry(self.db, 'missing'))
+        stats = database_access.get_entry_cache_stats(self.db)
+        self.assertEqual(stats['size'], 2)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['evictions'], 2)
+
+    def check_isolation(self):
+        database_access.store_entry(self.db, 'e1', {'hash': 'e1', 'timestamp': 1})
+        opened, done = threading.Event(), threading.Event()
+        seen = {}
+
+        def read():
+            opened.wait()
+            seen['entry'] = database_access.get_entry(self.db, 'e2')
+            seen['level'] = database_access.get_entry(self.db, 'e1').get('level', 0)
+            done.set()
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        with database_access.transaction(self.db, []):
+            database_access.store_entry(self.db, 'e2', {'hash': 'e2', 'timestamp': 2})
+            database_access.update_entry_level(self.db, 'e1', 1)
+            # The writing thread sees its own rows
+            self.assertEqual(database_access.get_entry(self.db, 'e2')['hash'], 'e2')
+            opened.set()
+            # Readers use their own connection, so they are not blocked by the open transaction
+            self.assertTrue(done.wait(5))
+        reader.join()
+        self.assertIsNone(seen['entry'])
+        self.assertEqual(seen['level'], 0)
+        # Once committed, the new rows are visible and no stale body is left in the cache
+        results = []
+        thread = threading.Thread(target=lambda: results.append(database_access.get_entry(self.db, 'e1')))
+        thread.start()
+        thread.join()
+        self.assertEqual(results[0]['level'], 1)
+        self.assertEqual(database_access.get_entry(self.db, 'e2')['hash'], 'e2')
+
+    def test_readers_see_committed_rows(self):
+        self.check_isolation()
+
+    def test_readers_see_committed_rows_cached(self):
+        self.db.close()
+        self.db = SQLiteDB(self.path, entry_cache_size=10)
+        self.check_isolation()
+
+    def test_reader_pool_is_bounded(self):
+        self.db.close()
+        self.db = SQLiteDB(self.path, reader_connections=2)
+        database_access.store_entry(self.db, 'e1', {'hash': 'e1', 'timestamp': 1})
+        found = []
+        # One thread per read, as a threaded HTTP server would use
+        threads = [threading.Thread(target=lambda: found.append(database_access.get_entry(self.db, 'e1')))
+                   for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(found), 50)
+        self.assertTrue(all(entry['hash'] == 'e1' for entry in found))
+        self.assertLessEqual(self.db.reader_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
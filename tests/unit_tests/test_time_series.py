@@ -0,0 +1,52 @@
+"""
+test_time_series.py
+
+Unit tests for lib.time_series.
+Tests:
+- The ring keeps only the newest points and supports list-style slicing.
+- Points pushed out of the ring are written to the archive file.
+- Difficulty records round-trip as dicts.
+- mean_interval matches the average of consecutive gaps.
+"""
+
+import os
+import unittest
+from array import array
+
+from lib.time_series import RingSeries, DifficultySeries, mean_interval
+from fixtures import temp_dir
+
+class TestTimeSeries(unittest.TestCase):
+    def test_ring_keeps_newest(self):
+        series = RingSeries(3, typecode='d', values=[1, 2])
+        for value in [3, 4, 5]:
+            series.append(value)
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series[-2:], [4.0, 5.0])
+        self.assertEqual(series[0], 3.0)
+        self.assertEqual(series.tolist(), [3.0, 4.0, 5.0])
+        series.clear()
+        self.assertEqual(series[-5:], [])
+
+    def test_archive(self):
+        path = os.path.join(temp_dir(self), 'timestamps.bin')
+        series = RingSeries(2, typecode='d', values=[1, 2, 3], archive_path=path)
+        self.assertFalse(os.path.exists(path))
+        series.append(4)
+        series.append(5)
+        with open(path, 'rb') as f:
+            self.assertEqual(array('d', f.read()).tolist(), [2.0, 3.0])
+
+    def test_difficulty_series(self):
+        series = DifficultySeries(2)
+        series.append({'target': 2 ** 240, 'k': 64, 'delta': 5})
+        self.assertEqual(series[-1:], [{'target': 2 ** 240, 'k': 64, 'delta': 5}])
+
+    def test_mean_interval(self):
+        points = [1, 4, 6, 13]
+        gaps = [b - a for a, b in zip(points, points[1:])]
+        self.assertEqual(mean_interval(points), sum(gaps) / len(gaps))
+        self.assertIsNone(mean_interval([1]))
+
+if __name__ == '__main__':
+    unittest.main()
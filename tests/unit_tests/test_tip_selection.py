@@ -0,0 +1,61 @@
+"""
+test_tip_selection.py
+
+Unit tests for weighted random-walk tip selection.
+Tests:
+- Cumulative weights count distinct direct and indirect approvers.
+- Walks always end on a tip and return distinct tips.
+- With alpha = 0 approvals are spread across all tips.
+- Cone weights reflect entries added since the previous count.
+"""
+
+import random
+import unittest
+from collections import Counter
+
+import lib.database_access as database_access
+from consensus_engine.tip_selection import TipSelector
+from fixtures import mock_db
+
+class TestTipSelection(unittest.TestCase):
+    def setUp(self):
+        self.db = mock_db()
+        # g <- a, b; a, b <- c; then four tips t0..t3 on top of c
+        self.store('g', [], 1)
+        self.store('a', ['g'], 2)
+        self.store('b', ['g'], 3)
+        self.store('c', ['a', 'b'], 4)
+        for i in range(4):
+            self.store(f't{i}', ['c'], 5 + i)
+
+    def store(self, entry_hash, predecessors, timestamp):
+        database_access.store_entry(self.db, entry_hash,
+                                    {'hash': entry_hash, 'predecessor_hashes': predecessors, 'timestamp': timestamp})
+
+    def test_cone_weights(self):
+        weights = TipSelector(self.db).cone_weights('g')
+        self.assertEqual(weights['g'], 8)
+        self.assertEqual(weights['a'], 6)
+        self.assertEqual(weights['c'], 5)
+        self.assertEqual(weights['t0'], 1)
+
+    def test_walk_selects_distinct_tips(self):
+        selector = TipSelector(self.db, alpha=0.5, depth=5, rng=random.Random(1))
+        tips = selector.select_tips(3, 'walk')
+        self.assertEqual(len(set(tips)), 3)
+        self.assertTrue(set(tips) <= {'t0', 't1', 't2', 't3'})
+
+    def test_uniform_walk_spreads_approvals(self):
+        selector = TipSelector(self.db, alpha=0, depth=5, rng=random.Random(7))
+        counts = Counter(selector.walk(selector.find_checkpoint(['t0'])) for _ in range(400))
+        self.assertEqual(set(counts), {'t0', 't1', 't2', 't3'})
+        self.assertGreater(min(counts.values()), 60)
+
+    def test_cone_weights_follow_growth(self):
+        selector = TipSelector(self.db)
+        self.assertEqual(selector.cone_weights('c')['c'], 5)
+        self.store('t4', ['t0', 't1'], 20)
+        self.assertEqual(selector.cone_weights('c')['c'], 6)
+
+if __name__ == '__main__':
+    unittest.main()
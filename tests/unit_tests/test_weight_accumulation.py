@@ -0,0 +1,94 @@
+"""
+test_weight_accumulation.py
+
+Unit tests for incremental cumulative-weight propagation.
+Tests:
+- Propagated weights count each distinct descendant once and match a from-scratch computation.
+- Weights persist across a restart and are read without recomputation.
+- Propagation stops at final entries; entries without a stored weight are computed on first lookup.
+- Non-final entries behind a final one keep counting new descendants.
+- A batch writes each weight once, and the ledger log keeps only the last weight record per entry.
+"""
+
+import unittest
+from unittest.mock import patch
+
+import lib.database_access as database_access
+import consensus_engine.weight_accumulation as weight_accumulation
+from consensus_engine.weight_accumulation import (propagate_weight, propagate_weights, get_accumulated_weight,
+                                                  compute_accumulated_weight)
+from lib.database_access import PersistentDB
+from lib.ledger_log import coalesce_ops
+from fixtures import redirect_audit_log, temp_db
+
+DIAMOND = [('g', []), ('a', ['g']), ('b', ['g']), ('c', ['a', 'b']), ('d', ['a']), ('e', ['c', 'd'])]
+
+class TestWeightPropagation(unittest.TestCase):
+    def setUp(self):
+        redirect_audit_log(self)
+        self.db = temp_db(self)
+        self.path = self.db.filepath
+
+    def store(self, propagate=True):
+        for i, (name, predecessors) in enumerate(DIAMOND):
+            entry = {'hash': name, 'timestamp': i, 'predecessor_hashes': predecessors}
+            database_access.store_entry(self.db, name, entry)
+            if propagate:
+                propagate_weight(self.db, name, entry)
+
+    def test_distinct_descendants(self):
+        self.store()
+        expected = {'g': 6, 'a': 4, 'b': 3, 'c': 2, 'd': 2, 'e': 1}
+        for name, weight in expected.items():
+            self.assertEqual(get_accumulated_weight(self.db, name), weight)
+            self.assertEqual(compute_accumulated_weight(self.db, name), weight)
+
+    def test_persisted_lookup(self):
+        self.store()
+        db = PersistentDB(self.path)
+        with patch.object(weight_accumulation, 'compute_accumulated_weight') as compute:
+            self.assertEqual(get_accumulated_weight(db, 'g'), 6)
+            compute.assert_not_called()
+
+    def test_freeze_and_lazy_fallback(self):
+        self.store(propagate=False)
+        self.assertEqual(database_access.get_weight(self.db, 'a'), None)
+        self.assertEqual(get_accumulated_weight(self.db, 'a'), 4)
+        database_access.update_entry_level(self.db, 'g', weight_accumulation.FREEZE_LEVEL)
+        database_access.store_weight(self.db, 'g', 6)
+        entry = {'hash': 'f', 'timestamp': 9, 'predecessor_hashes': ['a']}
+        database_access.store_entry(self.db, 'f', entry)
+        self.assertEqual(propagate_weight(self.db, 'f', entry), 1)
+        self.assertEqual(get_accumulated_weight(self.db, 'a'), 5)
+        self.assertEqual(get_accumulated_weight(self.db, 'g'), 6)
+
+    def test_walks_through_final_entries(self):
+        self.store()
+        # c is final while a, behind it, is not: new entries reach a only through c
+        database_access.update_entry_level(self.db, 'c', weight_accumulation.FREEZE_LEVEL)
+        for i, name in enumerate(['x1', 'x2', 'x3']):
+            entry = {'hash': name, 'timestamp': 10 + i, 'predecessor_hashes': ['c']}
+            database_access.store_entry(self.db, name, entry)
+            propagate_weight(self.db, name, entry)
+        for name in ['g', 'a', 'b']:
+            self.assertEqual(database_access.get_weight(self.db, name), compute_accumulated_weight(self.db, name))
+        self.assertEqual(database_access.get_weight(self.db, 'b'), 6)
+        # The final entry's own weight stays frozen
+        self.assertEqual(database_access.get_weight(self.db, 'c'), 2)
+
+    def test_batch_writes_each_weight_once(self):
+        self.store(propagate=False)
+        entries = [database_access.get_entry(self.db, name) for name, _ in DIAMOND]
+        with patch.object(database_access, 'store_weight', wraps=database_access.store_weight) as store_weight:
+            self.assertEqual(propagate_weights(self.db, entries), 0)
+        self.assertEqual(store_weight.call_count, len(DIAMOND))
+        expected = {'g': 6, 'a': 4, 'b': 3, 'c': 2, 'd': 2, 'e': 1}
+        for name, weight in expected.items():
+            self.assertEqual(database_access.get_weight(self.db, name), weight)
+
+    def test_coalesced_log_records(self):
+        ops = [('weight', ('a', 1)), ('entry', ('b', {})), ('weight', ('a', 2)), ('weight', ('b', 1))]
+        self.assertEqual(coalesce_ops(ops), [('entry', ('b', {})), ('weight', ('a', 2)), ('weight', ('b', 1))])
+
+if __name__ == '__main__':
+    unittest.main()